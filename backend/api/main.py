@@ -10,7 +10,7 @@ from typing import Dict, Any, List, Optional
 from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -22,12 +22,17 @@ import uvicorn
 from config import get_settings, MEMORY_SETTINGS
 from models.schemas import (
     SessionCreate, SessionResponse, SessionUpdate, SessionSummary,
-    ChatMessageRequest, ChatMessageResponse, UserResponse, HealthCheck,
+    ChatMessageRequest, ChatMessageResponse, StreamingChatResponse, UserResponse, HealthCheck,
     APIResponse, HTTPError
 )
 from services.auth_service import auth_service
 from services.session_service import session_service
 from services.openai_service import openai_service
+from services.llm_gateway import llm_gateway, GatewayOverloaded, PRIORITY_AUTHENTICATED, PRIORITY_ANONYMOUS
+from services.retrieval_service import retrieval_service
+from services.resilience import CircuitOpen, is_retryable
+from services.request_timing import span, start_request, finish_request, log_request
+from services.token_counter import token_counter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -56,10 +61,23 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Startup cleanup failed: {str(e)}")
     
+    # Load Jung corpus embeddings for in-process retrieval
+    retrieval_service.load()
+    
+    # Load the tokenizer and count the static persona prompt before the first turn needs them
+    token_counter.warm()
+    openai_service.measure_persona_tokens()
+    
+    # Persist chat turns in the background
+    await session_service.start_writer()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Jung AI backend...")
+    await session_service.stop_writer()
+    session_service.shutdown()
+    openai_service.spend_ledger.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -105,14 +123,37 @@ async def limit_request_size(request: Request, call_next):
             )
     
     start_time = time.time()
-    response = await call_next(request)
+    timings = token = None
+    if settings.request_timing_enabled:
+        timings, token = start_request()
+    try:
+        response = await call_next(request)
+    finally:
+        if token is not None:
+            finish_request(token)
     process_time = time.time() - start_time
     
     response.headers["X-Process-Time"] = str(process_time)
     response.headers["X-App-Version"] = settings.app_version
     
+    if timings is not None:
+        # Stages of a streaming body run after the headers, so they only reach the log line
+        response.headers["Server-Timing"] = timings.server_timing()
+        response.body_iterator = _log_timings_when_sent(response.body_iterator, timings, request, response.status_code)
+    
     return response
 
+async def _log_timings_when_sent(body, timings, request: Request, status_code: int):
+    """Pass a response body through and log the request's stage timings once it is sent."""
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        # Route templates keep session ids out of the logs
+        route = request.scope.get("route")
+        log_request(timings, request.method, getattr(route, "path", request.url.path),
+                    status_code, settings.timing_log_min_ms)
+
 # Authentication dependency
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Optional[UserResponse]:
     """Get current user from JWT token (optional)."""
@@ -120,7 +161,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         return None
     
     try:
-        user = await auth_service.get_current_user(credentials.credentials)
+        with span("auth"):
+            user = await auth_service.get_current_user(credentials.credentials)
         return user
     except Exception as e:
         logger.error(f"Authentication failed: {str(e)}")
@@ -387,95 +429,161 @@ async def save_anonymous_session(
             detail="Failed to save session"
         )
 
-# Chat endpoints
-@app.post("/chat/message", response_model=ChatMessageResponse)
-@limiter.limit("10/minute")  # Aggressive rate limiting for OpenAI costs
-async def send_chat_message(
-    request: Request,
-    message_request: ChatMessageRequest,
-    user: Optional[UserResponse] = Depends(get_current_user)
-):
-    """Send message and get Jung AI response."""
-    try:
-        # Verify session access
+# Chat helpers
+async def _prepare_chat_turn(message_request: ChatMessageRequest, user: Optional[UserResponse]):
+    """Verify session access and gather conversation context and Jung sources for a turn.
+    
+    Also returns the query embedding computed for retrieval (or None), which
+    keys the semantic cache.
+    """
+    # Verify session access
+    with span("session"):
         session = await session_service.get_session(
             message_request.session_id,
             user_id=user.id if user else None
         )
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Session not found"
-            )
-        
-        # Get conversation history for context
-        conversation_history = await session_service.get_session_messages(
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    
+    # Get conversation history for context (cached per session, checked against its message count)
+    with span("history"):
+        conversation_history = await session_service.get_conversation_history(
             message_request.session_id,
-            user_id=user.id if user else None
+            message_count=session.message_count
         )
-        
-        # Get session context for authenticated users
-        context = {}
-        if user:
+    
+    # Get session context for authenticated users
+    context = {}
+    if user:
+        with span("context"):
             context = await session_service.get_session_context(
                 user.id,
                 message_request.session_id
             )
-        
-        # Add conversation history to context
-        context["conversation_history"] = [
-            {"role": msg.role, "content": msg.content} 
-            for msg in conversation_history
-        ]
+    
+    # Add conversation history to context
+    context["conversation_history"] = [
+        {"role": role, "content": content}
+        for role, content, _ in conversation_history
+    ]
+    
+    # Retrieve relevant passages from Jung's collected works
+    with span("retrieval"):
+        retrieved_sources, query_embedding = await retrieval_service.retrieve(message_request.content)
+    sources = [source.model_dump() for source in retrieved_sources]
+    
+    return context, sources, query_embedding
+
+async def _persist_chat_turn(session_id: str, user_content: str, ai_response: Dict[str, Any],
+                             sources: List[Dict[str, Any]], current_time: str,
+                             user: Optional[UserResponse] = None):
+    """Queue both messages of a turn for persistence; returns provisional message ids."""
+    user_message_data = {
+        "role": "user",
+        "content": user_content,
+        "timestamp": current_time
+    }
+    
+    assistant_message_data = {
+        "role": "assistant",
+        "content": ai_response["response"],
+        "timestamp": current_time,
+        "model_used": ai_response["model_used"].value,
+        "tokens_used": ai_response["tokens_used"],
+        "cost_usd": ai_response["cost_usd"],
+        "sources": sources,
+        "analysis_type": ai_response.get("analysis_type"),
+        "therapeutic_techniques": ai_response.get("therapeutic_techniques")
+    }
+    
+    # Both messages and the session stats are written in one background round trip
+    with span("persist"):
+        user_message_id, assistant_message_id = await session_service.persist_chat_turn(
+            session_id,
+            [user_message_data, assistant_message_data],
+            user_id=user.id if user else None
+        )
+    
+    return user_message_id, assistant_message_id
+
+def _chat_error_detail(e: Exception) -> HTTPException:
+    """Map chat pipeline failures to client-facing HTTP errors."""
+    # Provide more specific error messages for debugging
+    if isinstance(e, GatewayOverloaded):
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Jung AI is busy right now. Please try again shortly.",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    elif isinstance(e, CircuitOpen):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Jung AI is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    elif is_retryable(e):
+        # Still failing after retries and fallback
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The language model is not responding. Please try again shortly.",
+            headers={"Retry-After": "5"}
+        )
+    elif "OpenAI API key not configured" in str(e):
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="OpenAI API key not configured. Please contact administrator."
+        )
+    elif "Daily budget exceeded" in str(e):
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily API budget exceeded. Please try again tomorrow."
+        )
+    else:
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process message: {str(e)}"
+        )
+
+def _sse_event(event_type: str, data: Dict[str, Any], session_id: str) -> str:
+    """Format one server-sent event carrying a StreamingChatResponse payload."""
+    payload = StreamingChatResponse(type=event_type, data=data, session_id=session_id)
+    return f"event: {event_type}\ndata: {payload.model_dump_json()}\n\n"
+
+# Chat endpoints
+@app.post("/chat/message", response_model=ChatMessageResponse)
+@limiter.limit("10/minute")  # Aggressive rate limiting for OpenAI costs
+async def send_chat_message(
+    request: Request,
+    message_request: ChatMessageRequest,
+    user: Optional[UserResponse] = Depends(get_current_user)
+):
+    """Send message and get Jung AI response."""
+    try:
+        context, sources, query_embedding = await _prepare_chat_turn(message_request, user)
         
         # Generate Jung AI response with conversation context
         ai_response = await openai_service.generate_jung_response(
             message_request.content,
             context,
-            []  # Would retrieve from Pinecone in production
+            sources,
+            query_embedding=query_embedding,
+            context_length=message_request.context_length,
+            priority=PRIORITY_AUTHENTICATED if user else PRIORITY_ANONYMOUS
         )
         
-        # Save user message to database
+        # Save both messages to database
         current_time = datetime.now().isoformat()
-        user_message_data = {
-            "session_id": message_request.session_id,
-            "role": "user",
-            "content": message_request.content,
-            "timestamp": current_time
-        }
-        
-        # Save assistant message to database
-        assistant_message_data = {
-            "session_id": message_request.session_id,
-            "role": "assistant",
-            "content": ai_response["response"],
-            "timestamp": current_time,
-            "model_used": ai_response["model_used"].value,
-            "tokens_used": ai_response["tokens_used"],
-            "cost_usd": ai_response["cost_usd"],
-            "analysis_type": ai_response.get("analysis_type"),
-            "therapeutic_techniques": ai_response.get("therapeutic_techniques")
-        }
-        
-        # Insert messages into database
-        try:
-            # Insert user message
-            user_msg_response = session_service.supabase.table("messages").insert(user_message_data).execute()
-            user_message_id = user_msg_response.data[0]["id"] if user_msg_response.data else None
-            
-            # Insert assistant message
-            assistant_msg_response = session_service.supabase.table("messages").insert(assistant_message_data).execute()
-            assistant_message_id = assistant_msg_response.data[0]["id"] if assistant_msg_response.data else None
-            
-        except Exception as e:
-            logger.error(f"Failed to save messages to database: {str(e)}")
-            # Generate fallback IDs
-            user_message_id = f"user-{int(datetime.now().timestamp() * 1000)}"
-            assistant_message_id = f"assistant-{int(datetime.now().timestamp() * 1000)}"
-        
-        # Update session stats
-        await session_service.increment_message_count(message_request.session_id)
-        await session_service.update_session_activity(message_request.session_id)
+        user_message_id, assistant_message_id = await _persist_chat_turn(
+            message_request.session_id,
+            message_request.content,
+            ai_response,
+            sources,
+            current_time,
+            user
+        )
         
         # Create response with proper message IDs
         response = ChatMessageResponse(
@@ -495,6 +603,7 @@ async def send_chat_message(
                 "model_used": ai_response["model_used"].value,
                 "tokens_used": ai_response["tokens_used"],
                 "cost_usd": ai_response["cost_usd"],
+                "sources": sources,
                 "analysis_type": ai_response.get("analysis_type"),
                 "therapeutic_techniques": ai_response.get("therapeutic_techniques")
             },
@@ -507,22 +616,84 @@ async def send_chat_message(
         raise e
     except Exception as e:
         logger.error(f"Chat message failed: {str(e)}")
-        # Provide more specific error messages for debugging
-        if "OpenAI API key not configured" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="OpenAI API key not configured. Please contact administrator."
-            )
-        elif "Daily budget exceeded" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Daily API budget exceeded. Please try again tomorrow."
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to process message: {str(e)}"
-            )
+        raise _chat_error_detail(e)
+
+@app.post("/chat/stream")
+@limiter.limit("10/minute")  # Same OpenAI cost protection as /chat/message
+async def stream_chat_message(
+    request: Request,
+    message_request: ChatMessageRequest,
+    user: Optional[UserResponse] = Depends(get_current_user)
+):
+    """Send message and stream the Jung AI response as server-sent events.
+    
+    Events: `sources` (retrieved passages), `delta` (response text as it is
+    generated), then `done` (message ids, cost and tokens) or `error`.
+    Messages are persisted once the stream completes.
+    """
+    try:
+        context, sources, query_embedding = await _prepare_chat_turn(message_request, user)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Chat stream setup failed: {str(e)}")
+        raise _chat_error_detail(e)
+    
+    session_id = message_request.session_id
+    
+    async def event_stream():
+        yield _sse_event("sources", {"sources": sources}, session_id)
+        try:
+            async for event in openai_service.generate_jung_response_stream(
+                message_request.content,
+                context,
+                sources,
+                query_embedding=query_embedding,
+                context_length=message_request.context_length,
+                priority=PRIORITY_AUTHENTICATED if user else PRIORITY_ANONYMOUS
+            ):
+                if event["type"] == "delta":
+                    yield _sse_event("delta", {"content": event["content"]}, session_id)
+                    continue
+                
+                current_time = datetime.now().isoformat()
+                user_message_id, assistant_message_id = await _persist_chat_turn(
+                    session_id,
+                    message_request.content,
+                    event,
+                    sources,
+                    current_time,
+                    user
+                )
+                yield _sse_event("done", {
+                    "user_message_id": user_message_id,
+                    "assistant_message_id": assistant_message_id,
+                    "timestamp": current_time,
+                    "model_used": event["model_used"].value,
+                    "tokens_used": event["tokens_used"],
+                    "cost_usd": event["cost_usd"],
+                    "cached": event["cached"],
+                    "response_time_ms": event["response_time_ms"],
+                    "first_token_ms": event.get("first_token_ms"),
+                    "prompt_tokens": event.get("prompt_tokens"),
+                    "analysis_type": event.get("analysis_type"),
+                    "therapeutic_techniques": event.get("therapeutic_techniques"),
+                    "cost_info": openai_service.get_cost_info().model_dump()
+                }, session_id)
+        except Exception as e:
+            logger.error(f"Chat stream failed: {str(e)}")
+            error = _chat_error_detail(e)
+            yield _sse_event("error", {
+                "detail": error.detail,
+                "status_code": error.status_code,
+                "retry_after": (error.headers or {}).get("Retry-After")
+            }, session_id)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Analytics endpoints
 @app.get("/analytics/costs")
@@ -541,7 +712,11 @@ async def get_cost_analytics(
             message="Cost analytics retrieved",
             data={
                 "cost_info": cost_info.dict(),
-                "cache_stats": cache_stats
+                "cache_stats": cache_stats,
+                "prompt_stats": openai_service.get_prompt_stats(),
+                "gateway_stats": llm_gateway.get_stats(),
+                "resilience_stats": openai_service.get_resilience_stats(),
+                "session_stats": session_service.get_stats()
             }
         )
     except Exception as e:
@@ -561,7 +736,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             detail=exc.detail,
             status_code=exc.status_code,
             error_type="HTTPException"
-        ).dict()
+        ).dict(),
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
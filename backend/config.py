@@ -26,29 +26,59 @@ class Settings(BaseSettings):
     supabase_url: str = Field(..., env="SUPABASE_URL")
     supabase_key: str = Field(..., env="SUPABASE_KEY")
     supabase_service_role_key: str = Field(..., env="SUPABASE_SERVICE_ROLE_KEY")
+    supabase_jwt_secret: Optional[str] = Field(default=None, env="SUPABASE_JWT_SECRET")  # Enables local token verification
     
     # Database connection pool (optimized for Railway)
     db_pool_size: int = Field(default=5, env="DB_POOL_SIZE")
     db_max_overflow: int = Field(default=10, env="DB_MAX_OVERFLOW")
     db_pool_timeout: int = Field(default=30, env="DB_POOL_TIMEOUT")
     
+    # Session queries, write-behind persistence and history caching
+    db_max_concurrency: int = Field(default=8, env="DB_MAX_CONCURRENCY")  # Supabase queries in flight
+    write_behind_queue_size: int = Field(default=256, env="WRITE_BEHIND_QUEUE_SIZE")  # Chat turns awaiting persistence
+    dead_letter_turns: int = Field(default=100, env="DEAD_LETTER_TURNS")  # Unwritten chat turns kept for inspection
+    history_cache_sessions: int = Field(default=512, env="HISTORY_CACHE_SESSIONS")  # Sessions with cached history
+    history_cache_messages: int = Field(default=100, env="HISTORY_CACHE_MESSAGES")  # Messages kept per session
+    
     # Authentication
     secret_key: str = Field(..., env="SECRET_KEY")
     algorithm: str = Field(default="HS256", env="ALGORITHM")
     access_token_expire_minutes: int = Field(default=30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
+    user_cache_ttl: int = Field(default=60, env="USER_CACHE_TTL")  # Seconds an authenticated user stays cached
+    user_cache_size: int = Field(default=1024, env="USER_CACHE_SIZE")
     
     # OpenAI Configuration
     openai_api_key: Optional[str] = Field(default=None, env="OPENAI_API_KEY")
     openai_organization: Optional[str] = Field(default=None, env="OPENAI_ORGANIZATION")
+    openai_base_url: Optional[str] = Field(default=None, env="OPENAI_BASE_URL")  # e.g. a local fake server
+    openai_timeout: float = Field(default=30, env="OPENAI_TIMEOUT")  # Seconds per attempt
+    openai_max_attempts: int = Field(default=3, env="OPENAI_MAX_ATTEMPTS")
+    openai_retry_base_ms: int = Field(default=250, env="OPENAI_RETRY_BASE_MS")
+    openai_retry_max_ms: int = Field(default=4000, env="OPENAI_RETRY_MAX_MS")
+    openai_call_budget: float = Field(default=45, env="OPENAI_CALL_BUDGET")  # Seconds for all attempts, including fallback
+    openai_hedge_enabled: bool = Field(default=False, env="OPENAI_HEDGE_ENABLED")  # Backup request after p95 latency
+    circuit_failure_threshold: int = Field(default=5, env="CIRCUIT_FAILURE_THRESHOLD")
+    circuit_reset_seconds: float = Field(default=30, env="CIRCUIT_RESET_SECONDS")
     
     # Cost Management
     daily_budget: float = Field(default=1.00, env="DAILY_BUDGET")
     monthly_budget: float = Field(default=25.00, env="MONTHLY_BUDGET")
+    spend_ledger_path: str = Field(default="data/spend_ledger.sqlite3", env="SPEND_LEDGER_PATH")  # Shared by all workers
+    spend_lease_usd: float = Field(default=0.05, env="SPEND_LEASE_USD")  # Budget each worker reserves at a time
+    spend_flush_usd: float = Field(default=0.01, env="SPEND_FLUSH_USD")
+    spend_flush_interval: float = Field(default=5, env="SPEND_FLUSH_INTERVAL")  # Seconds
     
     # OpenAI Model Configuration
     default_model: str = Field(default="gpt-3.5-turbo", env="DEFAULT_MODEL")
     complex_model: str = Field(default="gpt-4-turbo-preview", env="COMPLEX_MODEL")
     embedding_model: str = Field(default="text-embedding-ada-002", env="EMBEDDING_MODEL")
+    embedding_batch_window_ms: int = Field(default=5, env="EMBEDDING_BATCH_WINDOW_MS")  # Coalescing window
+    embedding_batch_max_size: int = Field(default=64, env="EMBEDDING_BATCH_MAX_SIZE")
+    openai_rpm_limit: int = Field(default=500, env="OPENAI_RPM_LIMIT")  # Chat requests per minute quota
+    openai_tpm_limit: int = Field(default=60000, env="OPENAI_TPM_LIMIT")  # Chat tokens per minute quota
+    llm_max_concurrency: int = Field(default=8, env="LLM_MAX_CONCURRENCY")
+    llm_queue_size: int = Field(default=32, env="LLM_QUEUE_SIZE")  # Waiting requests before shedding
+    llm_max_queue_wait: float = Field(default=30, env="LLM_MAX_QUEUE_WAIT")  # Seconds; longer estimates are shed
     
     # Pinecone Configuration
     pinecone_api_key: Optional[str] = Field(default=None, env="PINECONE_API_KEY")
@@ -71,11 +101,28 @@ class Settings(BaseSettings):
     # Caching
     cache_ttl: int = Field(default=3600, env="CACHE_TTL")  # 1 hour
     max_cache_size: int = Field(default=1000, env="MAX_CACHE_SIZE")
+    max_cache_bytes: int = Field(default=16 * 1024 * 1024, env="MAX_CACHE_BYTES")  # 16MB of cached responses
+    token_cache_size: int = Field(default=8192, env="TOKEN_CACHE_SIZE")  # Memoized token counts
+    semantic_cache_enabled: bool = Field(default=True, env="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_size: int = Field(default=512, env="SEMANTIC_CACHE_SIZE")
+    semantic_cache_threshold: float = Field(default=0.95, env="SEMANTIC_CACHE_THRESHOLD")  # Cosine similarity
     
     # Jung-specific settings
     max_context_length: int = Field(default=4000, env="MAX_CONTEXT_LENGTH")
     max_retrieval_chunks: int = Field(default=5, env="MAX_RETRIEVAL_CHUNKS")
     
+    # Local vector retrieval (in-process replacement for Pinecone)
+    vector_store_path: str = Field(default="data/jung_chunks.jvs", env="VECTOR_STORE_PATH")
+    retrieval_min_score: float = Field(default=0.0, env="RETRIEVAL_MIN_SCORE")
+    retrieval_index_mode: str = Field(default="exact", env="RETRIEVAL_INDEX_MODE")  # exact, int8 or ivf
+    retrieval_rescore_candidates: int = Field(default=100, env="RETRIEVAL_RESCORE_CANDIDATES")
+    ivf_nprobe: int = Field(default=8, env="IVF_NPROBE")  # Inverted lists visited per query
+    hybrid_retrieval: bool = Field(default=True, env="HYBRID_RETRIEVAL")  # BM25 + vector fusion
+    hybrid_candidates: int = Field(default=20, env="HYBRID_CANDIDATES")  # Depth of each ranking fused
+    rrf_k: int = Field(default=60, env="RRF_K")
+    bm25_k1: float = Field(default=1.2, env="BM25_K1")
+    bm25_b: float = Field(default=0.75, env="BM25_B")
+    
     # CORS settings
     cors_origins: str = Field(
         default="http://localhost:3000,https://*.vercel.app",
@@ -94,6 +141,8 @@ class Settings(BaseSettings):
         default="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         env="LOG_FORMAT"
     )
+    request_timing_enabled: bool = Field(default=True, env="REQUEST_TIMING_ENABLED")  # Server-Timing header and timing logs
+    timing_log_min_ms: float = Field(default=0, env="TIMING_LOG_MIN_MS")  # Only log requests slower than this
     
     # Health Check
     health_check_interval: int = Field(default=30, env="HEALTH_CHECK_INTERVAL")
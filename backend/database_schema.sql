@@ -239,6 +239,52 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
+-- Create function to persist a chat turn in one round trip:
+-- bulk-insert its messages and update the session stats atomically
+CREATE OR REPLACE FUNCTION append_chat_turn(session_id_param UUID, messages_param JSONB)
+RETURNS SETOF BIGINT AS $$
+BEGIN
+    RETURN QUERY
+    INSERT INTO messages (
+        session_id, role, content, timestamp, sources, analysis_type,
+        therapeutic_techniques, model_used, tokens_used, response_time_ms, cost_usd
+    )
+    SELECT
+        session_id_param, m.role, m.content, COALESCE(m.timestamp, NOW()), m.sources, m.analysis_type,
+        m.therapeutic_techniques, m.model_used, m.tokens_used, m.response_time_ms, m.cost_usd
+    FROM jsonb_to_recordset(messages_param) AS m(
+        role TEXT, content TEXT, timestamp TIMESTAMPTZ, sources JSONB, analysis_type TEXT,
+        therapeutic_techniques JSONB, model_used TEXT, tokens_used INTEGER, response_time_ms INTEGER, cost_usd TEXT
+    )
+    RETURNING id;
+
+    UPDATE sessions
+    SET message_count = message_count + jsonb_array_length(messages_param),
+        last_activity = NOW()
+    WHERE id = session_id_param;
+
+    UPDATE users
+    SET total_messages = total_messages + jsonb_array_length(messages_param)
+    WHERE id = (SELECT user_id FROM sessions WHERE id = session_id_param);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Create function to adjust user counters atomically (deltas may be negative)
+CREATE OR REPLACE FUNCTION increment_user_counters(
+    user_id_param BIGINT,
+    sessions_delta INTEGER DEFAULT 0,
+    messages_delta INTEGER DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE users
+    SET total_sessions = GREATEST(0, total_sessions + sessions_delta),
+        total_messages = GREATEST(0, total_messages + messages_delta),
+        updated_at = NOW()
+    WHERE id = user_id_param;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
 -- Create function to get user session context
 CREATE OR REPLACE FUNCTION get_user_session_context(
     user_id_param BIGINT,
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for building the Jung system prompt on each request.
+
+Builds prompts for a rotating set of session contexts and retrieved sources
+and reports per-build latency. For comparison it also times tokenizing the
+whole system message, which is what counting it costs when no part of it is
+cached. Finally it checks that every prompt starts with the same static
+persona prefix.
+
+Usage (from backend/):
+    python -m scripts.benchmark_prompt --iterations 2000
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from models.schemas import ModelType
+from services.jung_persona import JUNG_PERSONA_PROMPT
+from services.openai_service import openai_service
+from services.token_counter import token_counter
+
+SOURCES = [
+    {"text": "The shadow is a moral problem that challenges the whole ego-personality. " * 4,
+     "source": "Aion", "page": 8},
+    {"text": "The archetypes are the unconscious images of the instincts themselves. " * 4,
+     "source": "The Archetypes and the Collective Unconscious", "page": 44},
+    {"text": "Dreams are impartial, spontaneous products of the unconscious psyche. " * 4,
+     "source": "Civilization in Transition", "page": 149},
+]
+
+
+def contexts(count: int) -> List[Dict[str, Any]]:
+    """Varied per-request contexts: first encounters and returning users."""
+    result = []
+    for i in range(count):
+        context: Dict[str, Any] = {"session_type": ["general", "dream_analysis", "shadow_work"][i % 3],
+                                   "conversation_history": []}
+        if i % 2:
+            context.update({
+                "previous_sessions": [{"id": str(n)} for n in range(i % 5 + 1)],
+                "recurring_themes": ["mother complex", "persona"],
+                "therapeutic_goals": ["integrate the shadow"],
+            })
+        result.append(context)
+    return result
+
+
+def time_calls(fn: Callable[[int], Any], iterations: int) -> Dict[str, float]:
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return {
+        "p50_us": round(float(np.percentile(latencies, 50)), 1),
+        "p99_us": round(float(np.percentile(latencies, 99)), 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark per-request Jung prompt building")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    variants = contexts(30)
+    prompts: List[str] = []
+
+    def build(i: int) -> None:
+        messages, _ = openai_service._build_jung_prompt(
+            f"I keep dreaming about a locked door ({i}).", variants[i % len(variants)], SOURCES[: i % 4]
+        )
+        prompts.append(messages[0]["content"])
+
+    build_stats = time_calls(build, args.iterations)
+    encoder = token_counter.encoder(ModelType.GPT_35_TURBO.value)
+    full_count_stats = time_calls(lambda i: encoder.encode(prompts[i]), args.iterations)
+
+    report = {
+        "iterations": args.iterations,
+        "persona_tokens": openai_service.persona_tokens,
+        "build_prompt": build_stats,
+        "tokenize_full_system_message": full_count_stats,
+        "distinct_system_messages": len(set(prompts)),
+        "shared_prefix": all(prompt.startswith(JUNG_PERSONA_PROMPT) for prompt in prompts),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent GET /sessions/{id} with blocking vs thread-pooled Supabase calls.
+
+The Supabase client is replaced by an in-process fake whose ``execute()``
+sleeps for a fixed latency, standing in for a PostgREST round trip. Requests
+go through the real FastAPI app over an in-memory ASGI transport.
+
+  blocking  query.execute() called on the event loop (the previous behaviour)
+  pooled    SessionService.execute() on the bounded database thread pool
+
+Usage (from backend/):
+    python -m scripts.benchmark_sessions --requests 200 --concurrency 50 --latency-ms 40
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+from api.main import app, limiter
+from services.session_service import session_service
+
+
+class FakeQuery:
+    """Chainable stand-in for a PostgREST query builder."""
+
+    def __init__(self, rows: List[Dict[str, Any]], latency: float):
+        self._rows = rows
+        self._latency = latency
+
+    def __getattr__(self, name):
+        # select/eq/order/limit/... all return the same query
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        time.sleep(self._latency)
+        return SimpleNamespace(data=self._rows)
+
+
+class FakeSupabase:
+    """Synchronous client returning one anonymous session after a fixed delay."""
+
+    def __init__(self, session: Dict[str, Any], latency: float):
+        self._session = session
+        self._latency = latency
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery([self._session], self._latency)
+
+
+async def run(mode: str, session_id: str, requests: int, concurrency: int) -> Dict[str, float]:
+    """Issue `requests` GETs with at most `concurrency` in flight and time them."""
+    pooled_execute = session_service.execute
+
+    async def blocking_execute(query):
+        return query.execute()
+
+    session_service.execute = blocking_execute if mode == "blocking" else pooled_execute
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench.railway.app") as client:
+        async def one() -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"/sessions/{session_id}")
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    session_service.execute = pooled_execute
+    return {
+        "requests_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark concurrent session reads")
+    parser.add_argument("--requests", type=int, default=200, help="total requests per mode")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight")
+    parser.add_argument("--latency-ms", type=float, default=40, help="simulated PostgREST round trip")
+    args = parser.parse_args()
+
+    now = datetime.utcnow().isoformat()
+    session = {
+        "id": str(uuid.uuid4()), "user_id": None, "title": "Benchmark", "is_anonymous": True,
+        "created_at": now, "updated_at": now, "last_activity": now, "is_active": True,
+        "session_type": "general", "message_count": 0, "duration_minutes": 0,
+    }
+    session_service.demo_mode = False
+    session_service.supabase = FakeSupabase(session, args.latency_ms / 1000)
+    limiter.enabled = False
+
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms,
+        "db_max_concurrency": session_service.settings.db_max_concurrency,
+        "modes": {},
+    }
+    for mode in ("blocking", "pooled"):
+        report["modes"][mode] = asyncio.run(run(mode, session["id"], args.requests, args.concurrency))
+
+    print(json.dumps(report, indent=2))
+    session_service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Build the memory-mapped Jung vector store from a chunk dump.
+
+The input is JSON Lines, one chunk per line:
+
+    {"chunk_id": "cw9i-0042", "text": "...", "source": "Archetypes and the
+     Collective Unconscious", "volume": "9i", "page": 42,
+     "concepts": ["shadow"], "embedding": [0.01, ...]}
+
+Page metadata may also be nested under a "metadata" key. Records with
+"page_chunks": 0 mark empty pages for ingest_corpus.py's checkpoint and are
+skipped.
+
+Usage (from backend/):
+    python -m scripts.build_vector_store chunks.jsonl --output data/jung_chunks.jvs
+    python -m scripts.build_vector_store chunks.jsonl --int8   # also write int8 codes
+    python -m scripts.build_vector_store chunks.jsonl --ivf    # also train the IVF index
+    python -m scripts.build_vector_store chunks.jsonl --bm25   # also build the BM25 index
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from services.lexical_index import BM25Index
+from services.vector_index import Int8Index, IVFIndex
+from services.vector_store import VectorStoreWriter, citation_fields, open_vector_store
+
+logger = logging.getLogger("build_vector_store")
+
+DEFAULT_OUTPUT = "data/jung_chunks.jvs"
+METADATA_FIELDS = ("chunk_id", "text", "source", "volume", "page", "year", "concepts")
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield chunk records from a JSON Lines dump."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})")
+            if record.get("page_chunks") == 0:
+                continue
+            yield record
+
+
+def split_record(record: Dict[str, Any], index: int) -> Tuple[Any, Dict[str, Any]]:
+    """Separate the embedding from the citation metadata of a chunk."""
+    embedding = record.get("embedding")
+    if embedding is None:
+        raise ValueError(f"Chunk {record.get('chunk_id', index)} has no embedding")
+
+    merged = {**record.get("metadata", {}), **record}
+    metadata = {field: merged.get(field) for field in METADATA_FIELDS}
+    metadata["chunk_id"] = str(metadata["chunk_id"] if metadata["chunk_id"] is not None else index)
+    metadata["concepts"] = metadata["concepts"] or []
+    metadata["volume"], metadata["page"] = citation_fields(metadata["volume"], metadata["page"])
+    return embedding, metadata
+
+
+def scan_dump(path: str) -> Tuple[int, int]:
+    """First pass: count chunks and read the embedding dimension."""
+    count, dim = 0, 0
+    for record in iter_records(path):
+        if dim == 0:
+            dim = len(record.get("embedding") or [])
+        count += 1
+    return count, dim
+
+
+def build(input_path: str, output_path: str) -> int:
+    """Convert a chunk dump into the binary vector store format."""
+    start_time = time.perf_counter()
+    count, dim = scan_dump(input_path)
+    if count == 0 or dim == 0:
+        raise ValueError(f"No embedded chunks found in {input_path}")
+
+    writer = VectorStoreWriter(output_path, count, dim)
+    try:
+        for index, record in enumerate(iter_records(input_path)):
+            embedding, metadata = split_record(record, index)
+            writer.add(embedding, metadata)
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Built {output_path}: {count} chunks x {dim} dims in {elapsed:.1f}s")
+    return count
+
+
+def build_indexes(store_path: str, int8: bool = False, ivf: bool = False, bm25: bool = False,
+                  nlist: Optional[int] = None) -> None:
+    """Build the optional sidecar indexes for a store and print a summary."""
+    store = open_vector_store(store_path)
+    print(f"✅ {store_path}: {len(store)} chunks, {store.dim} dims, {store.nbytes / (1024 * 1024):.1f} MB of vectors")
+    if int8:
+        codes_path = Int8Index.build(store)
+        print(f"✅ {codes_path}: int8 codes, {store.count * store.dim / (1024 * 1024):.1f} MB")
+    if ivf:
+        ivf_path = IVFIndex.build(store, nlist=nlist)
+        print(f"✅ {ivf_path}: IVF index")
+    if bm25:
+        bm25_path = BM25Index.build(store_path, (chunk.get("text", "") for chunk in store.iter_chunks()))
+        print(f"✅ {bm25_path}: BM25 inverted index")
+    store.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the Jung vector store from a chunk dump")
+    parser.add_argument("input", help="JSON Lines chunk dump with embeddings")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"store file to write (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--int8", action="store_true", help="also build the int8 quantized index")
+    parser.add_argument("--ivf", action="store_true", help="also build the IVF approximate index")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF list count (default: sqrt of chunk count)")
+    parser.add_argument("--bm25", action="store_true", help="also build the BM25 inverted index")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    try:
+        build(args.input, args.output)
+    except Exception as e:
+        logger.error(f"Build failed: {str(e)}")
+        return 1
+
+    build_indexes(args.output, int8=args.int8, ivf=args.ivf, bm25=args.bm25, nlist=args.nlist)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
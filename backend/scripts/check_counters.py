@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Concurrency check for the session and user counters.
+
+Fires N parallel increments through SessionService and AuthService against
+the SQLite stand-in for Supabase (scripts/fake_supabase.py), then asserts
+the exact final counts. Each RPC is executed as the same single UPDATE
+statement that the SQL function in database_schema.sql runs. For
+comparison, the previous read-modify-write pattern is run against the same
+database, with a simulated round trip between its SELECT and UPDATE, and
+its lost updates are reported.
+
+Usage (from backend/):
+    python -m scripts.check_counters --increments 200 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Dict, Tuple
+
+from scripts.fake_supabase import FakeSupabase
+from services.auth_service import auth_service
+from services.session_service import session_service
+
+SESSION_ID = "00000000-0000-0000-0000-000000000001"
+USER_ID = 1
+
+
+def reset(db: FakeSupabase) -> None:
+    db.run("DELETE FROM sessions", [])
+    db.run("DELETE FROM users", [])
+    db.run("INSERT INTO sessions (id) VALUES (?)", [SESSION_ID])
+    db.run("INSERT INTO users (id) VALUES (?)", [USER_ID])
+
+
+def counters(db: FakeSupabase) -> Dict[str, int]:
+    session = db.run("SELECT message_count FROM sessions WHERE id = ?", [SESSION_ID])[0]
+    user = db.run("SELECT total_sessions, total_messages FROM users WHERE id = ?", [USER_ID])[0]
+    return {"message_count": session["message_count"], **user}
+
+
+async def read_modify_write(db: FakeSupabase) -> None:
+    """The previous increment: SELECT the count, then UPDATE it to count + 1."""
+    response = await session_service.execute(db.table("sessions").select("message_count").eq("id", SESSION_ID))
+    current_count = response.data[0]["message_count"]
+    await session_service.execute(db.table("sessions").update({"message_count": current_count + 1}).eq("id", SESSION_ID))
+
+
+async def atomic(increments: int) -> None:
+    """Concurrent increments through the service methods."""
+    user_message_calls = [
+        auth_service.update_user_stats(USER_ID, new_message=True)
+        for _ in range(increments)
+    ]
+    await asyncio.gather(
+        *(session_service.increment_message_count(SESSION_ID) for _ in range(increments)),
+        *(session_service._update_user_session_count(USER_ID, increment=True) for _ in range(increments)),
+        *user_message_calls,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check counters under concurrent increments")
+    parser.add_argument("--increments", type=int, default=200, help="parallel increments per counter")
+    parser.add_argument("--latency-ms", type=float, default=5, help="simulated round trip per statement")
+    args = parser.parse_args()
+
+    db = FakeSupabase(latency_ms=args.latency_ms)
+    session_service.demo_mode = False
+    session_service.supabase = db
+    auth_service.supabase = db
+
+    async def run() -> Tuple[int, Dict[str, int], float]:
+        # One event loop for both phases; the service's semaphore is bound to it
+        reset(db)
+        await asyncio.gather(*(read_modify_write(db) for _ in range(args.increments)))
+        legacy_count = counters(db)["message_count"]
+
+        reset(db)
+        start = time.perf_counter()
+        await atomic(args.increments)
+        return legacy_count, counters(db), time.perf_counter() - start
+
+    legacy_count, counts, elapsed = asyncio.run(run())
+
+    expected = {"message_count": args.increments, "total_sessions": args.increments, "total_messages": args.increments}
+    report = {
+        "increments": args.increments,
+        "read_modify_write": {"message_count": legacy_count, "lost_updates": args.increments - legacy_count},
+        "atomic": {**counts, "elapsed_s": round(elapsed, 2)},
+        "ok": counts == expected,
+    }
+    print(json.dumps(report, indent=2))
+    session_service.shutdown()
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
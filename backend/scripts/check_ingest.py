@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Resume check for the streaming ingestion pipeline.
+
+Writes a synthetic corpus (with a few empty pages), then ingests it with the
+deterministic fake embedder in three runs:
+
+  crash     the embedder fails after a number of calls, and a torn half-line
+            is appended to the dump as if the process died mid-write
+  resume    a clean run over the same pages; only unfinished pages are embedded
+  rerun     nothing is left to do, so every page, empty ones included, is skipped
+
+It then asserts that every page is in the dump exactly once with all of its
+chunks, that the embeddings match the fake embedder, and that the dump
+builds into a vector store, and reports the per-run stats as JSON.
+
+Usage (from backend/):
+    python -m scripts.check_ingest --pages 200 --fail-after 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+import numpy as np
+
+from scripts.build_vector_store import build
+from scripts.ingest_corpus import (
+    EmbedFunction, IngestionPipeline, fake_embedding, load_checkpoint, make_fake_embedder, page_key
+)
+from services.vector_store import open_vector_store
+
+DIM = 64
+WORDS = ["shadow", "anima", "persona", "dream", "mandala", "complex", "psyche", "symbol", "myth", "ego"]
+
+
+def write_pages(path: str, count: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(11)
+    pages = []
+    for number in range(1, count + 1):
+        # Every 17th page is blank, like plates and section breaks in the scans
+        words = [] if number % 17 == 0 else rng.choice(WORDS, size=int(rng.integers(40, 400))).tolist()
+        pages.append({"source": "Psychology and Alchemy", "volume": "12", "page": number,
+                      "year": 1944, "text": " ".join(words)})
+    with open(path, "w", encoding="utf-8") as f:
+        for page in pages:
+            f.write(json.dumps(page) + "\n")
+    return pages
+
+
+def failing_after(embed: EmbedFunction, calls: int) -> EmbedFunction:
+    remaining = [calls]
+
+    async def flaky(texts: List[str]) -> List[List[float]]:
+        if remaining[0] <= 0:
+            raise RuntimeError("embedding API unavailable")
+        remaining[0] -= 1
+        return await embed(texts)
+    return flaky
+
+
+def make_pipeline(dump_path: str, embed: EmbedFunction, args) -> IngestionPipeline:
+    return IngestionPipeline(dump_path, embed, chunk_tokens=80, overlap_tokens=10,
+                             page_group=args.page_group, batch_size=16,
+                             concurrency=args.concurrency, workers=args.workers)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check that an interrupted ingestion resumes exactly")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--fail-after", type=int, default=5, help="embedding calls before the first run fails")
+    parser.add_argument("--page-group", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    pages_path = os.path.join(tmp, "pages.jsonl")
+    dump_path = os.path.join(tmp, "chunks.jsonl")
+    pages = write_pages(pages_path, args.pages)
+    embed = make_fake_embedder(DIM)
+    report: Dict[str, Any] = {}
+
+    crash = make_pipeline(dump_path, failing_after(embed, args.fail_after), args)
+    try:
+        asyncio.run(crash.run(iter(pages)))
+        report["crash"] = {"error": None}
+    except RuntimeError as e:
+        report["crash"] = {"error": str(e), "pages_written": crash.pages_written}
+    with open(dump_path, "a", encoding="utf-8") as f:
+        f.write('{"chunk_id": "torn", "text": "half a rec')
+    finished_before = len(load_checkpoint(dump_path))
+
+    report["resume"] = asyncio.run(make_pipeline(dump_path, embed, args).run(iter(pages)))
+    report["rerun"] = asyncio.run(make_pipeline(dump_path, embed, args).run(iter(pages)))
+
+    chunks_per_page: Dict[str, int] = {}
+    expected_per_page: Dict[str, int] = {}
+    mismatched = 0
+    with open(dump_path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            key = record["page_key"]
+            chunks_per_page[key] = chunks_per_page.get(key, 0) + 1
+            expected_per_page[key] = record["page_chunks"]
+            if record["page_chunks"] and not np.allclose(record["embedding"], fake_embedding(record["text"], DIM)):
+                mismatched += 1
+
+    keys = [page_key(page) for page in pages]
+    empty = sum(1 for page in pages if not page["text"])
+    incomplete = [key for key in keys if key not in chunks_per_page
+                  or chunks_per_page[key] != max(1, expected_per_page[key])]
+
+    store_path = os.path.join(tmp, "chunks.jvs")
+    stored = build(dump_path, store_path)
+    store = open_vector_store(store_path)
+    stored_pages = {chunk["page"] for chunk in store.iter_chunks()}
+    store.close()
+
+    report["checks"] = {
+        "pages": len(pages),
+        "empty_pages": empty,
+        "finished_before_resume": finished_before,
+        "incomplete_or_duplicated": len(incomplete),
+        "embedding_mismatches": mismatched,
+        "stored_chunks": stored,
+        "stored_pages": len(stored_pages),
+    }
+    ok = (
+        report["crash"]["error"] is not None
+        and 0 < finished_before < len(pages)
+        and report["resume"]["pages_skipped"] == finished_before
+        and report["resume"]["pages_written"] == len(pages) - finished_before
+        and report["rerun"]["pages_skipped"] == len(pages)
+        and report["rerun"]["pages_written"] == 0
+        and not incomplete
+        and mismatched == 0
+        and len(stored_pages) == len(pages) - empty
+    )
+    report["ok"] = ok
+    print(json.dumps(report, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Resilience check for OpenAI chat calls against the fake server.
+
+Runs OpenAIService against scripts.fake_openai in three phases:
+
+  flaky     10% of requests fail with 500 or 429; retries should hide them
+  degraded  the complex model always fails; its circuit should open and
+            calls should fall back to gpt-3.5-turbo
+  slow      a share of requests are slow; with hedging, backup requests
+            should cut tail latency
+
+It then reports success rates, latency percentiles and circuit/hedge stats
+as JSON.
+
+Usage (from backend/):
+    python -m scripts.check_resilience --requests 100 --port 8901
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    return {f"p{p}_ms": round(float(np.percentile(latencies, p)) * 1000, 1) for p in (50, 95, 99)}
+
+
+async def run_phase(service, requests: int, concurrency: int, model) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    models: Dict[str, int] = {}
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                # Unique prompts so the response cache and single-flight stay out of the way
+                result = await service.generate_response(f"question {i} {time.time_ns()}", model=model, max_tokens=20)
+                latencies.append(time.perf_counter() - start)
+                models[result["model_used"].value] = models.get(result["model_used"].value, 0) + 1
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return {
+        "succeeded": len(latencies),
+        "errors": errors,
+        "models_used": models,
+        **percentiles(latencies),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check retries, fallback and hedging against a fake OpenAI server")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.port}/v1",
+        "OPENAI_HEDGE_ENABLED": "true",
+        "OPENAI_MAX_ATTEMPTS": "4",
+        "OPENAI_RETRY_BASE_MS": "20",
+        "OPENAI_RETRY_MAX_MS": "200",
+        "CIRCUIT_RESET_SECONDS": "60",
+        "SPEND_LEDGER_PATH": os.path.join(tmp, "spend.sqlite3"),
+        "OPENAI_RPM_LIMIT": "100000",
+        "OPENAI_TPM_LIMIT": "10000000",
+        "DAILY_BUDGET": "1000",
+        "MONTHLY_BUDGET": "10000",
+    })
+
+    from models.schemas import ModelType
+    from scripts.fake_openai import create_app, serve_in_thread
+    from services.openai_service import openai_service
+
+    app = create_app({"latency_ms": 30, "jitter_ms": 10}, seed=7)
+    server = serve_in_thread(app, args.port)
+    faults = app.state.faults
+
+    async def run() -> Dict[str, Any]:
+        report: Dict[str, Any] = {}
+
+        # Warm up latency history so the hedger has a p95 to work from
+        await run_phase(openai_service, 40, args.concurrency, ModelType.GPT_35_TURBO)
+
+        faults.update(error_rate=0.1, error_status=500)
+        report["flaky_500"] = await run_phase(openai_service, args.requests, args.concurrency, ModelType.GPT_35_TURBO)
+        faults.update(error_status=429)
+        report["flaky_429"] = await run_phase(openai_service, args.requests, args.concurrency, ModelType.GPT_35_TURBO)
+
+        faults.update(error_rate=0.0, error_status=500, failing_models=[ModelType.GPT_4_TURBO.value])
+        report["degraded"] = await run_phase(openai_service, args.requests, args.concurrency, ModelType.GPT_4_TURBO)
+        faults.update(failing_models=[])
+
+        faults.update(slow_rate=0.1, slow_ms=1500)
+        hedger, openai_service.hedger = openai_service.hedger, None
+        report["slow_without_hedging"] = await run_phase(openai_service, args.requests, args.concurrency, ModelType.GPT_35_TURBO)
+        openai_service.hedger = hedger
+        report["slow_with_hedging"] = await run_phase(openai_service, args.requests, args.concurrency, ModelType.GPT_35_TURBO)
+
+        report["resilience_stats"] = openai_service.get_resilience_stats()
+        report["fake_server_requests"] = app.state.requests
+        return report
+
+    report = asyncio.run(run())
+    server.should_exit = True
+    openai_service.spend_ledger.close()
+
+    report["ok"] = (
+        report["flaky_500"]["succeeded"] == args.requests
+        and report["flaky_429"]["succeeded"] == args.requests
+        and report["degraded"]["models_used"].get(ModelType.GPT_35_TURBO.value) == args.requests
+        and report["resilience_stats"]["circuits"][ModelType.GPT_4_TURBO.value]["state"] == "open"
+    )
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Multi-process check for the shared spend ledger.
+
+Starts N worker processes that share one ledger file and a small daily
+budget. Each worker reserves an estimated cost, "spends" a random fraction
+of it, and records the actual cost, until the ledger denies it. The check
+then compares the settled total against the budget. Every call's estimate
+is reserved before it runs and actual costs never exceed it, so the total
+must not pass the budget at all.
+
+Two cases run on fresh ledgers: one call at a time per worker, and
+`--concurrency` calls in flight per worker through the async API, so
+reservations that overlap on one lease are exercised too.
+
+Usage (from backend/):
+    python -m scripts.check_spend_ledger --workers 4 --budget 1.0 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict
+
+from services.spend_ledger import SpendLedger
+
+
+def worker(path: str, budget: float, lease_usd: float, estimate: float, concurrency: int,
+           seed: int, results) -> None:
+    ledger = SpendLedger(path, daily_budget=budget, monthly_budget=budget * 30,
+                         lease_usd=lease_usd, flush_usd=lease_usd / 4, flush_interval=0.5)
+    rng = random.Random(seed)
+    calls = 0
+
+    async def caller() -> None:
+        nonlocal calls
+        while await ledger.reserve_async(estimate):
+            # Other callers reserve from the same lease while this call is in flight
+            await asyncio.sleep(rng.uniform(0, 0.002))
+            await ledger.record_async(estimate * rng.uniform(0.3, 1.0), estimate)
+            calls += 1
+
+    if concurrency > 1:
+        async def run() -> None:
+            await asyncio.gather(*(caller() for _ in range(concurrency)))
+        asyncio.run(run())
+    else:
+        while ledger.reserve(estimate):
+            ledger.record(estimate * rng.uniform(0.3, 1.0), estimate)
+            calls += 1
+    ledger_reads = ledger.leases_acquired + ledger.flushes
+    ledger.close()
+    results.put({"calls": calls, "ledger_round_trips": ledger_reads})
+
+
+def run_case(args, concurrency: int) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spend.sqlite3")
+        results = multiprocessing.Queue()
+        start = time.perf_counter()
+        processes = [
+            multiprocessing.Process(
+                target=worker,
+                args=(path, args.budget, args.lease, args.estimate, concurrency, i, results)
+            )
+            for i in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        per_worker = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        ledger = SpendLedger(path, daily_budget=args.budget, monthly_budget=args.budget * 30)
+        ledger.reserve(0)
+        spent = ledger.daily_spend
+        ledger.close()
+
+    calls = sum(result["calls"] for result in per_worker)
+    round_trips = sum(result["ledger_round_trips"] for result in per_worker)
+    report: Dict[str, object] = {
+        "calls_in_flight_per_worker": concurrency,
+        "spent_usd": round(spent, 6),
+        "overspend_usd": round(max(0.0, spent - args.budget), 6),
+        "calls": calls,
+        "ledger_round_trips_per_call": round(round_trips / calls, 3) if calls else 0,
+        "elapsed_s": round(elapsed, 2),
+    }
+    report["ok"] = spent <= args.budget + 1e-9 and spent >= args.budget * 0.9
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check budget enforcement across worker processes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--budget", type=float, default=1.0, help="daily budget in USD")
+    parser.add_argument("--lease", type=float, default=0.05, help="lease size in USD")
+    parser.add_argument("--estimate", type=float, default=0.002, help="estimated cost per call in USD")
+    parser.add_argument("--concurrency", type=int, default=16, help="calls in flight per worker in the concurrent case")
+    args = parser.parse_args()
+
+    report: Dict[str, object] = {
+        "workers": args.workers,
+        "budget_usd": args.budget,
+        "sequential": run_case(args, 1),
+        "concurrent": run_case(args, args.concurrency),
+    }
+    report["ok"] = report["sequential"]["ok"] and report["concurrent"]["ok"]
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
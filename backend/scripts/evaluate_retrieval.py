@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Report recall@k and latency of each retrieval index against exact search.
+
+Queries are either embeddings from a JSON Lines file ({"embedding": [...]}
+per line) or, by default, stored chunk vectors perturbed with Gaussian noise
+so they do not trivially match themselves.
+
+Usage (from backend/):
+    python -m scripts.evaluate_retrieval data/jung_chunks.jvs --k 5 --queries 200
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from services.vector_index import ExactIndex, Int8Index, IVFIndex, recall_at_k
+from services.vector_store import open_vector_store
+
+
+def load_queries(store, path: str, count: int, noise: float, seed: int) -> np.ndarray:
+    """Load query embeddings from a file or synthesise them from the store."""
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            queries = np.array([json.loads(line)["embedding"] for line in f if line.strip()], dtype=np.float32)
+    else:
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(store.count, size=min(count, store.count), replace=False)
+        queries = np.asarray(store.vectors[np.sort(rows)], dtype=np.float32)
+        queries += rng.normal(0, noise, size=queries.shape).astype(np.float32)
+
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return queries / norms
+
+
+def measure(index, exact: ExactIndex, queries: np.ndarray, k: int) -> Dict[str, float]:
+    """Recall@k plus single-query latency percentiles for one index."""
+    latencies: List[float] = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[np.newaxis, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "recall_at_k": round(recall_at_k(index, exact, queries, k), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare retrieval indexes against exact search")
+    parser.add_argument("store", help="vector store file")
+    parser.add_argument("--k", type=int, default=5, help="number of results per query")
+    parser.add_argument("--queries", type=int, default=200, help="synthetic queries to sample")
+    parser.add_argument("--query-file", default="", help="JSON Lines file of query embeddings")
+    parser.add_argument("--noise", type=float, default=0.02, help="noise added to synthetic queries")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[50, 100, 200],
+                        help="int8 re-scoring candidate counts to try")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32],
+                        help="IVF probe counts to try")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    store = open_vector_store(args.store)
+    if store is None:
+        print(f"❌ Vector store not found: {args.store}")
+        return 1
+
+    queries = load_queries(store, args.query_file, args.queries, args.noise, args.seed)
+    exact = ExactIndex(store)
+    report = {"chunks": store.count, "queries": len(queries), "k": args.k, "indexes": {}}
+    report["indexes"]["exact"] = measure(exact, exact, queries, args.k)
+
+    int8 = Int8Index.load(store)
+    if int8 is not None:
+        for candidates in args.candidates:
+            int8.candidates = candidates
+            report["indexes"][f"int8/{candidates}"] = measure(int8, exact, queries, args.k)
+
+    ivf = IVFIndex.load(store)
+    if ivf is not None:
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            report["indexes"][f"ivf/{nprobe}"] = measure(ivf, exact, queries, args.k)
+
+    print(json.dumps(report, indent=2))
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Fake OpenAI API with configurable latency, token rates and injected errors.
+
+Serves `POST /v1/chat/completions` (streaming and non-streaming) and
+`POST /v1/embeddings` in the OpenAI response formats. The backend can run
+against it via OPENAI_BASE_URL=http://127.0.0.1:8900/v1.
+
+Each request waits out a time to first token, drawn from a fixed, uniform
+or lognormal distribution. Chat completions then emit `completion_tokens`
+words at `tokens_per_second`. Embeddings are deterministic unit vectors
+derived from the input text.
+
+Settings live in a mutable dict (`app.state.faults`). Tests started
+in-process can change them between phases, and `POST /_faults` changes
+them over HTTP. With a fixed `seed`, the same request sequence sees the
+same latencies and errors.
+
+Usage (from backend/):
+    python -m scripts.fake_openai --port 8900 --latency-ms 200 --latency-dist lognormal --error-rate 0.1
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_FAULTS: Dict[str, Any] = {
+    "latency_ms": 50.0,            # Time to first token (median for lognormal)
+    "latency_dist": "uniform",     # fixed, uniform or lognormal
+    "jitter_ms": 10.0,             # Uniform: extra latency up to this much
+    "sigma": 0.5,                  # Lognormal: spread around the median
+    "tokens_per_second": 0.0,      # Generation rate; 0 returns the whole reply at once
+    "completion_tokens": 40,       # Words per chat reply
+    "embedding_latency_ms": 20.0,
+    "embedding_dimensions": 1536,
+    "slow_rate": 0.0,              # Share of requests that take slow_ms instead
+    "slow_ms": 2000.0,
+    "error_rate": 0.0,             # Share of requests answered with error_status
+    "error_status": 500,
+    "failing_models": [],          # Models that always answer with error_status
+}
+
+WORDS = ("the shadow persona anima animus self archetype dream symbol complex "
+         "individuation unconscious collective image myth psyche").split()
+
+
+def create_app(faults: Optional[Dict[str, Any]] = None, seed: Optional[int] = None) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    app.state.faults = {**DEFAULT_FAULTS, **(faults or {})}
+    app.state.requests = 0
+    rng = random.Random(seed)
+
+    def first_token_delay() -> float:
+        faults = app.state.faults
+        if rng.random() < faults["slow_rate"]:
+            return faults["slow_ms"] / 1000
+        base = faults["latency_ms"]
+        if faults["latency_dist"] == "lognormal":
+            return base * rng.lognormvariate(0, faults["sigma"]) / 1000
+        if faults["latency_dist"] == "uniform":
+            return (base + rng.uniform(0, faults["jitter_ms"])) / 1000
+        return base / 1000
+
+    def injected_error(model: Optional[str]) -> Optional[JSONResponse]:
+        faults = app.state.faults
+        if model in faults["failing_models"] or rng.random() < faults["error_rate"]:
+            status_code = int(faults["error_status"])
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": {"message": "Injected failure", "type": "server_error", "code": None}},
+                headers={"retry-after": "0"} if status_code == 429 else None
+            )
+        return None
+
+    def reply_words(model: str) -> List[str]:
+        count = max(1, int(app.state.faults["completion_tokens"]))
+        return [f"Fake reply from {model}:"] + [WORDS[i % len(WORDS)] for i in range(count - 1)]
+
+    @app.post("/_faults")
+    async def set_faults(request: Request):
+        app.state.faults.update(await request.json())
+        return app.state.faults
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        request_id = f"chatcmpl-fake-{app.state.requests}"
+        model = body.get("model")
+
+        await asyncio.sleep(first_token_delay())
+        error = injected_error(model)
+        if error is not None:
+            return error
+
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+        words = reply_words(model)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+        rate = app.state.faults["tokens_per_second"]
+
+        if not body.get("stream"):
+            if rate:
+                await asyncio.sleep(len(words) / rate)
+            return {
+                "id": request_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, chunk_usage=None) -> str:
+            payload = {
+                "id": request_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [] if chunk_usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                "usage": chunk_usage,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            for i, word in enumerate(words):
+                if rate and i:
+                    await asyncio.sleep(1 / rate)
+                yield chunk({"content": word if i == 0 else " " + word})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk({}, chunk_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        texts = body.get("input")
+        texts = [texts] if isinstance(texts, str) else texts
+
+        await asyncio.sleep(app.state.faults["embedding_latency_ms"] / 1000)
+        error = injected_error(body.get("model"))
+        if error is not None:
+            return error
+
+        dimensions = int(app.state.faults["embedding_dimensions"])
+        data = []
+        for index, text in enumerate(texts):
+            seed_bytes = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+            vector = np.random.default_rng(int.from_bytes(seed_bytes, "little")).standard_normal(dimensions)
+            vector /= np.linalg.norm(vector)
+            data.append({"object": "embedding", "index": index, "embedding": vector.astype(np.float32).tolist()})
+
+        tokens = sum(len(text.split()) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    return app
+
+
+def serve_in_thread(app: FastAPI, port: int) -> uvicorn.Server:
+    """Start an app on a background thread and wait until it accepts requests."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI API server")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_FAULTS["latency_ms"])
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="uniform")
+    parser.add_argument("--jitter-ms", type=float, default=DEFAULT_FAULTS["jitter_ms"])
+    parser.add_argument("--sigma", type=float, default=DEFAULT_FAULTS["sigma"])
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=DEFAULT_FAULTS["completion_tokens"])
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app({
+        "latency_ms": args.latency_ms,
+        "latency_dist": args.latency_dist,
+        "jitter_ms": args.jitter_ms,
+        "sigma": args.sigma,
+        "tokens_per_second": args.tokens_per_second,
+        "completion_tokens": args.completion_tokens,
+        "slow_rate": args.slow_rate,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+    }, seed=args.seed)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+In-process Supabase stand-in backed by SQLite, for benchmarks and local runs.
+
+Implements the subset of the PostgREST query builder and RPCs that
+SessionService and AuthService use. Queries are filtered with
+eq/neq/lt/gt, shaped with order/limit/range and run with execute().
+The three counter RPCs from database_schema.sql are included. Every
+statement can pay a simulated network round trip, so latency-sensitive
+code paths behave much as they would against a hosted database.
+
+    from scripts.fake_supabase import FakeSupabase
+    session_service.supabase = auth_service.supabase = FakeSupabase(latency_ms=5)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY,
+        email TEXT,
+        full_name TEXT,
+        preferred_name TEXT,
+        timezone TEXT DEFAULT 'UTC',
+        created_at TEXT,
+        updated_at TEXT,
+        total_sessions INTEGER DEFAULT 0,
+        total_messages INTEGER DEFAULT 0
+    );
+    CREATE TABLE sessions (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER,
+        title TEXT,
+        is_anonymous INTEGER DEFAULT 1,
+        created_at TEXT,
+        updated_at TEXT,
+        last_activity TEXT,
+        is_active INTEGER DEFAULT 1,
+        session_type TEXT DEFAULT 'general',
+        context_summary TEXT,
+        therapeutic_goals TEXT,
+        key_insights TEXT,
+        message_count INTEGER DEFAULT 0,
+        duration_minutes INTEGER DEFAULT 0
+    );
+    CREATE TABLE messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT,
+        role TEXT,
+        content TEXT,
+        timestamp TEXT,
+        sources TEXT,
+        analysis_type TEXT,
+        therapeutic_techniques TEXT,
+        model_used TEXT,
+        tokens_used INTEGER,
+        response_time_ms INTEGER,
+        cost_usd TEXT,
+        relevance_score TEXT,
+        therapeutic_value TEXT
+    );
+    CREATE INDEX idx_sessions_user ON sessions(user_id, last_activity);
+    CREATE INDEX idx_messages_session ON messages(session_id, timestamp);
+"""
+
+# Columns stored as JSON text and decoded on the way out, like JSONB
+JSON_COLUMNS = {"therapeutic_goals", "key_insights", "sources", "therapeutic_techniques"}
+BOOL_COLUMNS = {"is_anonymous", "is_active"}
+
+OPERATORS = {"eq": "=", "neq": "!=", "lt": "<", "gt": ">", "lte": "<=", "gte": ">="}
+
+
+class FakeQuery:
+    """Chainable PostgREST-style query over one table."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._action = "select"
+        self._columns = "*"
+        self._values: Any = None
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+
+    def select(self, columns: str = "*") -> "FakeQuery":
+        self._columns = columns
+        return self
+
+    def insert(self, values) -> "FakeQuery":
+        self._action, self._values = "insert", values
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "FakeQuery":
+        self._action, self._values = "update", values
+        return self
+
+    def delete(self) -> "FakeQuery":
+        self._action = "delete"
+        return self
+
+    def __getattr__(self, name: str):
+        if name not in OPERATORS:
+            raise AttributeError(name)
+
+        def add_filter(column: str, value: Any) -> "FakeQuery":
+            self._filters.append((column, OPERATORS[name], value))
+            return self
+        return add_filter
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self._order.append(f"{column} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, count: int) -> "FakeQuery":
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def _where(self) -> Tuple[str, List[Any]]:
+        if not self._filters:
+            return "", []
+        clause = " AND ".join(f"{column} {op} ?" for column, op, _ in self._filters)
+        return f" WHERE {clause}", [encode(value) for _, _, value in self._filters]
+
+    def execute(self):
+        where, params = self._where()
+        if self._action == "insert":
+            rows = self._values if isinstance(self._values, list) else [self._values]
+            return SimpleNamespace(data=[self._db.insert(self._table, row) for row in rows])
+        if self._action == "update":
+            assignments = ", ".join(f"{column} = ?" for column in self._values)
+            sql = f"UPDATE {self._table} SET {assignments}{where} RETURNING *"
+            return SimpleNamespace(data=self._db.run(sql, [encode(v) for v in self._values.values()] + params))
+        if self._action == "delete":
+            return SimpleNamespace(data=self._db.run(f"DELETE FROM {self._table}{where} RETURNING *", params))
+
+        sql = f"SELECT {self._columns} FROM {self._table}{where}"
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {int(self._limit)} OFFSET {int(self._offset)}"
+        return SimpleNamespace(data=self._db.run(sql, params))
+
+
+def encode(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def decode(row: sqlite3.Row) -> Dict[str, Any]:
+    result = dict(row)
+    for column in JSON_COLUMNS & result.keys():
+        if result[column] is not None:
+            result[column] = json.loads(result[column])
+    for column in BOOL_COLUMNS & result.keys():
+        if result[column] is not None:
+            result[column] = bool(result[column])
+    return result
+
+
+class FakeSupabase:
+    """Synchronous Supabase client over one shared SQLite connection."""
+
+    def __init__(self, path: str = ":memory:", latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.statements = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+
+    def run(self, sql: str, params) -> List[Dict[str, Any]]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.statements += 1
+            rows = [decode(row) for row in self._conn.execute(sql, params).fetchall()]
+            self._conn.commit()
+            return rows
+
+    def insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING *"
+        return self.run(sql, [encode(value) for value in row.values()])[0]
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]):
+        handler = getattr(self, f"_rpc_{name}")
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=handler(**params)))
+
+    def _rpc_increment_session_message_count(self, session_id_param: str) -> List[Dict[str, Any]]:
+        return self.run(
+            "UPDATE sessions SET message_count = message_count + 1, last_activity = ? WHERE id = ? RETURNING message_count",
+            [datetime.utcnow().isoformat(), session_id_param]
+        )
+
+    def _rpc_increment_user_counters(self, user_id_param: int, sessions_delta: int = 0,
+                                     messages_delta: int = 0) -> List[Dict[str, Any]]:
+        return self.run(
+            "UPDATE users SET total_sessions = MAX(0, total_sessions + ?), "
+            "total_messages = MAX(0, total_messages + ?), updated_at = ? WHERE id = ? RETURNING id",
+            [sessions_delta, messages_delta, datetime.utcnow().isoformat(), user_id_param]
+        )
+
+    def _rpc_append_chat_turn(self, session_id_param: str, messages_param: List[Dict[str, Any]]) -> List[int]:
+        """Insert a turn's messages and bump both counters in one transaction, like the SQL function."""
+        if self.latency:
+            time.sleep(self.latency)
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            self.statements += 1
+            ids = []
+            for message in messages_param:
+                row = {key: encode(value) for key, value in message.items() if key != "id"}
+                row["session_id"] = session_id_param
+                cursor = self._conn.execute(
+                    f"INSERT INTO messages ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})",
+                    list(row.values())
+                )
+                ids.append(cursor.lastrowid)
+            self._conn.execute(
+                "UPDATE sessions SET message_count = message_count + ?, last_activity = ? WHERE id = ?",
+                [len(messages_param), now, session_id_param]
+            )
+            self._conn.execute(
+                "UPDATE users SET total_messages = total_messages + ?, updated_at = ? "
+                "WHERE id = (SELECT user_id FROM sessions WHERE id = ?)",
+                [len(messages_param), now, session_id_param]
+            )
+            self._conn.commit()
+            return ids
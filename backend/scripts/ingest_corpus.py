@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Streaming ingestion pipeline for Jung's collected works.
+
+    pages (JSON Lines) -> token-aware chunks (process pool)
+                       -> batched embeddings (bounded concurrency)
+                       -> chunk dump (append-only, doubles as the checkpoint)
+                       -> vector store (scripts/build_vector_store.py)
+
+Each input line is one page:
+
+    {"source": "Psychology and Alchemy", "volume": "12", "page": 41, "year": 1944, "text": "..."}
+
+Chunks never cross a page boundary, so every citation keeps an exact page
+number. A page is written to the dump only once all of its chunks are
+embedded (a page with no text gets a marker record with ``page_chunks: 0``
+instead), and on start-up the dump is scanned for finished pages. An
+interrupted run therefore resumes where it stopped, and re-running with a
+new volume's pages added only embeds the new pages.
+
+Usage (from backend/):
+    python -m scripts.ingest_corpus pages/*.jsonl --dump data/chunks.jsonl --store data/jung_chunks.jvs --bm25
+    python -m scripts.ingest_corpus pages.jsonl --dump /tmp/chunks.jsonl --fake-embeddings   # offline
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("ingest_corpus")
+
+EmbedFunction = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+JUNG_CONCEPTS = {
+    "shadow": ["shadow"],
+    "anima": ["anima"],
+    "animus": ["animus"],
+    "persona": ["persona"],
+    "self": ["the self"],
+    "archetype": ["archetype", "archetypal"],
+    "collective_unconscious": ["collective unconscious"],
+    "individuation": ["individuation"],
+    "complex": ["complex", "complexes"],
+    "synchronicity": ["synchronicity", "synchronistic"],
+    "mandala": ["mandala"],
+    "dreams": ["dream", "dreams"],
+    "active_imagination": ["active imagination"],
+    "psychological_types": ["introvert", "extravert", "introversion", "extraversion"],
+    "transcendent_function": ["transcendent function"],
+    "alchemy": ["alchemy", "alchemical", "alchemist"],
+}
+
+_CONCEPT_PATTERNS = {
+    concept: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")\b", re.IGNORECASE)
+    for concept, keywords in JUNG_CONCEPTS.items()
+}
+
+# Per-process tiktoken encoder, created lazily inside each pool worker
+_encoder = None
+
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None:
+        import tiktoken
+        _encoder = tiktoken.get_encoding("cl100k_base")
+    return _encoder
+
+
+def page_key(page: Dict[str, Any]) -> str:
+    """Stable identity of a page across runs."""
+    return f"{page.get('source', '')}|{page.get('volume', '')}|{page.get('page', '')}"
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-") or "cw"
+
+
+def tag_concepts(text: str) -> List[str]:
+    """Jungian concepts mentioned in a chunk."""
+    return [concept for concept, pattern in _CONCEPT_PATTERNS.items() if pattern.search(text)]
+
+
+def chunk_page(page: Dict[str, Any], chunk_tokens: int, overlap_tokens: int) -> List[Dict[str, Any]]:
+    """Split one page into overlapping token windows (runs in a worker process)."""
+    text = " ".join((page.get("text") or "").split())
+    if not text:
+        return []
+
+    encoder = _get_encoder()
+    tokens = encoder.encode(text)
+    step = max(1, chunk_tokens - overlap_tokens)
+    prefix = _slug(str(page.get("volume") or page.get("source", "")))
+
+    chunks = []
+    for n, start in enumerate(range(0, len(tokens), step)):
+        window = tokens[start:start + chunk_tokens]
+        chunk_text = encoder.decode(window).strip()
+        if chunk_text:
+            chunks.append({
+                "chunk_id": f"{prefix}-p{page.get('page', 0)}-{n}",
+                "text": chunk_text,
+                "source": page.get("source"),
+                "volume": page.get("volume"),
+                "page": page.get("page"),
+                "year": page.get("year"),
+                "concepts": tag_concepts(chunk_text),
+                "page_key": page_key(page),
+                "tokens": len(window),
+            })
+        if start + chunk_tokens >= len(tokens):
+            break
+
+    for chunk in chunks:
+        chunk["page_chunks"] = len(chunks)
+    return chunks
+
+
+def chunk_pages(pages: List[Dict[str, Any]], chunk_tokens: int, overlap_tokens: int) -> List[List[Dict[str, Any]]]:
+    """Chunk a group of pages; one list of chunks per page."""
+    return [chunk_page(page, chunk_tokens, overlap_tokens) for page in pages]
+
+
+def fake_embedding(text: str, dim: int = 1536) -> List[float]:
+    """Deterministic unit vector seeded by the text, for offline runs and tests."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def make_fake_embedder(dim: int) -> EmbedFunction:
+    async def embed(texts: List[str]) -> List[List[float]]:
+        return [fake_embedding(text, dim) for text in texts]
+    return embed
+
+
+def make_openai_embedder(model: Optional[str]) -> EmbedFunction:
+    # Imported lazily so offline runs do not need OpenAI/Supabase settings
+    from services.openai_service import openai_service
+
+    model = model or openai_service.settings.embedding_model
+
+    async def embed(texts: List[str]) -> List[List[float]]:
+        return await openai_service.generate_embeddings(texts, model=model)
+    return embed
+
+
+def iter_pages(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """Stream page records from one or more JSON Lines files."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Skipping {path}:{line_number}: invalid JSON ({e})")
+
+
+def load_checkpoint(dump_path: str) -> Set[str]:
+    """Page keys fully present in the dump.
+
+    Writes are sequential, so only the last one can be torn by a crash: the
+    file is truncated back to the first record of any incomplete page.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(dump_path):
+        return done
+
+    seen: Dict[str, int] = {}
+    first_offset: Dict[str, int] = {}
+    expected: Dict[str, int] = {}
+    good_bytes = 0
+    with open(dump_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(raw)
+            except json.JSONDecodeError:
+                break
+            key = record.get("page_key") or page_key(record)
+            first_offset.setdefault(key, good_bytes)
+            seen[key] = seen.get(key, 0) + 1
+            expected[key] = record.get("page_chunks", seen[key])
+            good_bytes += len(raw)
+
+    incomplete = [key for key, count in seen.items() if count < expected[key]]
+    if incomplete:
+        good_bytes = min(first_offset[key] for key in incomplete)
+
+    if good_bytes < os.path.getsize(dump_path):
+        logger.warning(f"Truncating incomplete tail of {dump_path} at byte {good_bytes}")
+        with open(dump_path, "r+b") as f:
+            f.truncate(good_bytes)
+        return load_checkpoint(dump_path)
+
+    done.update(seen)
+    return done
+
+
+class IngestionPipeline:
+    """Chunk, embed and append pages to the dump with bounded parallelism."""
+
+    def __init__(self, dump_path: str, embed: EmbedFunction, chunk_tokens: int = 400,
+                 overlap_tokens: int = 50, page_group: int = 32, batch_size: int = 128,
+                 concurrency: int = 4, workers: Optional[int] = None):
+        self.dump_path = dump_path
+        self.embed = embed
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.page_group = page_group
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.workers = workers
+
+        self.pages_skipped = 0
+        self.pages_written = 0
+        self.pages_empty = 0
+        self.chunks_written = 0
+
+    async def _embed_group(self, keys: List[str], page_chunks: List[List[Dict[str, Any]]], dump) -> None:
+        """Embed one group of pages and append them; pages are written whole."""
+        chunks = [chunk for chunks in page_chunks for chunk in chunks]
+        embeddings: List[List[float]] = []
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            embeddings.extend(await self.embed([chunk["text"] for chunk in batch]))
+
+        vectors = iter(embeddings)
+        lines = []
+        for key, chunks_of_page in zip(keys, page_chunks):
+            if not chunks_of_page:
+                # Pages without text leave a marker so a resume does not redo them
+                lines.append(json.dumps({"page_key": key, "page_chunks": 0}, ensure_ascii=False) + "\n")
+                self.pages_empty += 1
+            for chunk in chunks_of_page:
+                lines.append(json.dumps({**chunk, "embedding": next(vectors)}, ensure_ascii=False) + "\n")
+        dump.writelines(lines)
+        dump.flush()
+        os.fsync(dump.fileno())
+
+        self.pages_written += len(page_chunks)
+        self.chunks_written += len(chunks)
+
+    async def run(self, pages: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        done = load_checkpoint(self.dump_path)
+        logger.info(f"Resuming with {len(done)} pages already embedded")
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.dump_path)), exist_ok=True)
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: Set[asyncio.Task] = set()
+        errors: List[BaseException] = []
+
+        async def embed_and_release(keys, page_chunks):
+            try:
+                await self._embed_group(keys, page_chunks, dump)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                slots.release()
+
+        # Chunking futures in submission order; up to one per worker process runs at once
+        chunking: Deque[Tuple[List[str], asyncio.Future]] = deque()
+        max_chunking = self.workers or os.cpu_count() or 1
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool, open(self.dump_path, "a", encoding="utf-8") as dump:
+            group: List[Dict[str, Any]] = []
+
+            def submit(pages_to_chunk: List[Dict[str, Any]]):
+                future = loop.run_in_executor(
+                    pool, chunk_pages, pages_to_chunk, self.chunk_tokens, self.overlap_tokens
+                )
+                chunking.append(([page_key(page) for page in pages_to_chunk], future))
+
+            async def dispatch_oldest():
+                keys, future = chunking.popleft()
+                page_chunks = await future
+                # Backpressure: stop reading pages while every embedding slot is busy
+                await slots.acquire()
+                if errors:
+                    slots.release()
+                    raise errors[0]
+                task = asyncio.create_task(embed_and_release(keys, page_chunks))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            try:
+                for page in pages:
+                    key = page_key(page)
+                    if key in done:
+                        self.pages_skipped += 1
+                        continue
+                    done.add(key)
+                    group.append(page)
+                    if len(group) >= self.page_group:
+                        submit(group)
+                        group = []
+                        if len(chunking) >= max_chunking:
+                            await dispatch_oldest()
+                if group:
+                    submit(group)
+                while chunking:
+                    await dispatch_oldest()
+            except BaseException:
+                # Finished pages are already in the dump; drop the in-flight groups
+                for _, future in chunking:
+                    future.cancel()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+            await asyncio.gather(*tasks)
+
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start_time
+        return {
+            "pages_written": self.pages_written,
+            "pages_skipped": self.pages_skipped,
+            "pages_empty": self.pages_empty,
+            "chunks_written": self.chunks_written,
+            "seconds": round(elapsed, 1),
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Ingest Jung pages into the chunk dump and vector store")
+    parser.add_argument("pages", nargs="+", help="JSON Lines page files")
+    parser.add_argument("--dump", default="data/chunks.jsonl", help="chunk dump / checkpoint file")
+    parser.add_argument("--store", default="", help="build this vector store from the dump when done")
+    parser.add_argument("--chunk-tokens", type=int, default=400)
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=128, help="texts per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="embedding requests in flight")
+    parser.add_argument("--page-group", type=int, default=32, help="pages chunked per pool task")
+    parser.add_argument("--workers", type=int, default=None, help="chunking processes")
+    parser.add_argument("--model", default=None, help="embedding model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--fake-embeddings", action="store_true", help="use deterministic local embeddings")
+    parser.add_argument("--fake-dim", type=int, default=1536)
+    parser.add_argument("--int8", action="store_true", help="also build the int8 index")
+    parser.add_argument("--ivf", action="store_true", help="also build the IVF index")
+    parser.add_argument("--bm25", action="store_true", help="also build the BM25 index")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    embed = make_fake_embedder(args.fake_dim) if args.fake_embeddings else make_openai_embedder(args.model)
+    pipeline = IngestionPipeline(
+        args.dump, embed,
+        chunk_tokens=args.chunk_tokens,
+        overlap_tokens=args.overlap_tokens,
+        page_group=args.page_group,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        workers=args.workers
+    )
+
+    try:
+        stats = asyncio.run(pipeline.run(iter_pages(args.pages)))
+    except Exception as e:
+        logger.error(f"Ingestion failed: {str(e)}")
+        return 1
+    print(f"✅ Ingestion complete: {json.dumps(stats)}")
+
+    if args.store:
+        from scripts.build_vector_store import build_indexes, build
+
+        build(args.dump, args.store)
+        build_indexes(args.store, int8=args.int8, ivf=args.ivf, bm25=args.bm25)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
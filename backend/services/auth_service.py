@@ -2,14 +2,22 @@
 Authentication service for Jung AI - Supabase Integration
 """
 
+import asyncio
 import logging
+from types import SimpleNamespace
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
+from cachetools import TTLCache
 from fastapi import HTTPException, status
 from supabase import create_client, Client
 from config import get_settings
 from models.schemas import UserCreate, UserResponse, TokenResponse
 
+try:
+    import jwt
+except ImportError:  # PyJWT is optional; tokens are then verified by Supabase Auth
+    jwt = None
+
 logger = logging.getLogger(__name__)
 
 class AuthService:
@@ -22,6 +30,16 @@ class AuthService:
             self.settings.supabase_key
         )
         
+        # Verify access tokens locally when the project's JWT secret is configured
+        self.local_verification = bool(self.settings.supabase_jwt_secret) and jwt is not None
+        if self.settings.supabase_jwt_secret and jwt is None:
+            logger.warning("SUPABASE_JWT_SECRET is set but PyJWT is not installed; verifying tokens remotely")
+        
+        # Recently seen users by auth id, so authenticated requests skip the users table
+        self.user_cache = TTLCache(maxsize=self.settings.user_cache_size, ttl=self.settings.user_cache_ttl)
+        # Database user id -> auth id of the cached entry, for invalidation by user id
+        self._user_cache_keys = TTLCache(maxsize=self.settings.user_cache_size, ttl=self.settings.user_cache_ttl)
+        
     async def register_user(self, email: str, password: str, preferred_name: Optional[str] = None) -> Dict[str, Any]:
         """Register a new user with Supabase Auth."""
         try:
@@ -133,32 +151,61 @@ class AuthService:
             logger.error(f"Logout failed: {str(e)}")
             return False
     
+    def _verify_token(self, access_token: str) -> Optional[Dict[str, Any]]:
+        """Check a Supabase access token's signature, expiry and audience locally."""
+        try:
+            return jwt.decode(
+                access_token,
+                self.settings.supabase_jwt_secret,
+                algorithms=["HS256"],
+                audience="authenticated"
+            )
+        except jwt.PyJWTError as e:
+            logger.warning(f"Rejected access token: {str(e)}")
+            return None
+    
+    async def _get_auth_user(self, access_token: str):
+        """Resolve the auth user behind a token, locally when possible."""
+        if self.local_verification:
+            claims = self._verify_token(access_token)
+            if claims is None or not claims.get("sub"):
+                return None
+            return SimpleNamespace(
+                id=claims["sub"],
+                email=claims.get("email"),
+                user_metadata=claims.get("user_metadata") or {}
+            )
+        
+        # Pass the token explicitly rather than setting it on the shared client
+        user = await asyncio.to_thread(self.supabase.auth.get_user, access_token)
+        return user.user if user else None
+    
     async def get_current_user(self, access_token: str) -> Optional[UserResponse]:
         """Get current user from access token."""
         try:
-            # Set the session token
-            self.supabase.auth.set_session(access_token, None)
-            
-            # Get user from Supabase
-            user = self.supabase.auth.get_user()
-            
-            if user.user is None:
+            auth_user = await self._get_auth_user(access_token)
+            if auth_user is None:
                 return None
             
+            cached_user = self.user_cache.get(auth_user.id)
+            if cached_user:
+                return cached_user
+            
             # Get user data from our database
-            user_response = self.supabase.table("users").select("*").eq("id", user.user.id).execute()
+            user_query = self.supabase.table("users").select("*").eq("id", auth_user.id)
+            user_response = await asyncio.to_thread(user_query.execute)
             
             if not user_response.data:
                 # User doesn't exist in our database, create them (for OAuth users)
-                await self.create_user_from_auth(user.user)
+                await self.create_user_from_auth(auth_user)
                 # Try again to get user data
-                user_response = self.supabase.table("users").select("*").eq("id", user.user.id).execute()
+                user_response = await asyncio.to_thread(user_query.execute)
                 if not user_response.data:
                     return None
             
             user_data = user_response.data[0]
             
-            return UserResponse(
+            current_user = UserResponse(
                 id=user_data["id"],
                 email=user_data["email"],
                 preferred_name=user_data.get("full_name"),
@@ -168,6 +215,9 @@ class AuthService:
                 total_sessions=user_data.get("total_sessions", 0),
                 total_messages=user_data.get("total_messages", 0)
             )
+            self.user_cache[auth_user.id] = current_user
+            self._user_cache_keys[current_user.id] = auth_user.id
+            return current_user
             
         except Exception as e:
             logger.error(f"Get current user failed: {str(e)}")
@@ -246,26 +296,29 @@ class AuthService:
                 detail="Token refresh failed"
             )
     
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop a user's cached profile after their counters change."""
+        auth_id = self._user_cache_keys.pop(user_id, None)
+        if auth_id is not None:
+            self.user_cache.pop(auth_id, None)
+    
     async def update_user_stats(self, user_id: int, new_session: bool = False, new_message: bool = False) -> None:
         """Update user statistics."""
         try:
-            updates = {}
-            
-            if new_session:
-                # Increment session count
-                current_user = self.supabase.table("users").select("total_sessions").eq("id", user_id).execute()
-                if current_user.data:
-                    updates["total_sessions"] = current_user.data[0]["total_sessions"] + 1
-            
-            if new_message:
-                # Increment message count
-                current_user = self.supabase.table("users").select("total_messages").eq("id", user_id).execute()
-                if current_user.data:
-                    updates["total_messages"] = current_user.data[0]["total_messages"] + 1
-            
-            if updates:
-                updates["updated_at"] = datetime.utcnow().isoformat()
-                self.supabase.table("users").update(updates).eq("id", user_id).execute()
+            if not (new_session or new_message):
+                return
+            
+            # Imported here because session_service imports this module
+            from services.session_service import session_service
+            
+            # Increment in one UPDATE so concurrent requests never lose counts; runs on
+            # the bounded database pool shared with the session queries
+            await session_service.execute(self.supabase.rpc("increment_user_counters", {
+                "user_id_param": user_id,
+                "sessions_delta": int(new_session),
+                "messages_delta": int(new_message)
+            }))
+            self.invalidate_user(user_id)
                 
         except Exception as e:
             logger.error(f"Failed to update user stats: {str(e)}")
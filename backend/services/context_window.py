@@ -0,0 +1,90 @@
+"""
+Context window for Jung AI - Token-budgeted conversation history with a rolling summary
+"""
+
+import logging
+import re
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Role and separator tokens the chat format adds to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Share of the history budget the summary of older turns may use once history overflows
+SUMMARY_SHARE = 0.25
+SUMMARY_LINE_CHARS = 160
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+class ConversationWindow:
+    """Fit conversation history into a token budget, newest turns first.
+
+    Turns that no longer fit are folded into an extractive summary: the
+    opening sentence of each, most recent first, until the summary's share
+    of the budget is spent. `count_tokens` is expected to be memoized, so a
+    growing session only tokenizes its newest message each turn.
+    """
+
+    SUMMARY_HEADER = "EARLIER IN THIS SESSION (condensed):"
+
+    def __init__(self, count_tokens: Callable[[str], int]):
+        self._count_tokens = count_tokens
+
+    def tokens(self, text: str) -> int:
+        """Token count of one message body, including per-message overhead."""
+        return int(self._count_tokens(text)) + MESSAGE_OVERHEAD_TOKENS
+
+    @staticmethod
+    def _summary_line(message: Dict[str, str]) -> str:
+        text = " ".join(message["content"].split())
+        first = SENTENCE_END.split(text, 1)[0]
+        if len(first) > SUMMARY_LINE_CHARS:
+            first = first[:SUMMARY_LINE_CHARS].rsplit(" ", 1)[0] + "..."
+        speaker = "They said" if message["role"] == "user" else "You replied"
+        return f"- {speaker}: {first}"
+
+    def build(self, history: List[Dict[str, str]], budget: int) -> Dict[str, Any]:
+        """Select the newest messages within `budget` tokens and summarise the rest."""
+        budget = max(0, budget)
+        used = 0
+
+        # Leave room for the summary only when the full history will not fit
+        total = sum(self.tokens(msg["content"]) for msg in history)
+        recent_budget = budget if total <= budget else int(budget * (1 - SUMMARY_SHARE))
+
+        index = len(history)
+        while index > 0:
+            cost = self.tokens(history[index - 1]["content"])
+            if used + cost > recent_budget:
+                break
+            used += cost
+            index -= 1
+        kept = history[index:]
+        older = history[:index]
+
+        summary = None
+        summarized = 0
+        if older:
+            lines: List[str] = []
+            summary_used = self.tokens(self.SUMMARY_HEADER)
+            for message in reversed(older):
+                line = self._summary_line(message)
+                cost = self.tokens(line) - MESSAGE_OVERHEAD_TOKENS
+                if used + summary_used + cost > budget:
+                    break
+                lines.append(line)
+                summary_used += cost
+                summarized += 1
+            if lines:
+                summary = "\n".join([self.SUMMARY_HEADER] + lines[::-1])
+                used += summary_used
+
+        return {
+            "messages": kept,
+            "summary": summary,
+            "history_tokens": used,
+            "kept_messages": len(kept),
+            "summarized_messages": summarized,
+            "dropped_messages": len(older) - summarized,
+        }
@@ -0,0 +1,179 @@
+"""
+Lexical index for Jung AI - BM25 over chunk text with array-backed postings
+
+Sidecar directory layout (``<store>.bm25/``):
+
+    terms.json         sorted vocabulary, term i owns postings[offsets[i]:offsets[i+1]]
+    term_offsets.npy   int64 (V + 1,)
+    doc_ids.npy        uint32 postings, grouped by term, ascending doc id
+    term_freqs.npy     uint16 term frequency per posting
+    doc_lengths.npy    uint32 token count per chunk
+
+The arrays are memory-mapped on first use, so the index costs nothing at
+startup and only the postings of query terms are paged in.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens with stopwords and single letters removed."""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """Okapi BM25 scoring over a memory-mapped inverted index."""
+
+    name = "bm25"
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._vocabulary: Dict[str, int] = {}
+        self._term_offsets: Optional[np.ndarray] = None
+        self._doc_ids: Optional[np.ndarray] = None
+        self._term_freqs: Optional[np.ndarray] = None
+        self._doc_lengths: Optional[np.ndarray] = None
+        self._avg_doc_length = 1.0
+
+    @staticmethod
+    def directory(store_path: str) -> str:
+        """Sidecar directory for a vector store file."""
+        return f"{store_path}.bm25"
+
+    @classmethod
+    def open(cls, store_path: str, k1: float = 1.2, b: float = 0.75) -> Optional["BM25Index"]:
+        """Return a lazily loaded index, or None when it has not been built."""
+        path = cls.directory(store_path)
+        if not os.path.exists(os.path.join(path, "terms.json")):
+            return None
+        return cls(path, k1=k1, b=b)
+
+    @classmethod
+    def build(cls, store_path: str, texts: Iterable[str]) -> str:
+        """Tokenize every chunk and write the postings arrays."""
+        start_time = time.perf_counter()
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths: List[int] = []
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text or "")
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                postings[term].append((doc_id, min(freq, np.iinfo(np.uint16).max)))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[term]) for term in terms], out=term_offsets[1:])
+        doc_ids = np.empty(int(term_offsets[-1]), dtype=np.uint32)
+        term_freqs = np.empty(int(term_offsets[-1]), dtype=np.uint16)
+        for i, term in enumerate(terms):
+            start, end = term_offsets[i], term_offsets[i + 1]
+            doc_ids[start:end], term_freqs[start:end] = zip(*postings[term])
+
+        path = cls.directory(store_path)
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        np.save(os.path.join(tmp_path, "term_offsets.npy"), term_offsets)
+        np.save(os.path.join(tmp_path, "doc_ids.npy"), doc_ids)
+        np.save(os.path.join(tmp_path, "term_freqs.npy"), term_freqs)
+        np.save(os.path.join(tmp_path, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.uint32))
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Built BM25 index: {len(terms)} terms, {doc_ids.size} postings in {elapsed:.1f}s")
+        return path
+
+    def _ensure_loaded(self) -> None:
+        """Memory-map the postings on first use."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            start_time = time.perf_counter()
+            with open(os.path.join(self.path, "terms.json"), "r", encoding="utf-8") as f:
+                self._vocabulary = {term: i for i, term in enumerate(json.load(f))}
+            self._term_offsets = np.load(os.path.join(self.path, "term_offsets.npy"), mmap_mode="r")
+            self._doc_ids = np.load(os.path.join(self.path, "doc_ids.npy"), mmap_mode="r")
+            self._term_freqs = np.load(os.path.join(self.path, "term_freqs.npy"), mmap_mode="r")
+            self._doc_lengths = np.load(os.path.join(self.path, "doc_lengths.npy"), mmap_mode="r")
+            self._avg_doc_length = max(1.0, float(self._doc_lengths.mean())) if self._doc_lengths.size else 1.0
+            self._loaded = True
+
+            load_ms = (time.perf_counter() - start_time) * 1000
+            logger.info(f"Loaded BM25 index ({len(self._vocabulary)} terms) in {load_ms:.0f}ms")
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 top-k for one query string as ``(scores, ids)``, best first."""
+        self._ensure_loaded()
+        doc_count = self._doc_lengths.shape[0]
+        scores = np.zeros(doc_count, dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self._term_offsets[term_id]), int(self._term_offsets[term_id + 1])
+            ids = np.asarray(self._doc_ids[start:end], dtype=np.int64)
+            tf = np.asarray(self._term_freqs[start:end], dtype=np.float32)
+
+            idf = np.log(1.0 + (doc_count - ids.size + 0.5) / (ids.size + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self._doc_lengths[ids] / self._avg_doc_length)
+            # Doc ids are unique within one postings list, so plain fancy-index addition is safe
+            scores[ids] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        matched = np.flatnonzero(scores)
+        if matched.size == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        k = min(k, matched.size)
+        best = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = best[np.argsort(-scores[best])]
+        return scores[best], best
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists with RRF: score(d) = sum over lists of 1 / (k + rank)."""
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking.tolist(), 1):
+            if doc_id >= 0:
+                fused[doc_id] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
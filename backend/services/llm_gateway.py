@@ -0,0 +1,263 @@
+"""
+LLM gateway for Jung AI - Quota-aware admission, priority queueing and load shedding
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from config import get_settings
+from services.request_timing import span
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+PRIORITY_AUTHENTICATED = 0
+PRIORITY_ANONYMOUS = 1
+PRIORITY_NAMES = {PRIORITY_AUTHENTICATED: "authenticated", PRIORITY_ANONYMOUS: "anonymous"}
+
+
+class GatewayOverloaded(Exception):
+    """Raised instead of queueing when the gateway cannot take more work."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM gateway overloaded, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Per-minute quota as a bucket that refills continuously at quota/60 per second."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 when available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Return an over-reservation, e.g. max_tokens that were never generated."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "future", "enqueued")
+
+    def __init__(self, priority: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class LLMGateway:
+    """Admission control in front of the chat completions API.
+
+    A request holds one of `max_concurrency` slots while it runs and takes
+    one request and its estimated tokens from the RPM and TPM buckets before
+    it starts. Requests that cannot start at once wait in a priority queue,
+    where authenticated users are served before anonymous ones. When the
+    queue is full, a newcomer displaces the lowest-priority waiter if it
+    outranks it; otherwise it is shed immediately with a Retry-After
+    estimate, rather than waiting out the provider's rate limit.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int,
+                 max_concurrency: int = 8, max_queue: int = 32, max_queue_wait: float = 30):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+
+        self._queue: List = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.in_flight = 0
+
+        self.admitted = 0
+        self.extra_attempts = 0
+        self.shed = 0
+        self.displaced = 0
+        self.max_depth = 0
+        self._waits: deque = deque(maxlen=1000)
+        self._hold_ewma = 1.0  # Seconds a request keeps its slot, smoothed
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for _, _, waiter in self._queue if not waiter.future.done())
+
+    def retry_after(self, tokens: int = 0) -> float:
+        """Estimated seconds until a new request could start."""
+        queued = [waiter for _, _, waiter in self._queue if not waiter.future.done()]
+        queued_tokens = tokens + sum(waiter.tokens for waiter in queued)
+        estimate = max(
+            (len(queued) + 1) / self.max_concurrency * self._hold_ewma,
+            (len(queued) + 1) / self.requests.rate - self.requests.tokens / self.requests.rate,
+            (queued_tokens - self.tokens.tokens) / self.tokens.rate,
+        )
+        return max(1.0, math.ceil(estimate))
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, priority: int = PRIORITY_AUTHENTICATED) -> AsyncIterator[Dict[str, Any]]:
+        """Hold a gateway slot for one call estimated at `tokens`.
+
+        The yielded dict accepts `actual_tokens` so the unused part of the
+        TPM reservation is returned when the call finishes.
+        """
+        await self._acquire(tokens, priority)
+        started = time.monotonic()
+        usage: Dict[str, Any] = {"actual_tokens": None}
+        try:
+            yield usage
+        finally:
+            held = time.monotonic() - started
+            self._hold_ewma = 0.9 * self._hold_ewma + 0.1 * held
+            if usage["actual_tokens"] is not None and usage["actual_tokens"] < tokens:
+                self.tokens.give_back(tokens - usage["actual_tokens"])
+            self.in_flight -= 1
+            self._dispatch()
+
+    def charge(self, tokens: int) -> None:
+        """Take quota for an extra upstream attempt (retry, hedge or fallback) made from a held slot.
+
+        The attempt goes out at once, so the buckets may go negative; later
+        requests then wait until they have refilled.
+        """
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.extra_attempts += 1
+
+    async def _acquire(self, tokens: int, priority: int) -> None:
+        if self.depth == 0 and self._can_start(tokens):
+            self._start(tokens)
+            self._waits.append(0.0)
+            return
+
+        retry_after = self.retry_after(tokens)
+        if retry_after > self.max_queue_wait:
+            self._reject(retry_after, priority)
+        if self.depth >= self.max_queue and not self._displace(priority):
+            self._reject(retry_after, priority)
+
+        waiter = _Waiter(priority, tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self.max_depth = max(self.max_depth, self.depth)
+        self._dispatch()
+        try:
+            with span("llm_queue"):
+                await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller went away; hand the slot on
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+        self._waits.append(time.monotonic() - waiter.enqueued)
+
+    def _reject(self, retry_after: float, priority: int) -> None:
+        self.shed += 1
+        logger.warning(
+            f"Shedding {PRIORITY_NAMES.get(priority, priority)} LLM request "
+            f"(queue {self.depth}, in flight {self.in_flight}, retry after {retry_after:.0f}s)"
+        )
+        raise GatewayOverloaded(retry_after)
+
+    def _displace(self, priority: int) -> bool:
+        """Shed the newest lowest-priority waiter if the newcomer outranks it."""
+        queued = [entry for entry in self._queue if not entry[2].future.done()]
+        if not queued:
+            return False
+        worst = max(queued, key=lambda entry: (entry[0], entry[1]))
+        if worst[0] <= priority:
+            return False
+        worst[2].future.set_exception(GatewayOverloaded(self.retry_after()))
+        self.shed += 1
+        self.displaced += 1
+        return True
+
+    def _can_start(self, tokens: int) -> bool:
+        return (self.in_flight < self.max_concurrency
+                and self.requests.wait_time(1) == 0
+                and self.tokens.wait_time(tokens) == 0)
+
+    def _start(self, tokens: int) -> None:
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.in_flight += 1
+        self.admitted += 1
+
+    def _dispatch(self) -> None:
+        """Start queued requests in priority order while slots and quota allow."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if self.in_flight >= self.max_concurrency:
+                return
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(waiter.tokens))
+            if wait > 0:
+                # Wake up when the buckets have refilled enough for the head of the queue
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            self._start(waiter.tokens)
+            waiter.future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, wait time and shedding statistics."""
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 1)
+
+        return {
+            "llm_in_flight": self.in_flight,
+            "llm_queue_depth": self.depth,
+            "llm_queue_depth_max": self.max_depth,
+            "llm_admitted": self.admitted,
+            "llm_extra_attempts": self.extra_attempts,
+            "llm_shed": self.shed,
+            "llm_displaced": self.displaced,
+            "llm_queue_wait_p50_ms": percentile(0.5),
+            "llm_queue_wait_p95_ms": percentile(0.95),
+            "llm_rpm_available": int(self.requests.tokens),
+            "llm_tpm_available": int(self.tokens.tokens),
+        }
+
+# Global LLM gateway instance
+_settings = get_settings()
+llm_gateway = LLMGateway(
+    requests_per_minute=_settings.openai_rpm_limit,
+    tokens_per_minute=_settings.openai_tpm_limit,
+    max_concurrency=_settings.llm_max_concurrency,
+    max_queue=_settings.llm_queue_size,
+    max_queue_wait=_settings.llm_max_queue_wait
+)
@@ -4,17 +4,194 @@ OpenAI service for Jung AI - Cost-optimized with smart model selection
 
 import logging
 import asyncio
-from typing import Dict, Any, Optional, List
+import hashlib
+import json
+import time
+from typing import Dict, Any, Optional, List, Callable, Awaitable, AsyncIterator, Tuple
 from datetime import datetime, timedelta
 from cachetools import TTLCache
-import tiktoken
 import openai
 from openai import AsyncOpenAI
 from config import get_settings, MODEL_COSTS
 from models.schemas import ModelType, CostInfo
+from services.context_window import ConversationWindow, MESSAGE_OVERHEAD_TOKENS
+from services.jung_persona import JUNG_PERSONA_PROMPT
+from services.llm_gateway import llm_gateway, PRIORITY_AUTHENTICATED
+from services.request_timing import record, span
+from services.resilience import CircuitBreaker, CircuitOpen, Hedger, is_retryable, retry_with_backoff
+from services.semantic_cache import SemanticCache
+from services.spend_ledger import spend_ledger
+from services.token_counter import TokenizerUnavailable, token_counter
 
 logger = logging.getLogger(__name__)
 
+class EmbeddingBatcher:
+    """Coalesce concurrent single-text embedding calls into batched API requests.
+    
+    The first pending text opens a short window; texts arriving during it
+    share one `embeddings.create(input=[...])` call and each caller's future
+    receives its own vector. A full batch is flushed without waiting.
+    """
+    
+    def __init__(self, embed_batch: Callable[[List[str], str], Awaitable[List[List[float]]]],
+                 window_ms: int = 5, max_batch_size: int = 64):
+        self._embed_batch = embed_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[str, Dict[str, List[asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # The loop only keeps weak references to tasks, so in-flight batches are held here
+        self._tasks: set = set()
+        self.batches_sent = 0
+        self.texts_batched = 0
+    
+    async def submit(self, text: str, model: str) -> List[float]:
+        """Queue one text and wait for its embedding."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(model, {})
+        # Identical texts in the same window share one input slot
+        pending.setdefault(text, []).append(future)
+        
+        if len(pending) >= self.max_batch_size:
+            self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.window, self._flush, model)
+        
+        return await future
+    
+    def _flush(self, model: str) -> None:
+        """Detach the pending batch for a model and send it in the background."""
+        timer = self._timers.pop(model, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(model, None)
+        if batch:
+            task = asyncio.ensure_future(self._send(batch, model))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _send(self, batch: Dict[str, List[asyncio.Future]], model: str) -> None:
+        """Embed a batch and fan results (or the failure) back out to the waiters."""
+        texts = list(batch)
+        self.batches_sent += 1
+        self.texts_batched += len(texts)
+        try:
+            embeddings = await self._embed_batch(texts, model)
+            for text, embedding in zip(texts, embeddings):
+                for future in batch[text]:
+                    if not future.done():
+                        future.set_result(embedding)
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Batching statistics."""
+        return {
+            "embedding_batches_sent": self.batches_sent,
+            "embedding_texts_batched": self.texts_batched,
+            "embedding_avg_batch_size": round(self.texts_batched / self.batches_sent, 2) if self.batches_sent else 0,
+        }
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key.
+    
+    The first caller (the leader) starts the work as a task; callers that
+    arrive before it finishes await the same task instead of repeating it.
+    The task is shielded, so one caller disconnecting does not cancel the
+    work for the others, and the key is released as soon as it settles.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run `fn` once per key at a time; returns (result, shared with a leader)."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future), True
+        
+        self.calls += 1
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = future
+        future.add_done_callback(lambda done: self._release(key, done))
+        return await asyncio.shield(future), False
+    
+    def _release(self, key: str, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Mark a failure as retrieved even when every waiter has gone away
+        if not future.cancelled():
+            future.exception()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Coalescing statistics."""
+        return {
+            f"{self.name}_flights": self.calls,
+            f"{self.name}_coalesced_callers": self.coalesced,
+            f"{self.name}_in_flight": len(self._inflight),
+        }
+
+class ResponseCache(TTLCache):
+    """TTL cache of chat responses bounded by both entry count and payload bytes.
+    
+    `maxsize` is a byte budget: each entry is sized by its encoded response
+    text plus a fixed per-entry overhead, so a few very long answers cannot
+    crowd out the process's memory the way a count limit alone allows.
+    """
+    
+    ENTRY_OVERHEAD_BYTES = 256
+    
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        super().__init__(maxsize=max_bytes, ttl=ttl, getsizeof=self.entry_size)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+    
+    @classmethod
+    def entry_size(cls, entry: Dict[str, Any]) -> int:
+        return len(entry["response"].encode("utf-8")) + cls.ENTRY_OVERHEAD_BYTES
+    
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.expire()
+            while len(self) >= self.max_entries:
+                self.popitem()
+        super().__setitem__(key, value)
+
+class _AttemptCharges:
+    """Spend reserved for every upstream attempt of one chat call.
+    
+    The caller reserves the first attempt before it is admitted. Retries,
+    hedged duplicates and fallback calls each reserve their own estimate and
+    take their own request and tokens from the gateway buckets, so the
+    caller settles `reserved` in full once the call is over.
+    """
+    
+    __slots__ = ("prompt_tokens", "max_tokens", "reserved", "wasted", "attempts")
+    
+    def __init__(self, prompt_tokens: int, max_tokens: int, reserved: float):
+        self.prompt_tokens = prompt_tokens
+        self.max_tokens = max_tokens
+        self.reserved = reserved
+        self.wasted = 0.0  # Cost of attempts abandoned after the provider had the prompt
+        self.attempts = 0
+
 class OpenAIService:
     """OpenAI service with cost optimization and smart model selection."""
     
@@ -24,58 +201,117 @@ class OpenAIService:
         # Only initialize OpenAI client if API key is provided
         if self.settings.openai_api_key:
             # Only include organization if it's provided
-            client_params = {"api_key": self.settings.openai_api_key}
+            client_params = {
+                "api_key": self.settings.openai_api_key,
+                "timeout": self.settings.openai_timeout,
+                "max_retries": 0  # Retries are handled by retry_with_backoff
+            }
             if self.settings.openai_organization:
                 client_params["organization"] = self.settings.openai_organization
+            if self.settings.openai_base_url:
+                client_params["base_url"] = self.settings.openai_base_url
             
             self.client = AsyncOpenAI(**client_params)
         else:
             self.client = None
         
-        # Cost tracking
-        self.daily_spend = 0.0
-        self.monthly_spend = 0.0
-        self.last_reset = datetime.utcnow()
+        # Resilience around chat completions
+        self.breakers = {
+            model: CircuitBreaker(
+                model.value,
+                failure_threshold=self.settings.circuit_failure_threshold,
+                reset_timeout=self.settings.circuit_reset_seconds
+            )
+            for model in ModelType
+        }
+        self.hedger = Hedger() if self.settings.openai_hedge_enabled else None
+        
+        # Cost tracking, shared with the other workers through the spend ledger
+        self.spend_ledger = spend_ledger
         
         # Response caching
-        self.response_cache = TTLCache(maxsize=self.settings.max_cache_size, ttl=self.settings.cache_ttl)
+        self.response_cache = ResponseCache(
+            max_entries=self.settings.max_cache_size,
+            max_bytes=self.settings.max_cache_bytes,
+            ttl=self.settings.cache_ttl
+        )
         self.embedding_cache = TTLCache(maxsize=500, ttl=7200)  # 2 hours for embeddings
+        self.semantic_cache = SemanticCache(
+            capacity=self.settings.semantic_cache_size,
+            threshold=self.settings.semantic_cache_threshold,
+            ttl=self.settings.cache_ttl
+        )
+        self._embedding_batcher = EmbeddingBatcher(
+            self._embed_batch,
+            window_ms=self.settings.embedding_batch_window_ms,
+            max_batch_size=self.settings.embedding_batch_max_size
+        )
         
-        # Token encoders
-        self.token_encoders = {
-            ModelType.GPT_35_TURBO: tiktoken.encoding_for_model("gpt-3.5-turbo"),
-            ModelType.GPT_4: tiktoken.encoding_for_model("gpt-4"),
-            ModelType.GPT_4_TURBO: tiktoken.encoding_for_model("gpt-4-turbo-preview"),
+        # Concurrent identical requests that miss the caches share one API call
+        self._chat_flights = SingleFlight("chat")
+        self._embedding_flights = SingleFlight("embedding")
+        
+        # Conversation history is fitted to a token budget per turn
+        self.context_window = ConversationWindow(lambda text: self._count_tokens(text, ModelType.GPT_35_TURBO))
+        self._persona_tokens: Optional[int] = None
+        self.prompt_stats = {
+            "turns": 0,
+            "prompt_tokens_total": 0,
+            "prompt_tokens_max": 0,
+            "prompt_tokens_last": 0,
+            "turns_with_summary": 0,
         }
         
         logger.info("OpenAI service initialized with cost optimization")
     
-    def _count_tokens(self, text: str, model: ModelType) -> int:
-        """Count tokens in text for specific model."""
-        try:
-            encoder = self.token_encoders.get(model)
-            if encoder:
-                return len(encoder.encode(text))
-            return len(text.split()) * 1.3  # Rough estimate
-        except Exception as e:
-            logger.error(f"Token counting failed: {str(e)}")
-            return len(text.split()) * 1.3
+    @property
+    def daily_spend(self) -> float:
+        """Today's spend across workers, without a ledger round trip."""
+        return self.spend_ledger.daily_spend
+    
+    @property
+    def monthly_spend(self) -> float:
+        """This month's spend across workers, without a ledger round trip."""
+        return self.spend_ledger.monthly_spend
+    
+    @property
+    def persona_tokens(self) -> int:
+        """Token count of the static persona prompt, measured once by measure_persona_tokens()."""
+        if self._persona_tokens is None and not self.measure_persona_tokens():
+            # Tokenizer unavailable: estimate this time and measure again next turn
+            return self._count_tokens(JUNG_PERSONA_PROMPT, ModelType.GPT_35_TURBO)
+        return self._persona_tokens
     
-    def _estimate_cost(self, prompt: str, response: str, model: ModelType) -> float:
-        """Estimate cost for API call."""
+    def measure_persona_tokens(self) -> bool:
+        """Count the persona prompt exactly; called at startup. Only an exact count is kept."""
         try:
-            prompt_tokens = self._count_tokens(prompt, model)
-            response_tokens = self._count_tokens(response, model)
-            
-            model_cost = MODEL_COSTS.get(model.value, MODEL_COSTS["gpt-3.5-turbo"])
-            
-            input_cost = (prompt_tokens / 1000) * model_cost["input"]
-            output_cost = (response_tokens / 1000) * model_cost["output"]
-            
-            return input_cost + output_cost
+            self._persona_tokens = token_counter.exact_count(JUNG_PERSONA_PROMPT, ModelType.GPT_35_TURBO.value)
+        except TokenizerUnavailable:
+            return False  # Waiting to retry a failed tokenizer load, which was logged
         except Exception as e:
-            logger.error(f"Cost estimation failed: {str(e)}")
-            return 0.0
+            logger.error(f"Persona token count failed: {str(e)}")
+            return False
+        logger.info(f"Persona prompt is {self._persona_tokens} tokens")
+        return True
+    
+    def _count_tokens(self, text: str, model: ModelType) -> int:
+        """Count tokens in text for specific model (memoized, encoders load lazily)."""
+        return token_counter.count(text, model.value)
+    
+    def _count_message_tokens(self, messages: List[Dict[str, str]], model: ModelType) -> int:
+        """Prompt tokens for a message list, counted per message so unchanged turns hit the cache."""
+        return sum(
+            self._count_tokens(msg["content"], model) + MESSAGE_OVERHEAD_TOKENS for msg in messages
+        ) + MESSAGE_OVERHEAD_TOKENS  # Reply primer
+    
+    def _estimate_cost(self, prompt_tokens: int, response_tokens: int, model: ModelType) -> float:
+        """Estimate cost for API call from token counts."""
+        model_cost = MODEL_COSTS.get(model.value, MODEL_COSTS["gpt-3.5-turbo"])
+        
+        input_cost = (prompt_tokens / 1000) * model_cost["input"]
+        output_cost = (response_tokens / 1000) * model_cost["output"]
+        
+        return input_cost + output_cost
     
     def _select_model(self, complexity: str = "simple", force_model: Optional[ModelType] = None) -> ModelType:
         """Select optimal model based on complexity and budget."""
@@ -100,17 +336,30 @@ class OpenAIService:
         # Default to GPT-3.5 for cost efficiency
         return ModelType.GPT_35_TURBO
     
-    def _create_cache_key(self, prompt: str, model: ModelType, **kwargs) -> str:
-        """Create cache key for response caching."""
-        key_parts = [prompt[:100], model.value]  # First 100 chars to avoid long keys
-        for k, v in sorted(kwargs.items()):
-            key_parts.append(f"{k}:{v}")
-        return "|".join(key_parts)
+    @staticmethod
+    def _create_cache_key(messages: List[Dict[str, str]], model: ModelType, **kwargs) -> str:
+        """Cache key over the full conversation, model and sampling parameters.
+        
+        Hashing every message (system context and retrieved passages included)
+        means two prompts only share an answer when the request is identical.
+        """
+        payload = json.dumps(
+            {"model": model.value, "messages": messages, "params": kwargs},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+        return f"chat:{model.value}:{digest}"
     
     async def generate_response(self, prompt: str, complexity: str = "simple", 
                               model: Optional[ModelType] = None, temperature: float = 0.7,
-                              max_tokens: int = 1000, messages: Optional[List[Dict[str, str]]] = None, **kwargs) -> Dict[str, Any]:
-        """Generate response with cost optimization and caching."""
+                              max_tokens: int = 1000, messages: Optional[List[Dict[str, str]]] = None,
+                              priority: int = PRIORITY_AUTHENTICATED,
+                              prompt_info: Optional[Dict[str, int]] = None, **kwargs) -> Dict[str, Any]:
+        """Generate response with cost optimization and caching.
+        
+        `prompt_info` from _build_jung_prompt is added to the prompt stats if the
+        prompt is actually sent to the model.
+        """
         try:
             # Check if OpenAI client is available
             if not self.client:
@@ -125,14 +374,13 @@ class OpenAIService:
             else:
                 api_messages = [{"role": "user", "content": prompt}]
             
-            # Create cache key based on the last user message and conversation length
-            last_user_msg = next((msg["content"] for msg in reversed(api_messages) if msg["role"] == "user"), prompt)
-            conversation_length = len(api_messages)
+            # Create cache key from the full request
             cache_key = self._create_cache_key(
-                f"{last_user_msg}|conv_{conversation_length}", 
-                selected_model, 
-                temp=temperature, 
-                max_tokens=max_tokens
+                api_messages,
+                selected_model,
+                temp=temperature,
+                max_tokens=max_tokens,
+                **kwargs
             )
             
             # Check cache first
@@ -149,37 +397,157 @@ class OpenAIService:
                     "response_time_ms": 0
                 }
             
-            # Estimate cost for budget checking
-            full_conversation = "\n".join([f"{msg['role']}: {msg['content']}" for msg in api_messages])
-            estimated_cost = self._estimate_cost(full_conversation, "A" * max_tokens, selected_model)
-            
-            if (self.daily_spend + estimated_cost) > self.settings.daily_budget:
-                logger.warning(f"Daily budget exceeded. Current spend: ${self.daily_spend:.4f}")
-                raise Exception("Daily budget exceeded")
-            
-            # Make API call with messages
-            start_time = datetime.utcnow()
-            
-            response = await self.client.chat.completions.create(
-                model=selected_model.value,
-                messages=api_messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                **kwargs
+            # Identical requests already in flight await the same completion
+            result, shared = await self._chat_flights.do(
+                cache_key,
+                lambda: self._complete_chat(api_messages, selected_model, cache_key,
+                                            temperature, max_tokens, priority, prompt_info, **kwargs)
             )
+            if shared:
+                logger.info(f"Coalesced with in-flight request for model {selected_model.value}")
+                # Only the leader's call is billed; followers are reported like a cache hit
+                return {**result, "cached": True, "coalesced": True}
+            return result
             
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            
-            # Extract response
-            response_content = response.choices[0].message.content
-            tokens_used = response.usage.total_tokens
-            
-            # Calculate actual cost
-            actual_cost = self._estimate_cost(full_conversation, response_content, selected_model)
-            self.daily_spend += actual_cost
-            self.monthly_spend += actual_cost
-            
-            # Cache the response
+        except Exception as e:
+            logger.error(f"OpenAI response generation failed: {str(e)}")
+            raise
+    
+    def _route_model(self, selected_model: ModelType) -> ModelType:
+        """Fall back to the cheaper model while the selected model's circuit is open."""
+        if self.breakers[selected_model].allow():
+            return selected_model
+        fallback = ModelType.GPT_35_TURBO
+        if selected_model != fallback and self.breakers[fallback].allow():
+            logger.warning(f"Circuit open for {selected_model.value}, using {fallback.value}")
+            return fallback
+        raise CircuitOpen(selected_model.value, self.breakers[selected_model].retry_after())
+    
+    async def _charge_extra_attempt(self, model: ModelType, charges: _AttemptCharges) -> None:
+        """Reserve budget and gateway quota for a retry, hedge or fallback attempt."""
+        estimated_cost = self._estimate_cost(charges.prompt_tokens, charges.max_tokens, model)
+        if not await self.spend_ledger.reserve_async(estimated_cost):
+            logger.warning(f"Daily budget exceeded before retrying {model.value}")
+            raise Exception("Daily budget exceeded")
+        charges.reserved += estimated_cost
+        llm_gateway.charge(charges.prompt_tokens + charges.max_tokens)
+    
+    async def _call_model(self, model: ModelType, charges: _AttemptCharges, deadline: float, **params) -> Any:
+        """One chat completion with jittered retries, optional hedging and circuit accounting."""
+        breaker = self.breakers[model]
+        
+        async def attempt():
+            # The caller paid for the first attempt; every further one pays its own way
+            if charges.attempts:
+                await self._charge_extra_attempt(model, charges)
+            charges.attempts += 1
+            try:
+                return await self.client.chat.completions.create(model=model.value, **params)
+            except (asyncio.CancelledError, openai.APITimeoutError):
+                # A hedge loser or timed-out call may already have been billed for its prompt
+                charges.wasted += self._estimate_cost(charges.prompt_tokens, 0, model)
+                raise
+        
+        # A stream's first token is what matters, so only whole responses are hedged
+        call = attempt if self.hedger is None or params.get("stream") else (lambda: self.hedger.run(attempt))
+        try:
+            response = await retry_with_backoff(
+                call,
+                attempts=self.settings.openai_max_attempts,
+                base_delay=self.settings.openai_retry_base_ms / 1000,
+                max_delay=self.settings.openai_retry_max_ms / 1000,
+                deadline=deadline
+            )
+        except Exception as e:
+            # Only transient failures count against the model's health; a bad
+            # request says nothing either way, so it must not close the circuit
+            if is_retryable(e):
+                breaker.record_failure()
+            else:
+                breaker.release_probe()
+            raise
+        breaker.record_success()
+        return response
+    
+    async def _create_chat_completion(self, selected_model: ModelType, charges: _AttemptCharges,
+                                      **params) -> Tuple[Any, ModelType]:
+        """Call the selected model, degrading to the cheaper one when it is unhealthy.
+        
+        Retries and the fallback share `openai_call_budget` seconds; for a
+        stream the budget covers getting the response started.
+        """
+        budget = self.settings.openai_call_budget
+        deadline = time.monotonic() + budget
+        
+        async def call() -> Tuple[Any, ModelType]:
+            model = self._route_model(selected_model)
+            try:
+                return await self._call_model(model, charges, deadline, **params), model
+            except Exception as e:
+                fallback = ModelType.GPT_35_TURBO
+                if (model == fallback or not is_retryable(e) or time.monotonic() >= deadline
+                        or not self.breakers[fallback].allow()):
+                    raise
+                logger.warning(f"{model.value} failed ({type(e).__name__}), falling back to {fallback.value}")
+                return await self._call_model(fallback, charges, deadline, **params), fallback
+        
+        try:
+            return await asyncio.wait_for(call(), timeout=budget)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{selected_model.value} call gave up after {budget:.0f}s across all attempts") from None
+    
+    async def _complete_chat(self, api_messages: List[Dict[str, str]], selected_model: ModelType,
+                             cache_key: str, temperature: float, max_tokens: int,
+                             priority: int, prompt_info: Optional[Dict[str, int]] = None,
+                             **kwargs) -> Dict[str, Any]:
+        """Check the budget, call the chat API once and cache the answer."""
+        # Estimate cost for budget checking, assuming the full max_tokens reply
+        prompt_tokens = self._count_message_tokens(api_messages, selected_model)
+        estimated_cost = self._estimate_cost(prompt_tokens, max_tokens, selected_model)
+        
+        if not await self.spend_ledger.reserve_async(estimated_cost):
+            logger.warning(f"Daily budget exceeded. Current spend: ${self.daily_spend:.4f}")
+            raise Exception("Daily budget exceeded")
+        charges = _AttemptCharges(prompt_tokens, max_tokens, estimated_cost)
+        
+        try:
+            # Wait for quota and a free slot; raises GatewayOverloaded when saturated
+            async with llm_gateway.slot(prompt_tokens + max_tokens, priority) as slot_usage:
+                # Make API call with messages
+                start_time = datetime.utcnow()
+                
+                response, model_used = await self._create_chat_completion(
+                    selected_model,
+                    charges,
+                    messages=api_messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs
+                )
+                slot_usage["actual_tokens"] = response.usage.total_tokens
+        except BaseException:
+            # No answer, so only abandoned attempts are charged; the rest of the reservations go back
+            await self.spend_ledger.record_async(charges.wasted, charges.reserved)
+            raise
+        
+        response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        
+        # Extract response
+        response_content = response.choices[0].message.content
+        tokens_used = response.usage.total_tokens
+        
+        # Calculate actual cost from the usage the API reports
+        actual_cost = self._estimate_cost(
+            response.usage.prompt_tokens,
+            response.usage.completion_tokens,
+            model_used
+        )
+        await self.spend_ledger.record_async(actual_cost + charges.wasted, charges.reserved)
+        if prompt_info is not None:
+            self._record_prompt_tokens(prompt_info)
+        
+        # Cache the response, unless it came from the fallback model
+        if model_used == selected_model:
             cache_data = {
                 "response": response_content,
                 "tokens_used": tokens_used,
@@ -187,248 +555,433 @@ class OpenAIService:
                 "timestamp": datetime.utcnow().isoformat()
             }
             self.response_cache[cache_key] = cache_data
-            
-            logger.info(f"Generated response with {selected_model.value} - Cost: ${actual_cost:.4f}, Tokens: {tokens_used}")
-            
-            return {
-                "response": response_content,
+        
+        logger.info(f"Generated response with {model_used.value} - Cost: ${actual_cost:.4f}, Tokens: {tokens_used}")
+        
+        return {
+            "response": response_content,
+            "model_used": model_used,
+            "tokens_used": tokens_used,
+            "cost_usd": f"{actual_cost:.6f}",
+            "cached": False,
+            "response_time_ms": response_time_ms
+        }
+    
+    async def generate_response_stream(self, prompt: str, complexity: str = "simple",
+                                       model: Optional[ModelType] = None, temperature: float = 0.7,
+                                       max_tokens: int = 1000, messages: Optional[List[Dict[str, str]]] = None,
+                                       priority: int = PRIORITY_AUTHENTICATED,
+                                       prompt_info: Optional[Dict[str, int]] = None,
+                                       **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response as `delta` events followed by one `done` event with cost and tokens."""
+        if not self.client:
+            raise Exception("OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.")
+        
+        selected_model = self._select_model(complexity, model)
+        api_messages = messages or [{"role": "user", "content": prompt}]
+        
+        cache_key = self._create_cache_key(
+            api_messages,
+            selected_model,
+            temp=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+        
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response:
+            logger.info(f"Cache hit for model {selected_model.value} (stream)")
+            yield {"type": "delta", "content": cached_response["response"]}
+            yield {
+                "type": "done",
+                "response": cached_response["response"],
                 "model_used": selected_model,
+                "tokens_used": cached_response["tokens_used"],
+                "cost_usd": cached_response["cost_usd"],
+                "cached": True,
+                "response_time_ms": 0
+            }
+            return
+        
+        prompt_tokens = self._count_message_tokens(api_messages, selected_model)
+        estimated_cost = self._estimate_cost(prompt_tokens, max_tokens, selected_model)
+        if not await self.spend_ledger.reserve_async(estimated_cost):
+            logger.warning(f"Daily budget exceeded. Current spend: ${self.daily_spend:.4f}")
+            raise Exception("Daily budget exceeded")
+        charges = _AttemptCharges(prompt_tokens, max_tokens, estimated_cost)
+        
+        parts: List[str] = []
+        usage = None
+        first_token_ms = None
+        model_used = None
+        stream = None
+        start_time = datetime.utcnow()
+        try:
+            # The slot is held until the stream is drained or the client goes away
+            async with llm_gateway.slot(prompt_tokens + max_tokens, priority) as slot_usage:
+                start_time = datetime.utcnow()
+                stream, model_used = await self._create_chat_completion(
+                    selected_model,
+                    charges,
+                    messages=api_messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **kwargs
+                )
+                
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        if first_token_ms is None:
+                            first_token_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+                        parts.append(content)
+                        yield {"type": "delta", "content": content}
+                if usage is not None:
+                    slot_usage["actual_tokens"] = usage.total_tokens
+        finally:
+            if stream is not None:
+                # Drops the upstream connection when the stream was abandoned part way
+                await stream.close()
+            # Charge what was generated even when the client went away or the stream broke off
+            if model_used is None:
+                await self.spend_ledger.record_async(charges.wasted, charges.reserved)
+            else:
+                if usage is not None:
+                    prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+                else:
+                    completion_tokens = self._count_tokens("".join(parts), model_used)
+                actual_cost = self._estimate_cost(prompt_tokens, completion_tokens, model_used)
+                await self.spend_ledger.record_async(actual_cost + charges.wasted, charges.reserved)
+        
+        response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        response_content = "".join(parts)
+        tokens_used = prompt_tokens + completion_tokens
+        if prompt_info is not None:
+            self._record_prompt_tokens(prompt_info)
+        
+        if model_used == selected_model:
+            self.response_cache[cache_key] = {
+                "response": response_content,
                 "tokens_used": tokens_used,
                 "cost_usd": f"{actual_cost:.6f}",
-                "cached": False,
-                "response_time_ms": response_time_ms
+                "timestamp": datetime.utcnow().isoformat()
             }
-            
-        except Exception as e:
-            logger.error(f"OpenAI response generation failed: {str(e)}")
-            raise
+        
+        logger.info(
+            f"Streamed response with {model_used.value} - Cost: ${actual_cost:.4f}, "
+            f"Tokens: {tokens_used}, First token: {first_token_ms}ms"
+        )
+        
+        yield {
+            "type": "done",
+            "response": response_content,
+            "model_used": model_used,
+            "tokens_used": tokens_used,
+            "cost_usd": f"{actual_cost:.6f}",
+            "cached": False,
+            "response_time_ms": response_time_ms,
+            "first_token_ms": first_token_ms
+        }
+    
+    @staticmethod
+    def _embedding_cache_key(text: str, model: str) -> str:
+        """Cache key over the full text, so long inputs sharing a prefix never collide."""
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        return f"embed:{model}:{digest}"
     
     async def generate_embedding(self, text: str, model: str = "text-embedding-ada-002") -> List[float]:
-        """Generate embedding with caching."""
+        """Generate embedding with caching; concurrent calls are coalesced into one request."""
         try:
             # Check if OpenAI client is available
             if not self.client:
                 raise Exception("OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.")
             # Check cache first
-            cache_key = f"embed:{text[:100]}:{model}"
+            cache_key = self._embedding_cache_key(text, model)
             cached_embedding = self.embedding_cache.get(cache_key)
             
             if cached_embedding:
                 logger.info("Embedding cache hit")
                 return cached_embedding
             
-            # Generate embedding
-            response = await self.client.embeddings.create(
-                model=model,
-                input=text
+            embedding, _ = await self._embedding_flights.do(
+                cache_key, lambda: self._embedding_batcher.submit(text, model)
             )
-            
-            embedding = response.data[0].embedding
-            
-            # Calculate cost
-            tokens = self._count_tokens(text, ModelType.GPT_35_TURBO)  # Rough estimate
-            cost = (tokens / 1000) * MODEL_COSTS["text-embedding-ada-002"]["input"]
-            self.daily_spend += cost
-            self.monthly_spend += cost
-            
-            # Cache the embedding
-            self.embedding_cache[cache_key] = embedding
-            
-            logger.info(f"Generated embedding - Cost: ${cost:.6f}")
             return embedding
             
         except Exception as e:
             logger.error(f"Embedding generation failed: {str(e)}")
             raise
     
+    async def generate_embeddings(self, texts: List[str], model: str = "text-embedding-ada-002",
+                                  batch_size: Optional[int] = None) -> List[List[float]]:
+        """Generate embeddings for many texts, one API request per batch."""
+        if not self.client:
+            raise Exception("OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.")
+        
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            cached_embedding = self.embedding_cache.get(self._embedding_cache_key(text, model))
+            if cached_embedding:
+                results[i] = cached_embedding
+            else:
+                missing.setdefault(text, []).append(i)
+        
+        unique_texts = list(missing)
+        batch_size = batch_size or self.settings.embedding_batch_max_size
+        for start in range(0, len(unique_texts), batch_size):
+            batch = unique_texts[start:start + batch_size]
+            embeddings = await self._embed_batch(batch, model)
+            for text, embedding in zip(batch, embeddings):
+                for i in missing[text]:
+                    results[i] = embedding
+        
+        return results
+    
+    async def _embed_batch(self, texts: List[str], model: str) -> List[List[float]]:
+        """Send one `embeddings.create` request for a batch of texts and cache the results."""
+        response = await self.client.embeddings.create(
+            model=model,
+            input=texts
+        )
+        
+        # The API may return items out of order; `index` refers to the input position
+        embeddings: List[List[float]] = [None] * len(texts)
+        for item in response.data:
+            embeddings[item.index] = item.embedding
+        
+        # Calculate cost
+        usage = getattr(response, "usage", None)
+        tokens = usage.total_tokens if usage else sum(token_counter.count(text, model) for text in texts)
+        cost = (tokens / 1000) * MODEL_COSTS["text-embedding-ada-002"]["input"]
+        await self.spend_ledger.record_async(cost)
+        
+        # Cache the embeddings
+        for text, embedding in zip(texts, embeddings):
+            self.embedding_cache[self._embedding_cache_key(text, model)] = embedding
+        
+        logger.info(f"Generated {len(texts)} embeddings in one request - Cost: ${cost:.6f}")
+        return embeddings
+    
+    @staticmethod
+    def _is_context_free(context: Dict[str, Any]) -> bool:
+        """First turn with no history or session memory, so the answer depends only on the question."""
+        return not any(context.values())
+    
+    async def _semantic_lookup(self, user_input: str, context: Dict[str, Any],
+                               query_embedding: Optional[List[float]]) -> Optional[List[float]]:
+        """Embedding to key the semantic cache on, or None when the turn is not cacheable."""
+        if not self.settings.semantic_cache_enabled or not self._is_context_free(context):
+            return None
+        if query_embedding is not None:
+            return query_embedding
+        try:
+            # Retrieval has normally embedded this query already, so this is an embedding cache hit
+            return await self.generate_embedding(user_input, model=self.settings.embedding_model)
+        except Exception as e:
+            logger.warning(f"Semantic cache skipped, embedding failed: {str(e)}")
+            return None
+    
+    def _jung_metadata(self, user_input: str, response: str, context: Dict[str, Any],
+                       retrieved_chunks: List[Dict[str, Any]], messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Jung-specific fields added to every response."""
+        return {
+            "analysis_type": self._determine_analysis_type(user_input),
+            "therapeutic_techniques": self._extract_techniques(response),
+            "jung_sources": retrieved_chunks,
+            "session_context_used": bool(context.get("previous_sessions")),
+            "conversation_length": len(messages)
+        }
+    
     async def generate_jung_response(self, user_input: str, context: Dict[str, Any], 
-                                   retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+                                   retrieved_chunks: List[Dict[str, Any]],
+                                   query_embedding: Optional[List[float]] = None,
+                                   context_length: Optional[int] = None,
+                                   priority: int = PRIORITY_AUTHENTICATED) -> Dict[str, Any]:
         """Generate Jung-specific therapeutic response."""
         try:
-            # Build Jung persona messages with conversation history
-            messages = self._build_jung_prompt(user_input, context, retrieved_chunks)
+            # Build Jung persona messages with conversation history fitted to the token budget
+            with span("prompt"):
+                messages, prompt_info = self._build_jung_prompt(user_input, context, retrieved_chunks, context_length)
+            
+            # Near-duplicate first-turn questions reuse an earlier answer
+            with span("semantic_cache"):
+                semantic_key = await self._semantic_lookup(user_input, context, query_embedding)
+            if semantic_key is not None:
+                cached = self.semantic_cache.lookup(semantic_key)
+                if cached:
+                    logger.info(f"Semantic cache hit (similarity {cached['similarity']:.3f})")
+                    return {
+                        **cached,
+                        "cached": True,
+                        "response_time_ms": 0,
+                        **prompt_info,
+                        **self._jung_metadata(user_input, cached["response"], context, retrieved_chunks, messages)
+                    }
             
             # Determine complexity based on context
             complexity = "complex" if context.get("previous_sessions") else "simple"
             
             # Generate response with conversation context
-            response_data = await self.generate_response(
-                prompt=user_input, # Keep for compatibility
-                complexity=complexity,
-                temperature=0.8,  # Slightly higher for more personality
-                max_tokens=800,
-                messages=messages # Pass the messages array
-            )
+            with span("llm"):
+                response_data = await self.generate_response(
+                    prompt=user_input, # Keep for compatibility
+                    complexity=complexity,
+                    temperature=0.8,  # Slightly higher for more personality
+                    max_tokens=800,
+                    messages=messages, # Pass the messages array
+                    priority=priority,
+                    prompt_info=prompt_info
+                )
             
-            # Extract Jung-specific metadata
-            analysis_type = self._determine_analysis_type(user_input)
-            therapeutic_techniques = self._extract_techniques(response_data["response"])
+            if semantic_key is not None and not response_data["cached"]:
+                self.semantic_cache.store(semantic_key, {
+                    key: response_data[key] for key in ("response", "model_used", "tokens_used", "cost_usd")
+                })
             
+            # Extract Jung-specific metadata
             return {
                 **response_data,
-                "analysis_type": analysis_type,
-                "therapeutic_techniques": therapeutic_techniques,
-                "jung_sources": retrieved_chunks,
-                "session_context_used": bool(context.get("previous_sessions")),
-                "conversation_length": len(messages)
+                **prompt_info,
+                **self._jung_metadata(user_input, response_data["response"], context, retrieved_chunks, messages)
             }
             
         except Exception as e:
             logger.error(f"Jung response generation failed: {str(e)}")
             raise
     
+    async def generate_jung_response_stream(self, user_input: str, context: Dict[str, Any],
+                                            retrieved_chunks: List[Dict[str, Any]],
+                                            query_embedding: Optional[List[float]] = None,
+                                            context_length: Optional[int] = None,
+                                            priority: int = PRIORITY_AUTHENTICATED) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a Jung response; the final `done` event carries the same metadata as generate_jung_response."""
+        with span("prompt"):
+            messages, prompt_info = self._build_jung_prompt(user_input, context, retrieved_chunks, context_length)
+        
+        with span("semantic_cache"):
+            semantic_key = await self._semantic_lookup(user_input, context, query_embedding)
+        if semantic_key is not None:
+            cached = self.semantic_cache.lookup(semantic_key)
+            if cached:
+                logger.info(f"Semantic cache hit (similarity {cached['similarity']:.3f}, stream)")
+                yield {"type": "delta", "content": cached["response"]}
+                yield {
+                    **cached,
+                    "type": "done",
+                    "cached": True,
+                    "response_time_ms": 0,
+                    **prompt_info,
+                    **self._jung_metadata(user_input, cached["response"], context, retrieved_chunks, messages)
+                }
+                return
+        
+        complexity = "complex" if context.get("previous_sessions") else "simple"
+        
+        # The stream spans many yields, so LLM time is measured by hand rather than with span()
+        llm_started = time.perf_counter()
+        first_delta = True
+        async for event in self.generate_response_stream(
+            prompt=user_input,
+            complexity=complexity,
+            temperature=0.8,
+            max_tokens=800,
+            messages=messages,
+            priority=priority,
+            prompt_info=prompt_info
+        ):
+            if event["type"] == "delta" and first_delta:
+                record("llm_first_token", time.perf_counter() - llm_started)
+                first_delta = False
+            if event["type"] == "done":
+                record("llm", time.perf_counter() - llm_started)
+                if semantic_key is not None and not event["cached"]:
+                    self.semantic_cache.store(semantic_key, {
+                        key: event[key] for key in ("response", "model_used", "tokens_used", "cost_usd")
+                    })
+                event = {
+                    **event,
+                    **prompt_info,
+                    **self._jung_metadata(user_input, event["response"], context, retrieved_chunks, messages)
+                }
+            yield event
+    
     def _build_jung_prompt(self, user_input: str, context: Dict[str, Any], 
-                          retrieved_chunks: List[Dict[str, Any]]) -> List[Dict[str, str]]:
-        """Build comprehensive Jung persona prompt with therapeutic depth."""
+                          retrieved_chunks: List[Dict[str, Any]],
+                          context_length: Optional[int] = None) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """Build comprehensive Jung persona prompt with therapeutic depth.
         
-        # Enhanced Jung persona system message
-        system_message = f"""You are Dr. Carl Gustav Jung, the pioneering Swiss psychiatrist and psychoanalyst, conducting a therapeutic session. You embody the wisdom of decades studying the human psyche and developing analytical psychology.
-
-CORE IDENTITY & APPROACH:
-You are the Jung who developed groundbreaking theories about the collective unconscious, archetypes, and individuation. You approach each person with deep respect for their unique psychological journey, seeing symptoms not as pathology but as meaningful expressions of the psyche's attempt toward wholeness.
-
-Treat each session like a therapy session. Follow the Jungian therapeutic process.
-
-Your therapeutic style is:
-- Deeply curious about symbols, dreams, and unconscious material
-- Focused on the individual's journey toward psychological wholeness (individuation)
-- Respectful of the patient's own inner wisdom and timing
-- Integration-oriented, helping people embrace rather than eliminate difficult aspects
-- Archetypal in perspective, connecting personal struggles to universal human patterns
-- Phenomenological - you meet people where they are without judgment
-
-THEORETICAL FOUNDATION:
-Draw from your comprehensive understanding of:
-
-**The Collective Unconscious & Archetypes:**
-- The Shadow (rejected/denied aspects of personality)
-- Anima/Animus (contrasexual aspects, inner feminine/masculine)
-- The Self (archetype of wholeness and the regulating center of the psyche)
-- The Persona (mask worn in social situations)
-- The Wise Old Man/Woman, Mother, Father, Hero, Trickster archetypes
-- Archetypal images as expressions of fundamental human experiences
-
-**The Individuation Process:**
-- The psychological journey toward becoming who one truly is
-- Integration of opposite aspects within the personality
-- The transcendent function - bridging conscious and unconscious
-- The importance of meaning-making and symbolic thinking
-- Recognizing that psychological development continues throughout life
-
-**Psychological Types:**
-- Extraversion vs. Introversion as fundamental orientations
-- Four functions: Thinking, Feeling, Sensation, Intuition
-- How type affects perception and decision-making
-- The inferior function as a source of both problems and growth
-
-**Dream Work & Active Imagination:**
-- Dreams as letters from the unconscious to consciousness
-- Amplification method - exploring personal and cultural associations
-- Active imagination as conscious engagement with unconscious material
-- Attending to recurring themes, symbols, and emotional tones
-
-**Therapeutic Process:**
-- The first half of life (ego development) vs. second half (meaning, spirituality)
-- Transference and countertransference as meaningful psychological phenomena
-- The healing power of conscious relationship to unconscious material
-- Religious and spiritual dimensions as essential to psychological health
-
-SESSION CONTEXT:
+        Returns the messages and their prompt-token accounting. The prompt is
+        kept within `context_length` (capped at `max_context_length`) tokens.
+        """
+        
+        # Per-request sections follow the static persona so the prompt prefix stays identical
+        sections = [f"""SESSION CONTEXT:
 - Session type: {context.get('session_type', 'general')}
 - Previous sessions with this person: {len(context.get('previous_sessions', []))}
-- This is {'a continuing therapeutic relationship' if context.get('previous_sessions') else 'our first encounter'}"""
+- This is {'a continuing therapeutic relationship' if context.get('previous_sessions') else 'our first encounter'}"""]
 
         # Add detailed session continuity for returning patients
         if context.get("previous_sessions"):
-            system_message += f"""
-
-THERAPEUTIC RELATIONSHIP HISTORY:
+            sections.append(f"""THERAPEUTIC RELATIONSHIP HISTORY:
 This person has been working with you before. Draw upon the established therapeutic alliance and previous insights:
 - Recurring themes we've explored: {', '.join(context.get('recurring_themes', [])[:5])}
 - Ongoing psychological work: {', '.join(context.get('therapeutic_goals', [])[:5])}
 - Session count: {len(context.get('previous_sessions'))}
 
-Continue building upon previous insights while remaining open to new material that emerges. Notice patterns and psychological developments over time.
-"""
+Continue building upon previous insights while remaining open to new material that emerges. Notice patterns and psychological developments over time.""")
 
         # Add relevant Jung text sources with context
         if retrieved_chunks:
-            system_message += f"""
-
-RELEVANT INSIGHTS FROM YOUR WRITTEN WORK:
-Your extensive writings provide additional context for this session:
-"""
+            source_lines = [
+                "RELEVANT INSIGHTS FROM YOUR WRITTEN WORK:",
+                "Your extensive writings provide additional context for this session:"
+            ]
             for i, chunk in enumerate(retrieved_chunks[:3], 1):
                 source_text = chunk.get('text', '')[:300]
                 source_info = chunk.get('source', f'Volume {i}')
-                system_message += f"""
-{i}. From {source_info}: "{source_text}..."
-"""
-        
-        system_message += f"""
-
-HOW TO RESPOND AS JUNG:
-
-USE CITATIONS AS MUCH AS POSSIBLE WHILE STILL FOLLOWING THE JUNGIAN THERAPEUTIC PROCESS.
+                if chunk.get('page'):
+                    source_info += f", page {chunk['page']}"
+                source_lines.append(f'{i}. From {source_info}: "{source_text}..."')
+            sections.append("\n".join(source_lines))
 
-**CITATION REQUIREMENTS:**
-- EVERY SINGLE TIME YOU REFERENCE A SOURCE, YOU MUST CITE IT. CITATION IS REQUIRED. CITATION MUST INCLUDE TITLE OF SOURCE, PAGE NUMBER, AND YEAR PUBLISHED.
-- When referencing your written works in your therapeutic responses:
-- Always cite the exact source name when drawing from the provided content
-- Format as: (Source: "Book Title", "Page Number", "Year published") 
-- Example: "As I explored in my analysis of dreams (Source: "Dream Analysis Seminars"), the unconscious..."
-- Example: "In my work on individuation (Source: "Memories, Dreams, Reflections"), I noted that..."
-- Only cite sources that are actually relevant to your current response
-- Never fabricate citations - only use the sources provided above
-- Seamlessly integrate citations into your therapeutic dialogue
-
-**Language & Tone:**
-- Speak thoughtfully and with psychological depth
-- Use sophisticated but accessible language
-- Reference archetypal and symbolic material when relevant
-- Ask penetrating questions that invite self-reflection
-- Avoid modern therapy jargon - speak as Jung from his era would
-- Show genuine curiosity about the person's inner world
-
-**Therapeutic Interventions:**
-- Listen for archetypal themes and universal human patterns
-- Invite exploration of dreams, fantasies, and symbolic material
-- Help distinguish between ego and Self, persona and authentic personality
-- Explore the meaning and purpose behind symptoms or difficulties
-- Look for what the psyche is trying to achieve or communicate
-- Encourage active imagination and symbolic thinking
-- Address both personal and transpersonal dimensions
-
-**Session Flow:**
-- Begin by acknowledging what the person has shared
-- Ask one or two focused questions to deepen understanding
-- Offer Jungian insights or interpretations when appropriate
-- Suggest psychological exercises or ways to engage with unconscious material
-- Always return focus to the person's own inner wisdom and process
-- End with something that invites continued reflection
-
-**Key Principles:**
-- The psyche has its own wisdom and healing capacity
-- Symptoms often point toward unlived aspects of personality
-- Integration, not elimination, is the goal
-- Personal problems connect to universal human experiences
-- Meaning and purpose are essential to psychological health
-- The unconscious compensates for conscious attitudes
-- Psychological development is a lifelong process
-
-Respond as the wise, insightful Carl Jung who sees the profound depth and potential in every human being. Draw upon your decades of clinical experience, extensive theoretical knowledge, and genuine care for human psychological development."""
+        session_sections = "\n\n".join(sections)
+        system_message = f"{JUNG_PERSONA_PROMPT}\n\n{session_sections}"
 
         # Build messages array with conversation history
         messages = [{"role": "system", "content": system_message}]
         
+        # Fit as much recent history as the token budget allows; older turns are summarised
+        conversation_history = [
+            msg for msg in context.get("conversation_history", [])
+            if msg["role"] in ["user", "assistant"]
+        ]
+        prompt_budget = min(context_length or self.settings.max_context_length, self.settings.max_context_length)
+        # System prompt, current input and the assistant reply primer are always sent;
+        # the persona's token count is measured once at startup
+        fixed_tokens = (
+            self.persona_tokens
+            + self.context_window.tokens(session_sections)
+            + self.context_window.tokens(user_input)
+            + MESSAGE_OVERHEAD_TOKENS
+        )
+        window = self.context_window.build(conversation_history, prompt_budget - fixed_tokens)
+        
+        if window["summary"]:
+            messages.append({"role": "system", "content": window["summary"]})
+        
         # Add conversation history
-        conversation_history = context.get("conversation_history", [])
-        for msg in conversation_history:
-            if msg["role"] in ["user", "assistant"]:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+        for msg in window["messages"]:
+            messages.append({
+                "role": msg["role"],
+                "content": msg["content"]
+            })
         
         # Add current user input
         messages.append({
@@ -436,7 +989,35 @@ Respond as the wise, insightful Carl Jung who sees the profound depth and potent
             "content": user_input
         })
         
-        return messages
+        prompt_info = {
+            "prompt_tokens": fixed_tokens + window["history_tokens"],
+            "history_messages_used": window["kept_messages"],
+            "history_messages_summarized": window["summarized_messages"],
+            "history_messages_dropped": window["dropped_messages"],
+        }
+        return messages, prompt_info
+    
+    def _record_prompt_tokens(self, prompt_info: Dict[str, int]) -> None:
+        """Accumulate prompt-token counts for each Jung prompt sent to the model."""
+        tokens = prompt_info["prompt_tokens"]
+        self.prompt_stats["turns"] += 1
+        self.prompt_stats["prompt_tokens_total"] += tokens
+        self.prompt_stats["prompt_tokens_last"] = tokens
+        self.prompt_stats["prompt_tokens_max"] = max(self.prompt_stats["prompt_tokens_max"], tokens)
+        if prompt_info["history_messages_summarized"] or prompt_info["history_messages_dropped"]:
+            self.prompt_stats["turns_with_summary"] += 1
+        logger.info(
+            f"Prompt: {tokens} tokens, {prompt_info['history_messages_used']} history messages, "
+            f"{prompt_info['history_messages_summarized']} summarized"
+        )
+    
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """Prompt-token statistics across turns."""
+        turns = self.prompt_stats["turns"]
+        return {
+            **self.prompt_stats,
+            "prompt_tokens_avg": round(self.prompt_stats["prompt_tokens_total"] / turns, 1) if turns else 0,
+        }
     
     def _determine_analysis_type(self, user_input: str) -> str:
         """Determine Jungian analysis type based on user input."""
@@ -534,17 +1115,32 @@ Respond as the wise, insightful Carl Jung who sees the profound depth and potent
     
     def reset_daily_costs(self):
         """Reset daily cost tracking."""
-        self.daily_spend = 0.0
-        self.last_reset = datetime.utcnow()
+        self.spend_ledger.reset_day()
         logger.info("Daily costs reset")
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
         return {
             "response_cache_size": len(self.response_cache),
-            "response_cache_hits": getattr(self.response_cache, 'hits', 0),
+            "response_cache_hits": self.response_cache.hits,
+            "response_cache_misses": self.response_cache.misses,
+            "response_cache_bytes": self.response_cache.currsize,
+            "response_cache_max_bytes": self.response_cache.maxsize,
             "embedding_cache_size": len(self.embedding_cache),
             "embedding_cache_hits": getattr(self.embedding_cache, 'hits', 0),
+            **self.semantic_cache.get_stats(),
+            **token_counter.get_stats(),
+            **self._embedding_batcher.get_stats(),
+            **self._chat_flights.get_stats(),
+            **self._embedding_flights.get_stats(),
+            **self.spend_ledger.get_stats(),
+        }
+    
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """Circuit breaker state per model and hedging statistics."""
+        return {
+            "circuits": {model.value: breaker.get_stats() for model, breaker in self.breakers.items()},
+            **(self.hedger.get_stats() if self.hedger else {"hedging": "disabled"}),
         }
 
 # Global OpenAI service instance
@@ -0,0 +1,108 @@
+"""
+Request timing for Jung AI - Per-stage spans for Server-Timing headers and timing logs
+"""
+
+import json
+import logging
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+# Returned by span() when no request is being timed, so disabled timing costs one lookup
+_NOOP = nullcontext()
+
+
+class RequestTimings:
+    """Spans recorded for one request, in the order they finished.
+
+    The middleware creates one per request and puts it in a contextvar.
+    Tasks spawned while handling the request copy the context and so record
+    into the same object, including the body of a streaming response.
+    """
+
+    __slots__ = ("spans", "started")
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+        self.started = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        self.spans.append((name, seconds))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def totals(self) -> Dict[str, float]:
+        """Milliseconds per span name; repeated spans are summed."""
+        totals: Dict[str, float] = {}
+        for name, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds * 1000
+        return {name: round(ms, 1) for name, ms in totals.items()}
+
+    def server_timing(self) -> str:
+        """Server-Timing header value for the spans so far, plus the total."""
+        metrics = [f"{name};dur={ms}" for name, ms in self.totals().items()]
+        metrics.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(metrics)
+
+
+class _Span:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.timings.add(self.name, time.perf_counter() - self.start)
+
+
+def span(name: str):
+    """Time a block as stage `name` of the current request; a no-op outside one."""
+    timings = _current.get()
+    if timings is None:
+        return _NOOP
+    return _Span(timings, name)
+
+
+def record(name: str, seconds: float) -> None:
+    """Record a stage measured by the caller, e.g. one spread over a stream."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def start_request() -> Tuple[RequestTimings, Token]:
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token: Token) -> None:
+    _current.reset(token)
+
+
+def log_request(timings: RequestTimings, method: str, path: str, status_code: int,
+                min_ms: float = 0) -> None:
+    """Emit one JSON line with the request's total time and per-stage spans."""
+    if not timings.spans:
+        return
+    total_ms = round(timings.elapsed_ms(), 1)
+    if total_ms < min_ms:
+        return
+    fields: Dict[str, Any] = {
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "total_ms": total_ms,
+        "spans_ms": timings.totals(),
+    }
+    logger.info(f"request_timing {json.dumps(fields)}", extra={"timing": fields})
@@ -0,0 +1,209 @@
+"""
+Resilience for Jung AI - Retries with jittered backoff, hedged requests and circuit breakers
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    """Raised without calling the provider while a model's circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit open for {name}, retry after {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth another try."""
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, TimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after_hint(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, from a 429's Retry-After header."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def retry_with_backoff(call: Callable[[], Awaitable[Any]], attempts: int = 3,
+                             base_delay: float = 0.25, max_delay: float = 4.0,
+                             deadline: Optional[float] = None) -> Any:
+    """Run `call`, retrying retryable errors with capped exponential backoff.
+
+    Delays use full jitter (uniform between zero and the capped exponential
+    step) so clients that failed together do not retry together. A provider
+    Retry-After hint raises the delay, but never past `max_delay`. No retry
+    is started after `deadline` (a `time.monotonic()` value).
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            hint = _retry_after_hint(e)
+            if hint is not None:
+                delay = min(max_delay, max(delay, hint))
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            logger.warning(f"OpenAI call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """Closed, open and half-open circuit for one upstream model.
+
+    `failure_threshold` consecutive retryable failures open the circuit.
+    While open, calls fail fast. After `reset_timeout` one probe call is let
+    through, and its outcome closes the circuit or opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now."""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._probing = False
+        # A probe that never reported back (e.g. cancelled) is replaced after a while
+        if self.state == "half_open" and (not self._probing or time.monotonic() - self._probe_started >= self.reset_timeout):
+            self._probing = True
+            self._probe_started = time.monotonic()
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_after(self) -> float:
+        return max(1.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """End a call that proved nothing about health, leaving the state as it is.
+
+        A half-open circuit lets the next call probe instead of waiting for
+        this one to go stale.
+        """
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class Hedger:
+    """Send a backup request when the first is slower than recent p95 latency.
+
+    Whichever response arrives first is used and the other request is
+    cancelled. Hedging starts only after `min_samples` latencies have been
+    seen, and never earlier than `min_delay`, so a cold start does not
+    double every call.
+    """
+
+    def __init__(self, percentile: float = 0.95, min_samples: int = 20,
+                 min_delay: float = 0.5, window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies: deque = deque(maxlen=window)
+        # Strong references until each request (or its cancellation) finishes
+        self._tasks: set = set()
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def threshold(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little history."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def _spawn(self, call: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        task = asyncio.ensure_future(call())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        first = self._spawn(call)
+        delay = self.threshold()
+        tasks = {first}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.hedged += 1
+                    tasks.add(self._spawn(call))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        self._latencies.append(time.monotonic() - started)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        threshold = self.threshold()
+        return {
+            "hedged_requests": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_threshold_ms": round(threshold * 1000, 1) if threshold is not None else None,
+        }
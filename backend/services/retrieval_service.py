@@ -0,0 +1,217 @@
+"""
+Retrieval service for Jung AI - In-process vector search over the collected works
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from pydantic import ValidationError
+
+from config import get_settings
+from models.schemas import JungSource
+from services.lexical_index import BM25Index, reciprocal_rank_fusion
+from services.openai_service import openai_service
+from services.vector_index import ExactIndex, Int8Index, IVFIndex
+from services.vector_store import VectorStore, citation_fields, open_vector_store
+
+logger = logging.getLogger(__name__)
+
+QueryVectors = Union[np.ndarray, Sequence[Sequence[float]]]
+
+
+class RetrievalService:
+    """Top-k cosine search over the memory-mapped Jung chunk store."""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._store: Optional[VectorStore] = None
+        self._index = None
+        self._lexical: Optional[BM25Index] = None
+        self.invalid_chunks = 0
+        self.embedding_failures = 0
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether a vector store has been opened."""
+        return self._store is not None and len(self._store) > 0
+
+    @property
+    def size(self) -> int:
+        """Number of chunks available for retrieval."""
+        return 0 if self._store is None else len(self._store)
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """Open the vector store; vectors stay on disk and are paged in on demand."""
+        store_path = path or self.settings.vector_store_path
+
+        try:
+            start_time = time.perf_counter()
+            store = open_vector_store(store_path)
+            if store is None:
+                logger.warning(f"Vector store not found at {store_path}; retrieval disabled")
+                return False
+
+            index = self._load_index(store)
+            # Postings are memory-mapped on the first hybrid query, not here
+            lexical = BM25Index.open(store_path, k1=self.settings.bm25_k1, b=self.settings.bm25_b)
+
+            if self._store is not None:
+                self._store.close()
+            self._store = store
+            self._index = index
+            self._lexical = lexical
+
+            load_ms = (time.perf_counter() - start_time) * 1000
+            logger.info(
+                f"Opened {len(store)} Jung chunks ({store.dim} dims, {index.name} index) in {load_ms:.1f}ms"
+            )
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to open vector store {store_path}: {str(e)}")
+            self._store = None
+            self._index = None
+            self._lexical = None
+            return False
+
+    def _load_index(self, store: VectorStore):
+        """Pick the search index configured by `retrieval_index_mode`."""
+        mode = self.settings.retrieval_index_mode.lower()
+
+        if mode == "int8":
+            index = Int8Index.load(store, candidates=self.settings.retrieval_rescore_candidates)
+            if index is not None:
+                return index
+            logger.warning("int8 index files not found; falling back to exact search")
+        elif mode == "ivf":
+            index = IVFIndex.load(store, nprobe=self.settings.ivf_nprobe)
+            if index is not None:
+                return index
+            logger.warning("IVF index file not found; falling back to exact search")
+        elif mode != "exact":
+            logger.warning(f"Unknown retrieval index mode '{mode}'; using exact search")
+
+        return ExactIndex(store)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalise rows in place, leaving all-zero rows untouched."""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+        return vectors
+
+    def _prepare_queries(self, query_embeddings: QueryVectors) -> np.ndarray:
+        """Coerce query embeddings to a normalised (B, D) float32 matrix."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        return self._normalize(queries.copy())
+
+    def search(self, query_embeddings: QueryVectors, top_k: Optional[int] = None) -> List[List[JungSource]]:
+        """Return the top-k chunks for each query vector, best first."""
+        if not self.is_ready:
+            return []
+
+        queries = self._prepare_queries(query_embeddings)
+        k = min(top_k or self.settings.max_retrieval_chunks, self.size)
+        if k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        top_scores, top_ids = self._index.search(queries, k)
+
+        return [
+            self._to_sources(ids, row_scores)
+            for ids, row_scores in zip(top_ids, top_scores)
+        ]
+
+    def hybrid_search(self, query: str, query_embedding: Sequence[float],
+                      top_k: Optional[int] = None) -> List[JungSource]:
+        """Fuse vector and BM25 rankings with reciprocal rank fusion."""
+        if not self.is_ready:
+            return []
+        if self._lexical is None:
+            return self.search([query_embedding], top_k)[0]
+
+        k = min(top_k or self.settings.max_retrieval_chunks, self.size)
+        depth = max(k, self.settings.hybrid_candidates)
+        queries = self._prepare_queries([query_embedding])
+
+        _, vector_ids = self._index.search(queries, depth)
+        _, lexical_ids = self._lexical.search(query, depth)
+        fused = reciprocal_rank_fusion([vector_ids[0], lexical_ids], k=self.settings.rrf_k)[:k]
+        if not fused:
+            return []
+
+        # Report cosine similarity as relevance, including for lexical-only hits
+        ids = np.array([doc_id for doc_id, _ in fused], dtype=np.int64)
+        cosine = np.asarray(self._store.vectors[ids]) @ queries[0]
+        return self._to_sources(ids, cosine)
+
+    def _to_sources(self, ids: np.ndarray, scores: np.ndarray) -> List[JungSource]:
+        """Convert matrix row ids and scores into JungSource citations."""
+        sources: List[JungSource] = []
+        for chunk_index, score in zip(ids.tolist(), scores.tolist()):
+            if chunk_index < 0 or score < self.settings.retrieval_min_score:
+                continue
+            chunk = self._store.chunk(chunk_index)
+            # Stores built before types were normalised may hold numeric volumes
+            volume, page = citation_fields(chunk.get("volume"), chunk.get("page"))
+            try:
+                sources.append(JungSource(
+                    chunk_id=str(chunk.get("chunk_id", chunk_index)),
+                    text=chunk.get("text", ""),
+                    source=chunk.get("source", "Collected Works"),
+                    volume=volume,
+                    page=page,
+                    concepts=chunk.get("concepts") or [],
+                    relevance_score=min(1.0, max(0.0, score))
+                ))
+            except ValidationError as e:
+                # One malformed chunk costs its own citation, not every hit of the query
+                self.invalid_chunks += 1
+                logger.error(f"Invalid metadata for chunk {chunk.get('chunk_id', chunk_index)}: {str(e)}")
+        return sources
+
+    async def retrieve(self, query: str,
+                       top_k: Optional[int] = None) -> Tuple[List[JungSource], Optional[List[float]]]:
+        """Embed the user query and return the most relevant Jung passages.
+        
+        The query embedding is returned alongside (None when it was not
+        computed), so the semantic cache can reuse it instead of embedding again.
+        """
+        if not self.is_ready:
+            return [], None
+
+        try:
+            embedding = await openai_service.generate_embedding(query, model=self.settings.embedding_model)
+        except Exception as e:
+            # The embeddings API being down degrades chat to answers without citations;
+            # errors in the search itself are bugs and propagate
+            self.embedding_failures += 1
+            logger.error(f"Retrieval skipped, query embedding failed: {str(e)}")
+            return [], None
+
+        # The matrix product releases the GIL, so keep it off the event loop
+        if self.settings.hybrid_retrieval:
+            return await asyncio.to_thread(self.hybrid_search, query, embedding, top_k), embedding
+        results = await asyncio.to_thread(self.search, [embedding], top_k)
+        return (results[0] if results else []), embedding
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get retrieval index statistics."""
+        return {
+            "chunks": self.size,
+            "dimensions": 0 if self._store is None else self._store.dim,
+            "mapped_mb": 0 if self._store is None else round(self._store.nbytes / (1024 * 1024), 1),
+            "index": None if self._index is None else self._index.name,
+            "hybrid": self._lexical is not None and self.settings.hybrid_retrieval,
+            "invalid_chunks": self.invalid_chunks,
+            "embedding_failures": self.embedding_failures,
+        }
+
+# Global retrieval service instance
+retrieval_service = RetrievalService()
@@ -0,0 +1,111 @@
+"""
+Semantic cache for Jung AI - Reuse answers to near-duplicate first-turn questions
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Cosine-similarity lookup over (query embedding, response) pairs.
+
+    Embeddings live in one preallocated (capacity, D) float32 matrix, so a
+    lookup is a single matrix-vector product. When the cache is full the
+    least recently used slot is overwritten. Lookups scoring just below the
+    threshold are counted as near misses, which helps tune the threshold.
+    """
+
+    def __init__(self, capacity: int = 512, threshold: float = 0.95,
+                 ttl: float = 3600, near_miss_margin: float = 0.05):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.near_miss_margin = near_miss_margin
+
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._stored_at = np.zeros(capacity, dtype=np.float64)
+        self._size = 0
+        self._clock = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    @staticmethod
+    def _normalise(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """Return the cached entry most similar to the query, if above the threshold."""
+        if self._size == 0 or self._vectors is None or len(embedding) != self._vectors.shape[1]:
+            self.misses += 1
+            return None
+
+        similarities = self._vectors[:self._size] @ self._normalise(embedding)
+        # Expired slots never match; they are reused first by `store`
+        similarities[time.monotonic() - self._stored_at[:self._size] > self.ttl] = -np.inf
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+
+        if similarity >= self.threshold:
+            self.hits += 1
+            self._last_used[best] = self._tick()
+            return {**self._entries[best], "similarity": similarity}
+
+        self.misses += 1
+        if similarity >= self.threshold - self.near_miss_margin:
+            self.near_misses += 1
+        return None
+
+    def store(self, embedding: Sequence[float], entry: Dict[str, Any]) -> None:
+        """Insert a pair, evicting the least recently used slot when full."""
+        if self.capacity <= 0:
+            return
+        if self._vectors is None:
+            self._vectors = np.zeros((self.capacity, len(embedding)), dtype=np.float32)
+        elif len(embedding) != self._vectors.shape[1]:
+            return
+
+        if self._size < self.capacity:
+            slot = self._size
+            self._size += 1
+        else:
+            expired = np.flatnonzero(time.monotonic() - self._stored_at > self.ttl)
+            slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+
+        self._vectors[slot] = self._normalise(embedding)
+        self._entries[slot] = entry
+        self._stored_at[slot] = time.monotonic()
+        self._last_used[slot] = self._tick()
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        self._entries = [None] * self.capacity
+        self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit, miss and near-miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "semantic_cache_size": self._size,
+            "semantic_cache_hits": self.hits,
+            "semantic_cache_misses": self.misses,
+            "semantic_cache_near_misses": self.near_misses,
+            "semantic_cache_hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
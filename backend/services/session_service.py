@@ -2,13 +2,19 @@
 Session service for Jung AI - Anonymous and Authenticated Session Management
 """
 
+import asyncio
 import logging
-from typing import Optional, List, Dict, Any
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta
+from cachetools import LRUCache
 from fastapi import HTTPException, status
 from supabase import create_client, Client
 import uuid
 from config import get_settings
+from services.auth_service import auth_service
 from models.schemas import (
     SessionCreate, SessionResponse, SessionUpdate, SessionSummary,
     MessageResponse, SessionContextResponse
@@ -16,6 +22,18 @@ from models.schemas import (
 
 logger = logging.getLogger(__name__)
 
+# Compact conversation history entry: (role, content, timestamp)
+HistoryEntry = Tuple[str, str, str]
+
+class _HistoryTail:
+    """Cached last messages of a session and the `message_count` they are current for."""
+    
+    __slots__ = ("message_count", "messages")
+    
+    def __init__(self, message_count: int, messages: List[HistoryEntry]):
+        self.message_count = message_count
+        self.messages = messages
+
 class SessionService:
     """Session management service for Jung AI."""
     
@@ -38,9 +56,62 @@ class SessionService:
                 self.settings.supabase_service_role_key  # Use service role for admin operations
             )
 
+        # The supabase client is synchronous, so queries run on a bounded thread
+        # pool; the semaphore queues excess callers on the event loop instead
+        self._db_executor = ThreadPoolExecutor(
+            max_workers=self.settings.db_max_concurrency,
+            thread_name_prefix="supabase"
+        )
+        self._db_semaphore = asyncio.Semaphore(self.settings.db_max_concurrency)
+
+        # Write-behind chat persistence: turns are queued and written by one
+        # background task; reads of a session wait for its pending writes
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._pending_writes: Dict[str, asyncio.Future] = {}
+        self._last_provisional_id = 0
+        # Turns that could not be written after retries, kept for inspection
+        self._dead_letters: deque = deque(maxlen=self.settings.dead_letter_turns)
+        self.failed_writes = 0
+
+        # Per-session message tails, appended as turns are persisted so chat
+        # turns do not re-read history they just wrote. Each worker has its own
+        # cache, so entries carry the session's message_count and are reloaded
+        # when another worker has added messages since.
+        self._history_cache: LRUCache = LRUCache(maxsize=self.settings.history_cache_sessions)
+
         # In-memory stores used only in demo mode
         self._memory_sessions: Dict[str, Dict[str, Any]] = {}
         self._memory_messages: Dict[str, List[Dict[str, Any]]] = {}
+    
+    async def execute(self, query):
+        """Run a PostgREST query builder without blocking the event loop."""
+        async with self._db_semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._db_executor, query.execute)
+    
+    async def start_writer(self) -> None:
+        """Start the background task that persists queued chat turns."""
+        if self._writer_task is None:
+            self._write_queue = asyncio.Queue(maxsize=self.settings.write_behind_queue_size)
+            self._writer_task = asyncio.create_task(self._writer_loop())
+    
+    async def stop_writer(self) -> None:
+        """Write every queued turn, then stop the background task."""
+        if self._writer_task is None:
+            return
+        await self._write_queue.join()
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        self._writer_task = None
+        self._write_queue = None
+    
+    def shutdown(self) -> None:
+        """Stop the database thread pool."""
+        self._db_executor.shutdown(wait=False)
         
     async def create_session(self, user_id: Optional[int] = None, title: Optional[str] = None) -> SessionResponse:
         """Create a new session (anonymous or authenticated)."""
@@ -62,6 +133,9 @@ class SessionService:
                 "duration_minutes": 0,
             }
 
+            # A new session has no history to fetch
+            self._history_cache[session_id] = _HistoryTail(0, [])
+
             if self.demo_mode or self.supabase is None:
                 # Store session in memory for demo mode
                 self._memory_sessions[session_id] = session_data
@@ -69,7 +143,7 @@ class SessionService:
                 logger.info(f"[DEMO] Created {'anonymous' if is_anonymous else 'authenticated'} session: {session_id}")
                 return SessionResponse(**session_data)
             else:
-                response = self.supabase.table("sessions").insert(session_data).execute()
+                response = await self.execute(self.supabase.table("sessions").insert(session_data))
 
                 if not response.data:
                     raise HTTPException(
@@ -103,7 +177,7 @@ class SessionService:
                 if not session_data:
                     return None
             else:
-                response = self.supabase.table("sessions").select("*").eq("id", session_id).execute()
+                response = await self.execute(self.supabase.table("sessions").select("*").eq("id", session_id))
                 if not response.data:
                     return None
                 session_data = response.data[0]
@@ -153,7 +227,7 @@ class SessionService:
                     return SessionResponse(**self._memory_sessions[session_id])
                 return None
             else:
-                response = self.supabase.table("sessions").update(update_data).eq("id", session_id).execute()
+                response = await self.execute(self.supabase.table("sessions").update(update_data).eq("id", session_id))
                 if not response.data:
                     return None
                 return SessionResponse(**response.data[0])
@@ -172,13 +246,15 @@ class SessionService:
             if not session:
                 return False
             
+            self._history_cache.pop(session_id, None)
+            
             if self.demo_mode or self.supabase is None:
                 self._memory_sessions.pop(session_id, None)
                 self._memory_messages.pop(session_id, None)
                 return True
             
             # Delete session (cascades to messages) in Supabase
-            self.supabase.table("sessions").delete().eq("id", session_id).execute()
+            await self.execute(self.supabase.table("sessions").delete().eq("id", session_id))
             
             # Update user stats if authenticated
             if session.user_id:
@@ -202,9 +278,9 @@ class SessionService:
                         sessions.append(SessionSummary(**sess))
                 return sessions
             else:
-                response = self.supabase.table("sessions").select(
+                response = await self.execute(self.supabase.table("sessions").select(
                     "id, title, session_type, created_at, last_activity, message_count, is_anonymous"
-                ).eq("user_id", user_id).order("last_activity", desc=True).range(offset, offset + limit - 1).execute()
+                ).eq("user_id", user_id).order("last_activity", desc=True).range(offset, offset + limit - 1))
                 sessions: List[SessionSummary] = []
                 for session_data in response.data:
                     sessions.append(SessionSummary(**session_data))
@@ -228,7 +304,7 @@ class SessionService:
                 return False
             else:
                 # Get the anonymous session
-                response = self.supabase.table("sessions").select("*").eq("id", session_id).eq("is_anonymous", True).execute()
+                response = await self.execute(self.supabase.table("sessions").select("*").eq("id", session_id).eq("is_anonymous", True))
                 if not response.data:
                     return False
                 # Update session to be owned by user
@@ -237,7 +313,7 @@ class SessionService:
                     "is_anonymous": False,
                     "updated_at": datetime.utcnow().isoformat()
                 }
-                self.supabase.table("sessions").update(update_data).eq("id", session_id).execute()
+                await self.execute(self.supabase.table("sessions").update(update_data).eq("id", session_id))
                 await self._update_user_session_count(user_id, increment=True)
                 logger.info(f"Converted anonymous session {session_id} to user {user_id}")
                 return True
@@ -254,13 +330,14 @@ class SessionService:
             if not session:
                 return []
 
+            await self._wait_for_pending_writes(session_id)
             if self.demo_mode or self.supabase is None:
                 messages: List[MessageResponse] = []
                 for msg in self._memory_messages.get(session_id, [])[:limit]:
                     messages.append(MessageResponse(**msg))
                 return messages
             else:
-                response = self.supabase.table("messages").select("*").eq("session_id", session_id).order("timestamp", desc=False).limit(limit).execute()
+                response = await self.execute(self.supabase.table("messages").select("*").eq("session_id", session_id).order("timestamp", desc=False).limit(limit))
                 messages: List[MessageResponse] = []
                 for message_data in response.data:
                     messages.append(MessageResponse(**message_data))
@@ -270,6 +347,64 @@ class SessionService:
             logger.error(f"Failed to get messages for session {session_id}: {str(e)}")
             return []
     
+    def _append_history(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Extend a cached history tail; uncached sessions are loaded on their next read."""
+        tail = self._history_cache.get(session_id)
+        if tail is None:
+            return
+        tail.messages.extend((msg["role"], msg["content"], msg.get("timestamp", "")) for msg in messages)
+        tail.message_count += len(messages)
+        limit = self.settings.history_cache_messages
+        if len(tail.messages) > limit:
+            del tail.messages[:len(tail.messages) - limit]
+    
+    async def get_conversation_history(self, session_id: str,
+                                       message_count: Optional[int] = None) -> List[HistoryEntry]:
+        """Most recent messages of a session as (role, content, timestamp) tuples.
+        
+        Served from the per-session cache when it is current for
+        `message_count`, the count just read from the session row. While this
+        worker still has turns of the session queued, the row lags behind the
+        cache, and the cache is used as is. Messages that another worker wrote
+        in that window are picked up on the first read after the queue drains.
+        Without `message_count` any cached tail is used. Callers must have
+        checked session access already.
+        """
+        tail = self._history_cache.get(session_id)
+        if tail is not None and (
+            message_count is None
+            or message_count == tail.message_count
+            or session_id in self._pending_writes
+        ):
+            return list(tail.messages)
+        
+        try:
+            await self._wait_for_pending_writes(session_id)
+            limit = self.settings.history_cache_messages
+            if self.demo_mode or self.supabase is None:
+                rows = self._memory_messages.get(session_id, [])[-limit:]
+                current_count = int(self._memory_sessions.get(session_id, {}).get("message_count", len(rows)))
+            else:
+                # Count first: a turn landing in between then leaves the tail newer
+                # than its count, which only costs one more reload, never a stale hit
+                session_response = await self.execute(
+                    self.supabase.table("sessions").select("message_count").eq("id", session_id)
+                )
+                current_count = session_response.data[0]["message_count"] if session_response.data else 0
+                response = await self.execute(
+                    self.supabase.table("messages").select("role, content, timestamp")
+                    .eq("session_id", session_id).order("timestamp", desc=True).limit(limit)
+                )
+                rows = list(reversed(response.data))
+            
+            history = [(row["role"], row["content"], str(row["timestamp"])) for row in rows]
+            self._history_cache[session_id] = _HistoryTail(current_count, history)
+            return list(history)
+            
+        except Exception as e:
+            logger.error(f"Failed to get conversation history for session {session_id}: {str(e)}")
+            return []
+    
     async def update_session_activity(self, session_id: str) -> None:
         """Update session last activity timestamp."""
         try:
@@ -278,9 +413,9 @@ class SessionService:
                     self._memory_sessions[session_id]["last_activity"] = datetime.utcnow().isoformat()
                 return
             else:
-                self.supabase.table("sessions").update({
+                await self.execute(self.supabase.table("sessions").update({
                     "last_activity": datetime.utcnow().isoformat()
-                }).eq("id", session_id).execute()
+                }).eq("id", session_id))
             
         except Exception as e:
             logger.error(f"Failed to update session activity {session_id}: {str(e)}")
@@ -295,19 +430,119 @@ class SessionService:
                     self._memory_sessions[session_id]["last_activity"] = datetime.utcnow().isoformat()
                 return
             else:
-                # Get current count
-                response = self.supabase.table("sessions").select("message_count").eq("id", session_id).execute()
-                if response.data:
-                    current_count = response.data[0]["message_count"]
-                    new_count = current_count + 1
-                    self.supabase.table("sessions").update({
-                        "message_count": new_count,
-                        "last_activity": datetime.utcnow().isoformat()
-                    }).eq("id", session_id).execute()
+                # Single UPDATE in Postgres, so concurrent increments are never lost
+                await self.execute(self.supabase.rpc("increment_session_message_count", {
+                    "session_id_param": session_id
+                }))
                 
         except Exception as e:
             logger.error(f"Failed to increment message count for session {session_id}: {str(e)}")
     
+    def _provisional_id(self) -> int:
+        """Monotonic integer id returned to clients before the row exists."""
+        self._last_provisional_id = max(self._last_provisional_id + 1, time.time_ns() // 1000)
+        return self._last_provisional_id
+    
+    async def persist_chat_turn(self, session_id: str, messages: List[Dict[str, Any]],
+                                user_id: Optional[int] = None) -> List[int]:
+        """Queue the messages of one chat turn for a single-round-trip write.
+        
+        Returns provisional message ids immediately; the rows are inserted and
+        the session's `message_count`/`last_activity` updated by the
+        `append_chat_turn` RPC in the background.
+        """
+        message_ids = [self._provisional_id() for _ in messages]
+        self._append_history(session_id, messages)
+        
+        if self.demo_mode or self.supabase is None:
+            stored = self._memory_messages.setdefault(session_id, [])
+            for message_id, message in zip(message_ids, messages):
+                stored.append({**message, "id": message_id, "session_id": session_id})
+            if session_id in self._memory_sessions:
+                current = int(self._memory_sessions[session_id].get("message_count", 0))
+                self._memory_sessions[session_id]["message_count"] = current + len(messages)
+                self._memory_sessions[session_id]["last_activity"] = datetime.utcnow().isoformat()
+            return message_ids
+        
+        if self._writer_task is None:
+            await self._write_turn(session_id, messages, user_id)
+            return message_ids
+        
+        written = asyncio.get_running_loop().create_future()
+        self._pending_writes[session_id] = written
+        await self._write_queue.put((session_id, messages, user_id, written))
+        return message_ids
+    
+    async def _wait_for_pending_writes(self, session_id: str) -> None:
+        """Give reads of a session a consistent view of its queued turns."""
+        written = self._pending_writes.get(session_id)
+        if written is not None and not written.done():
+            await asyncio.shield(written)
+    
+    async def _write_turn(self, session_id: str, messages: List[Dict[str, Any]],
+                          user_id: Optional[int] = None, attempts: int = 3) -> None:
+        """Insert a turn's messages and bump session stats in one RPC, retrying transient failures."""
+        for attempt in range(1, attempts + 1):
+            try:
+                await self.execute(self.supabase.rpc("append_chat_turn", {
+                    "session_id_param": session_id,
+                    "messages_param": messages
+                }))
+                if user_id is not None:
+                    # The RPC also bumps the owner's total_messages
+                    auth_service.invalidate_user(user_id)
+                return
+            except Exception as e:
+                if attempt == attempts:
+                    self._dead_letter_turn(session_id, messages, e)
+                    return
+                await asyncio.sleep(0.2 * 2 ** (attempt - 1))
+    
+    def _dead_letter_turn(self, session_id: str, messages: List[Dict[str, Any]], error: Exception) -> None:
+        """Record a turn that was never stored and drop it from the cached history.
+        
+        The next read reloads the history from the database, so the model sees
+        the same conversation that was actually persisted.
+        """
+        self._history_cache.pop(session_id, None)
+        self.failed_writes += 1
+        self._dead_letters.append({
+            "session_id": session_id,
+            "messages": messages,
+            "error": str(error),
+            "failed_at": datetime.utcnow().isoformat()
+        })
+        logger.error(
+            f"Failed to persist chat turn for session {session_id} after retries; "
+            f"{len(messages)} messages dead-lettered: {str(error)}"
+        )
+    
+    def get_dead_letters(self) -> List[Dict[str, Any]]:
+        """Turns that failed to persist, oldest first."""
+        return list(self._dead_letters)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Write-behind queue and history cache statistics."""
+        return {
+            "write_queue_depth": self._write_queue.qsize() if self._write_queue is not None else 0,
+            "pending_write_sessions": len(self._pending_writes),
+            "failed_writes": self.failed_writes,
+            "dead_letter_turns": len(self._dead_letters),
+            "history_cache_sessions": len(self._history_cache),
+        }
+    
+    async def _writer_loop(self) -> None:
+        """Drain the write-behind queue in order."""
+        while True:
+            session_id, messages, user_id, written = await self._write_queue.get()
+            try:
+                await self._write_turn(session_id, messages, user_id)
+            finally:
+                written.set_result(None)
+                if self._pending_writes.get(session_id) is written:
+                    del self._pending_writes[session_id]
+                self._write_queue.task_done()
+    
     async def generate_session_summary(self, session_id: str) -> Optional[str]:
         """Generate AI summary of session (placeholder - would use OpenAI in production)."""
         try:
@@ -336,10 +571,10 @@ class SessionService:
                     self._memory_sessions[session_id]["context_summary"] = str(summary_data)
                     self._memory_sessions[session_id]["updated_at"] = datetime.utcnow().isoformat()
             else:
-                self.supabase.table("sessions").update({
+                await self.execute(self.supabase.table("sessions").update({
                     "context_summary": str(summary_data),
                     "updated_at": datetime.utcnow().isoformat()
-                }).eq("id", session_id).execute()
+                }).eq("id", session_id))
             
             return str(summary_data)
             
@@ -356,9 +591,9 @@ class SessionService:
                 return {}
             else:
                 # Get recent sessions (excluding current)
-                response = self.supabase.table("sessions").select(
+                response = await self.execute(self.supabase.table("sessions").select(
                     "id, title, session_type, context_summary, therapeutic_goals, key_insights"
-                ).eq("user_id", user_id).neq("id", current_session_id).order("last_activity", desc=True).limit(5).execute()
+                ).eq("user_id", user_id).neq("id", current_session_id).order("last_activity", desc=True).limit(5))
                 if not response.data:
                     return {}
                 context = {
@@ -396,16 +631,18 @@ class SessionService:
                 for sid in to_delete:
                     self._memory_sessions.pop(sid, None)
                     self._memory_messages.pop(sid, None)
+                    self._history_cache.pop(sid, None)
                 logger.info(f"[DEMO] Cleaned up {len(to_delete)} old anonymous sessions")
                 return len(to_delete)
             else:
                 cutoff_time = (datetime.utcnow() - timedelta(hours=hours_old)).isoformat()
-                response = self.supabase.table("sessions").select("id").eq("is_anonymous", True).lt("last_activity", cutoff_time).execute()
+                response = await self.execute(self.supabase.table("sessions").select("id").eq("is_anonymous", True).lt("last_activity", cutoff_time))
                 if not response.data:
                     return 0
                 session_ids = [session["id"] for session in response.data]
                 for session_id in session_ids:
-                    self.supabase.table("sessions").delete().eq("id", session_id).execute()
+                    await self.execute(self.supabase.table("sessions").delete().eq("id", session_id))
+                    self._history_cache.pop(session_id, None)
                 logger.info(f"Cleaned up {len(session_ids)} old anonymous sessions")
                 return len(session_ids)
             
@@ -420,15 +657,11 @@ class SessionService:
                 # No-op in demo mode
                 return
             else:
-                # Get current count
-                response = self.supabase.table("users").select("total_sessions").eq("id", user_id).execute()
-                if response.data:
-                    current_count = response.data[0]["total_sessions"]
-                    new_count = current_count + 1 if increment else max(0, current_count - 1)
-                    self.supabase.table("users").update({
-                        "total_sessions": new_count,
-                        "updated_at": datetime.utcnow().isoformat()
-                    }).eq("id", user_id).execute()
+                await self.execute(self.supabase.rpc("increment_user_counters", {
+                    "user_id_param": user_id,
+                    "sessions_delta": 1 if increment else -1
+                }))
+                auth_service.invalidate_user(user_id)
                 
         except Exception as e:
             logger.error(f"Failed to update user session count: {str(e)}")
@@ -0,0 +1,308 @@
+"""
+Spend ledger for Jung AI - Budget accounting shared by every worker on the host
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class SpendLedger:
+    """Daily and monthly OpenAI spend kept in a SQLite file all workers share.
+
+    Each process leases a slice of the day's remaining budget and reserves
+    each call's estimated cost out of that lease in memory, so `reserve` only
+    touches the database when the lease runs out or expires. `record` settles
+    a reservation against the actual cost and `release` returns one for a
+    call that failed. Actual costs accumulate locally and are flushed as one
+    atomic increment once they pass a small amount or a time interval.
+    Reservations still in flight stay counted against the budget when a
+    lease is renewed, which bounds overspend across workers to the
+    outstanding leases rather than to every worker's full budget.
+
+    The async variants run the in-memory path inline and hand ledger I/O to
+    a thread, so a busy ledger file never stalls the event loop.
+    """
+
+    def __init__(self, path: str, daily_budget: float, monthly_budget: float,
+                 lease_usd: float = 0.05, lease_ttl: float = 300,
+                 flush_usd: float = 0.01, flush_interval: float = 5):
+        self.path = path
+        self.daily_budget = daily_budget
+        self.monthly_budget = monthly_budget
+        self.lease_usd = lease_usd
+        self.lease_ttl = lease_ttl
+        self.flush_usd = flush_usd
+        self.flush_interval = flush_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._day = self._today()
+        self._lease_remaining = 0.0
+        self._lease_expires = 0.0
+        self._reserved = 0.0  # Estimates of calls in flight, already taken from the lease
+        self._pending = 0.0
+        self._last_flush = time.monotonic()
+        # Ledger totals as of the last sync, excluding this process's pending spend
+        self._day_total = 0.0
+        self._month_total = 0.0
+
+        self.leases_acquired = 0
+        self.flushes = 0
+        self.denials = 0
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.utcnow().strftime("%Y-%m-%d")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the ledger file on first use; WAL lets workers read while one writes."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS spend (
+                    day TEXT PRIMARY KEY,
+                    amount REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS leases (
+                    day TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (day, owner)
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _sync(self, conn: sqlite3.Connection, lease: Optional[float] = None) -> float:
+        """Flush pending spend and refresh totals inside one write transaction.
+
+        With `lease`, also replace this process's lease with up to that much of
+        the budget the ledger has not spent or leased to other live workers,
+        and return the amount granted.
+        """
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._pending:
+                conn.execute(
+                    "INSERT INTO spend (day, amount) VALUES (?, ?) "
+                    "ON CONFLICT(day) DO UPDATE SET amount = amount + excluded.amount",
+                    (self._day, self._pending)
+                )
+
+            day_total = conn.execute(
+                "SELECT COALESCE(SUM(amount), 0) FROM spend WHERE day = ?", (self._day,)
+            ).fetchone()[0]
+            month_total = conn.execute(
+                "SELECT COALESCE(SUM(amount), 0) FROM spend WHERE day LIKE ?", (self._day[:7] + "-%",)
+            ).fetchone()[0]
+
+            if lease is None:
+                conn.execute(
+                    "UPDATE leases SET amount = ? WHERE day = ? AND owner = ?",
+                    (self._lease_remaining + self._reserved, self._day, self.owner)
+                )
+                granted = self._lease_remaining
+            else:
+                others = conn.execute(
+                    "SELECT COALESCE(SUM(amount), 0) FROM leases "
+                    "WHERE day = ? AND owner != ? AND expires_at > ?",
+                    (self._day, self.owner, now)
+                ).fetchone()[0]
+                # This process's in-flight reservations stay leased until they settle
+                claimed = others + self._reserved
+                available = min(
+                    self.daily_budget - day_total - claimed,
+                    self.monthly_budget - month_total - claimed
+                )
+                granted = max(0.0, min(lease, available))
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (day, owner, amount, expires_at) VALUES (?, ?, ?, ?)",
+                    (self._day, self.owner, granted + self._reserved, now + self.lease_ttl)
+                )
+                self._lease_expires = time.monotonic() + self.lease_ttl
+                self.leases_acquired += 1
+
+            conn.execute("DELETE FROM leases WHERE day < ?", (self._day,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._pending = 0.0
+        self._last_flush = time.monotonic()
+        self._day_total = day_total
+        self._month_total = month_total
+        self.flushes += 1
+        return granted
+
+    def _roll_over(self) -> None:
+        """Settle the previous day's spend when the UTC date changes."""
+        today = self._today()
+        if today != self._day:
+            self._lease_remaining = 0.0
+            self._sync(self._connect())
+            self._day = today
+            self._lease_expires = 0.0
+            self._day_total = 0.0
+            # Calls still in flight keep their reservations and settle against the new day
+
+    def _take_from_lease(self, estimated_cost: float) -> bool:
+        """Reserve from the current lease in memory; False when the ledger is needed."""
+        if (self._day == self._today() and estimated_cost <= self._lease_remaining
+                and time.monotonic() < self._lease_expires):
+            self._lease_remaining -= estimated_cost
+            self._reserved += estimated_cost
+            return True
+        return False
+
+    def reserve(self, estimated_cost: float) -> bool:
+        """Reserve `estimated_cost` from this process's lease; False when over budget.
+
+        Only when the lease is too small or has expired does this go to the
+        ledger for a new one, sized to cover at least the estimate. Every
+        successful reservation must be settled with `record` or `release`.
+        """
+        with self._lock:
+            try:
+                self._roll_over()
+                if self._take_from_lease(estimated_cost):
+                    return True
+
+                self._lease_remaining = self._sync(
+                    self._connect(), lease=max(self.lease_usd, estimated_cost)
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Spend ledger lease failed: {str(e)}")
+                return False
+
+            if self._take_from_lease(estimated_cost):
+                return True
+            self.denials += 1
+            return False
+
+    def _settle(self, cost: float, reserved: float) -> None:
+        self._reserved = max(0.0, self._reserved - reserved)
+        self._lease_remaining = max(0.0, self._lease_remaining + reserved - cost)
+        self._pending += cost
+
+    def _flush_due(self) -> bool:
+        return self._pending >= self.flush_usd or time.monotonic() - self._last_flush >= self.flush_interval
+
+    def record(self, cost: float, reserved: float = 0.0) -> None:
+        """Charge an actual cost, settling the `reserved` estimate it was admitted with.
+
+        Costs are flushed to the ledger in batches.
+        """
+        with self._lock:
+            try:
+                self._roll_over()
+                self._settle(cost, reserved)
+                if self._flush_due():
+                    self._sync(self._connect())
+            except sqlite3.Error as e:
+                # Pending spend is kept and retried with the next flush
+                logger.error(f"Spend ledger flush failed: {str(e)}")
+
+    def release(self, reserved: float) -> None:
+        """Return the reservation of a call that failed before it cost anything."""
+        with self._lock:
+            self._settle(0.0, reserved)
+
+    async def reserve_async(self, estimated_cost: float) -> bool:
+        """`reserve` without blocking the event loop on ledger I/O."""
+        if self._lock.acquire(blocking=False):
+            try:
+                if self._take_from_lease(estimated_cost):
+                    return True
+            finally:
+                self._lock.release()
+        return await asyncio.to_thread(self.reserve, estimated_cost)
+
+    async def record_async(self, cost: float, reserved: float = 0.0) -> None:
+        """`record` without blocking the event loop; flushes run in a thread."""
+        if self._lock.acquire(blocking=False):
+            try:
+                if self._day == self._today():
+                    self._settle(cost, reserved)
+                    if not self._flush_due():
+                        return
+                    cost = reserved = 0.0  # Settled; the thread only flushes
+            finally:
+                self._lock.release()
+        await asyncio.to_thread(self.record, cost, reserved)
+
+    @property
+    def daily_spend(self) -> float:
+        """Today's spend across workers as of the last sync, plus this process's pending spend."""
+        return self._day_total + self._pending
+
+    @property
+    def monthly_spend(self) -> float:
+        """This month's spend across workers as of the last sync, plus pending spend."""
+        return self._month_total + self._pending
+
+    def reset_day(self) -> None:
+        """Clear today's spend and leases for every worker."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM spend WHERE day = ?", (self._day,))
+            conn.execute("DELETE FROM leases WHERE day = ?", (self._day,))
+            self._pending = 0.0
+            self._lease_remaining = 0.0
+            self._lease_expires = 0.0
+            self._month_total -= self._day_total
+            self._day_total = 0.0
+
+    def close(self) -> None:
+        """Flush pending spend and hand the unused lease back to other workers."""
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._lease_remaining = 0.0
+                self._sync(self._conn)
+            except sqlite3.Error as e:
+                logger.error(f"Spend ledger close failed: {str(e)}")
+            self._conn.close()
+            self._conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Lease and flush statistics."""
+        return {
+            "spend_lease_remaining": round(self._lease_remaining, 6),
+            "spend_reserved": round(self._reserved, 6),
+            "spend_pending": round(self._pending, 6),
+            "spend_leases_acquired": self.leases_acquired,
+            "spend_flushes": self.flushes,
+            "spend_denials": self.denials,
+        }
+
+# Global spend ledger instance
+_settings = get_settings()
+spend_ledger = SpendLedger(
+    path=_settings.spend_ledger_path,
+    daily_budget=_settings.daily_budget,
+    monthly_budget=_settings.monthly_budget,
+    lease_usd=_settings.spend_lease_usd,
+    flush_usd=_settings.spend_flush_usd,
+    flush_interval=_settings.spend_flush_interval
+)
@@ -0,0 +1,139 @@
+"""
+Token counter for Jung AI - Lazily loaded shared encoders with memoized counts
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+import tiktoken
+from cachetools import LRUCache
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Chat and embedding models in use all share one BPE vocabulary
+MODEL_ENCODINGS = {
+    "gpt-3.5-turbo": "cl100k_base",
+    "gpt-4": "cl100k_base",
+    "gpt-4-turbo-preview": "cl100k_base",
+    "text-embedding-ada-002": "cl100k_base",
+}
+DEFAULT_ENCODING = "cl100k_base"
+
+# A tokenizer that failed to load is retried after this many seconds, doubling up to the cap
+LOAD_RETRY_SECONDS = 30
+LOAD_RETRY_MAX_SECONDS = 600
+
+
+class TokenizerUnavailable(RuntimeError):
+    """Raised without another load attempt while a failed tokenizer waits to be retried."""
+
+
+class TokenCounter:
+    """Token counts keyed by (encoding, text hash), with encoders loaded on first use.
+
+    Conversation messages are counted again on every turn and every cost
+    estimate, so memoizing per text turns repeat counts into a dict lookup.
+    """
+
+    def __init__(self, cache_size: int = 8192):
+        self._encoders: Dict[str, Any] = {}
+        self._encoder_lock = threading.Lock()
+        # Encoding name -> (monotonic retry time, consecutive failures, error)
+        self._load_failures: Dict[str, Tuple[float, int, Exception]] = {}
+        self._counts: LRUCache = LRUCache(maxsize=cache_size)
+        self._counts_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encoder(self, model: str):
+        """Shared encoder for a model, loaded the first time it is needed."""
+        return self._encoder(MODEL_ENCODINGS.get(model, DEFAULT_ENCODING))
+
+    def _encoder(self, name: str):
+        encoder = self._encoders.get(name)
+        if encoder is None:
+            with self._encoder_lock:
+                encoder = self._encoders.get(name)
+                if encoder is None:
+                    encoder = self._load(name)
+        return encoder
+
+    def _load(self, name: str):
+        """Load an encoding (under the lock); failures are remembered and retried with backoff.
+
+        tiktoken may download the BPE file, so a failed load is not repeated
+        on every count while the network or cache directory is unavailable.
+        """
+        failure = self._load_failures.get(name)
+        if failure is not None and time.monotonic() < failure[0]:
+            raise TokenizerUnavailable(f"Tokenizer {name} unavailable: {str(failure[2])}")
+
+        try:
+            encoder = tiktoken.get_encoding(name)
+        except Exception as e:
+            failures = failure[1] + 1 if failure is not None else 1
+            delay = min(LOAD_RETRY_MAX_SECONDS, LOAD_RETRY_SECONDS * 2 ** (failures - 1))
+            self._load_failures[name] = (time.monotonic() + delay, failures, e)
+            logger.error(f"Failed to load tokenizer {name}, retrying in {delay}s: {str(e)}")
+            raise
+
+        self._load_failures.pop(name, None)
+        self._encoders[name] = encoder
+        logger.info(f"Loaded tokenizer {name}")
+        return encoder
+
+    def warm(self) -> None:
+        """Load every encoding in use, so the first request does not pay for it."""
+        for name in sorted(set(MODEL_ENCODINGS.values()) | {DEFAULT_ENCODING}):
+            try:
+                self._encoder(name)
+            except Exception:
+                pass  # Logged by _load; counts fall back to estimates until a retry succeeds
+
+    def exact_count(self, text: str, model: str = "gpt-3.5-turbo") -> int:
+        """Number of tokens in `text` for `model`, memoized by content hash.
+
+        Raises when the encoder cannot be loaded; see count() for a fallback.
+        """
+        name = MODEL_ENCODINGS.get(model, DEFAULT_ENCODING)
+        key = (name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        with self._counts_lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self.hits += 1
+                return count
+            self.misses += 1
+
+        count = len(self.encoder(model).encode(text))
+
+        with self._counts_lock:
+            self._counts[key] = count
+        return count
+
+    def count(self, text: str, model: str = "gpt-3.5-turbo") -> int:
+        """Like exact_count(), but estimates from the word count if the encoder is unavailable."""
+        try:
+            return self.exact_count(text, model)
+        except TokenizerUnavailable:
+            pass  # Already logged when the load failed
+        except Exception as e:
+            logger.error(f"Token counting failed: {str(e)}")
+        return int(len(text.split()) * 1.3)  # Rough estimate
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache and encoder statistics."""
+        return {
+            "token_cache_size": len(self._counts),
+            "token_cache_hits": self.hits,
+            "token_cache_misses": self.misses,
+            "tokenizers_loaded": sorted(self._encoders),
+            "tokenizers_failed": sorted(self._load_failures),
+        }
+
+# Global token counter instance
+token_counter = TokenCounter(cache_size=get_settings().token_cache_size)
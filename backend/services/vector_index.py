@@ -0,0 +1,270 @@
+"""
+Vector indexes for Jung AI - Exact and quantized top-k search over the vector store
+
+Every index takes row-normalised float32 queries of shape (B, D) and returns
+``(scores, ids)`` arrays of shape (B, k), best first. Rows with fewer than k
+results are padded with id -1 and score -inf. Sidecar files live next
+to the store file and are built offline by ``scripts/build_vector_store.py``.
+"""
+
+import logging
+import math
+import os
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from services.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Rows converted from int8 to float32 at a time during a coarse scan (~25 MB at 1536 dims)
+SCAN_BLOCK_ROWS = 4096
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Select the k best columns of each row of a (B, N) score matrix, sorted."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+
+    ids = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, ids, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+class ExactIndex:
+    """Brute-force cosine search against the full-precision vectors."""
+
+    name = "exact"
+
+    def __init__(self, store: VectorStore):
+        self.store = store
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        # (B, D) @ (D, N) -> (B, N) cosine similarities in one BLAS call
+        return top_k(queries @ self.store.vectors.T, k)
+
+
+class Int8Index:
+    """Per-dimension scalar-quantized codes with full-precision re-scoring.
+
+    Each dimension is mapped to int8 as ``x ~= offset + scale * (code + 128)``.
+    Ranking by ``(q * scale) . code`` is equivalent to ranking by the
+    dequantized dot product, because the remaining terms are constant per query.
+    """
+
+    name = "int8"
+
+    def __init__(self, store: VectorStore, codes: np.ndarray, offset: np.ndarray,
+                 scale: np.ndarray, candidates: int = 100):
+        if codes.shape != (store.count, store.dim):
+            raise ValueError(f"int8 codes {codes.shape} do not match store ({store.count}, {store.dim})")
+        self.store = store
+        self.codes = codes
+        self.offset = offset.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+        self.candidates = candidates
+
+    @staticmethod
+    def paths(store_path: str) -> Tuple[str, str]:
+        """Sidecar file paths for the codes and the quantization parameters."""
+        return f"{store_path}.int8.npy", f"{store_path}.int8-params.npz"
+
+    @classmethod
+    def build(cls, store: VectorStore) -> str:
+        """Quantize the store's vectors and write the sidecar files."""
+        start_time = time.perf_counter()
+        codes_path, params_path = cls.paths(store.path)
+
+        low = np.full(store.dim, np.inf, dtype=np.float32)
+        high = np.full(store.dim, -np.inf, dtype=np.float32)
+        for start in range(0, store.count, SCAN_BLOCK_ROWS):
+            block = store.vectors[start:start + SCAN_BLOCK_ROWS]
+            low = np.minimum(low, block.min(axis=0))
+            high = np.maximum(high, block.max(axis=0))
+
+        scale = (high - low) / 255.0
+        scale[scale == 0] = 1.0
+
+        codes = np.lib.format.open_memmap(f"{codes_path}.tmp", mode="w+", dtype=np.int8, shape=(store.count, store.dim))
+        for start in range(0, store.count, SCAN_BLOCK_ROWS):
+            block = np.asarray(store.vectors[start:start + SCAN_BLOCK_ROWS])
+            quantized = np.rint((block - low) / scale) - 128
+            codes[start:start + SCAN_BLOCK_ROWS] = np.clip(quantized, -128, 127).astype(np.int8)
+        codes.flush()
+        del codes
+
+        # np.savez appends ".npz" unless the name already ends with it
+        np.savez(f"{params_path}.tmp.npz", offset=low, scale=scale)
+        os.replace(f"{codes_path}.tmp", codes_path)
+        os.replace(f"{params_path}.tmp.npz", params_path)
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Built int8 index for {store.count} chunks in {elapsed:.1f}s")
+        return codes_path
+
+    @classmethod
+    def load(cls, store: VectorStore, candidates: int = 100) -> Optional["Int8Index"]:
+        """Memory-map the sidecar files, or return None when they have not been built."""
+        codes_path, params_path = cls.paths(store.path)
+        if not (os.path.exists(codes_path) and os.path.exists(params_path)):
+            return None
+
+        codes = np.load(codes_path, mmap_mode="r")
+        with np.load(params_path) as params:
+            return cls(store, codes, params["offset"], params["scale"], candidates)
+
+    def coarse_search(self, queries: np.ndarray, n: int) -> np.ndarray:
+        """Scan the int8 codes block by block and return the top-n candidate ids per query."""
+        scaled = (queries * self.scale).astype(np.float32)
+        n = min(n, self.store.count)
+
+        best_scores = np.full((queries.shape[0], 0), -np.inf, dtype=np.float32)
+        best_ids = np.empty((queries.shape[0], 0), dtype=np.int64)
+        for start in range(0, self.store.count, SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            block_scores, block_ids = top_k(scaled @ block.T, n)
+            merged_scores = np.concatenate([best_scores, block_scores], axis=1)
+            merged_ids = np.concatenate([best_ids, block_ids + start], axis=1)
+            best_scores, keep = top_k(merged_scores, n)
+            best_ids = np.take_along_axis(merged_ids, keep, axis=1)
+        return best_ids
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        candidate_ids = self.coarse_search(queries, max(k, self.candidates))
+        return rescore(self.store, queries, candidate_ids, k)
+
+
+class IVFIndex:
+    """Inverted-file index: spherical k-means centroids with per-list id arrays.
+
+    A query scores the centroids, visits the ``nprobe`` closest lists and
+    scans only their members, so work grows with list size rather than with
+    the whole corpus.
+    """
+
+    name = "ivf"
+
+    def __init__(self, store: VectorStore, centroids: np.ndarray, list_offsets: np.ndarray,
+                 list_ids: np.ndarray, nprobe: int = 8):
+        if list_ids.shape[0] != store.count:
+            raise ValueError(f"IVF lists cover {list_ids.shape[0]} ids but the store has {store.count}")
+        self.store = store
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    @staticmethod
+    def path(store_path: str) -> str:
+        """Sidecar file path for the centroids and inverted lists."""
+        return f"{store_path}.ivf.npz"
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Nearest centroid (by dot product) for each row, computed block by block."""
+        assignments = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], SCAN_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            assignments[start:start + SCAN_BLOCK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    @classmethod
+    def build(cls, store: VectorStore, nlist: Optional[int] = None, iterations: int = 20,
+              sample_size: Optional[int] = None, seed: int = 42) -> str:
+        """Train centroids on a sample of the store, assign every chunk and write the sidecar."""
+        start_time = time.perf_counter()
+        rng = np.random.default_rng(seed)
+
+        nlist = nlist or max(1, int(round(math.sqrt(store.count))))
+        nlist = min(nlist, store.count)
+        sample_size = min(store.count, sample_size or nlist * 64)
+        sample_rows = np.sort(rng.choice(store.count, size=sample_size, replace=False))
+        sample = np.asarray(store.vectors[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = cls._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+
+            # Re-seed empty lists from random sample rows
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()), replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        assignments = cls._assign(store.vectors, centroids)
+        list_ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=nlist), out=list_offsets[1:])
+
+        path = cls.path(store.path)
+        np.savez(f"{path}.tmp.npz", centroids=centroids, list_offsets=list_offsets, list_ids=list_ids)
+        os.replace(f"{path}.tmp.npz", path)
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Built IVF index with {nlist} lists for {store.count} chunks in {elapsed:.1f}s")
+        return path
+
+    @classmethod
+    def load(cls, store: VectorStore, nprobe: int = 8) -> Optional["IVFIndex"]:
+        """Load the sidecar, or return None when it has not been built."""
+        path = cls.path(store.path)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            return cls(store, data["centroids"], data["list_offsets"], data["list_ids"], nprobe)
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = max(1, min(self.nprobe, self.nlist))
+        _, probes = top_k(queries @ self.centroids.T, nprobe)
+
+        scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        ids = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists.tolist()
+            ])
+            if candidates.size == 0:
+                continue
+
+            # Sorted fancy indexing reads only the probed pages from the memory map
+            candidates.sort()
+            row_scores, keep = top_k((self.store.vectors[candidates] @ query)[np.newaxis, :], k)
+            found = keep.shape[1]
+            scores[row, :found] = row_scores[0]
+            ids[row, :found] = candidates[keep[0]]
+        return scores, ids
+
+
+def rescore(store: VectorStore, queries: np.ndarray, candidate_ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Re-rank candidate rows against the full-precision vectors in the store."""
+    scores = np.empty(candidate_ids.shape, dtype=np.float32)
+    for row, (query, ids) in enumerate(zip(queries, candidate_ids)):
+        # Sorted fancy indexing reads only the candidate pages from the memory map
+        order = np.argsort(ids)
+        scores[row, order] = store.vectors[ids[order]] @ query
+    best_scores, keep = top_k(scores, k)
+    return best_scores, np.take_along_axis(candidate_ids, keep, axis=1)
+
+
+def recall_at_k(index, exact: ExactIndex, queries: np.ndarray, k: int) -> float:
+    """Fraction of the exact top-k ids that the index also returns."""
+    _, expected = exact.search(queries, k)
+    _, found = index.search(queries, k)
+    hits = sum(len(set(e.tolist()) & set(f.tolist()) - {-1}) for e, f in zip(expected, found))
+    return hits / float(expected.size) if expected.size else 1.0
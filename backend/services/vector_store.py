@@ -0,0 +1,200 @@
+"""
+Vector store for Jung AI - Memory-mapped on-disk embedding format
+
+File layout (all integers little-endian):
+
+    header        64 bytes   magic, version, dim, count, section offsets
+    vectors       count * dim float32, row-normalised, 64-byte aligned
+    offsets       (count + 1) uint64 byte offsets into the metadata block
+    metadata      concatenated UTF-8 JSON objects, one per chunk
+
+Vectors and offsets are opened with ``np.memmap`` so the OS page cache holds
+a single copy shared by every worker, and nothing is parsed at startup.
+"""
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"JUNGVEC\x00"
+FORMAT_VERSION = 1
+HEADER_STRUCT = struct.Struct("<8sIIQQQQQ")
+HEADER_SIZE = 64
+ALIGNMENT = 64
+
+
+def citation_fields(volume: Any, page: Any) -> Tuple[Optional[str], Optional[int]]:
+    """Volume as text and page as an integer, as JungSource expects.
+
+    Dumps carry numeric volumes ("12" or 12) and occasional page labels that
+    are not numbers (e.g. roman-numbered front matter); those pages become None.
+    """
+    if isinstance(volume, float) and volume.is_integer():
+        volume = int(volume)
+    volume = None if volume is None or volume == "" else str(volume)
+    try:
+        page = None if page is None or page == "" else int(page)
+    except (TypeError, ValueError):
+        page = None
+    return volume, page
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the vector block alignment."""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class VectorStore:
+    """Read-only, memory-mapped view of a Jung chunk store."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is too small to be a vector store")
+
+        (magic, version, dim, count, vectors_offset,
+         offsets_offset, metadata_offset, metadata_size) = HEADER_STRUCT.unpack_from(header)
+
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a Jung vector store")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store version {version} in {path}")
+
+        self.dim = int(dim)
+        self.count = int(count)
+
+        self.vectors = np.memmap(path, dtype="<f4", mode="r", offset=vectors_offset, shape=(self.count, self.dim))
+        self._offsets = np.memmap(path, dtype="<u8", mode="r", offset=offsets_offset, shape=(self.count + 1,))
+
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._metadata_offset = int(metadata_offset)
+        self._metadata_size = int(metadata_size)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def chunk(self, index: int) -> Dict[str, Any]:
+        """Decode the metadata record for one chunk."""
+        start = self._metadata_offset + int(self._offsets[index])
+        end = self._metadata_offset + int(self._offsets[index + 1])
+        return json.loads(self._mmap[start:end])
+
+    def chunks(self, indices: Sequence[int]) -> List[Dict[str, Any]]:
+        """Decode metadata records for several chunks."""
+        return [self.chunk(i) for i in indices]
+
+    def iter_chunks(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over every metadata record in store order."""
+        for index in range(self.count):
+            yield self.chunk(index)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the vector block in bytes."""
+        return self.count * self.dim * 4
+
+    def close(self) -> None:
+        """Release the memory maps."""
+        try:
+            self._mmap.close()
+            self._file.close()
+        except Exception as e:
+            logger.error(f"Failed to close vector store {self.path}: {str(e)}")
+
+
+class VectorStoreWriter:
+    """Stream chunks into a new store file; the file is swapped in atomically on close."""
+
+    def __init__(self, path: str, count: int, dim: int):
+        self.path = path
+        self.count = count
+        self.dim = dim
+        self._written = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, "wb+")
+        self._vectors_offset = _align(HEADER_SIZE)
+        self._file.truncate(self._vectors_offset + count * dim * 4)
+
+        # Metadata is spooled separately because offsets are only known at the end
+        self._metadata = tempfile.TemporaryFile(dir=directory)
+        self._offsets = np.zeros(count + 1, dtype="<u8")
+
+    def add(self, embedding: Sequence[float], metadata: Dict[str, Any]) -> None:
+        """Append one chunk; the embedding is L2-normalised before writing."""
+        if self._written >= self.count:
+            raise ValueError("More chunks written than declared")
+
+        vector = np.asarray(embedding, dtype="<f4")
+        if vector.shape != (self.dim,):
+            raise ValueError(f"Expected a {self.dim}-dim embedding, got shape {vector.shape}")
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector = vector / norm
+
+        self._file.seek(self._vectors_offset + self._written * self.dim * 4)
+        self._file.write(vector.astype("<f4").tobytes())
+
+        record = json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._metadata.write(record)
+        self._written += 1
+        self._offsets[self._written] = self._offsets[self._written - 1] + len(record)
+
+    def close(self) -> str:
+        """Write the offsets table, metadata and header, then publish the file."""
+        if self._written != self.count:
+            raise ValueError(f"Declared {self.count} chunks but wrote {self._written}")
+
+        offsets_offset = self._vectors_offset + self.count * self.dim * 4
+        metadata_offset = offsets_offset + self._offsets.nbytes
+        metadata_size = int(self._offsets[-1])
+
+        self._file.seek(offsets_offset)
+        self._file.write(self._offsets.tobytes())
+        self._metadata.seek(0)
+        shutil.copyfileobj(self._metadata, self._file)
+        self._metadata.close()
+
+        header = HEADER_STRUCT.pack(
+            MAGIC, FORMAT_VERSION, self.dim, self.count, self._vectors_offset,
+            offsets_offset, metadata_offset, metadata_size
+        )
+        self._file.seek(0)
+        self._file.write(header.ljust(HEADER_SIZE, b"\x00"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        os.replace(self._tmp_path, self.path)
+        logger.info(f"Wrote vector store with {self.count} chunks to {self.path}")
+        return self.path
+
+    def abort(self) -> None:
+        """Discard a partially written store."""
+        self._metadata.close()
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def open_vector_store(path: str) -> Optional[VectorStore]:
+    """Open a vector store, returning None when the file does not exist."""
+    if not os.path.exists(path):
+        return None
+    return VectorStore(path)
@@ -9,7 +9,7 @@ import requests
 import json
 import sys
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 def generate_secret_key(length: int = 32) -> str:
     """Generate a secure secret key for JWT authentication."""
@@ -108,9 +108,12 @@ OPENAI_ORGANIZATION=your-openai-organization-id
 # Cost Management
 DAILY_BUDGET=1.00
 MONTHLY_BUDGET=25.00
+SPEND_LEDGER_PATH=data/spend_ledger.sqlite3
 DEFAULT_MODEL=gpt-3.5-turbo
 COMPLEX_MODEL=gpt-4-turbo-preview
 EMBEDDING_MODEL=text-embedding-ada-002
+OPENAI_RPM_LIMIT=500
+OPENAI_TPM_LIMIT=60000
 
 # Pinecone Configuration (Optional)
 PINECONE_API_KEY=your-pinecone-api-key
@@ -133,6 +136,10 @@ MAX_RESPONSE_SIZE=2097152
 # Caching
 CACHE_TTL=3600
 MAX_CACHE_SIZE=1000
+MAX_CACHE_BYTES=16777216
+SEMANTIC_CACHE_ENABLED=true
+SEMANTIC_CACHE_SIZE=512
+SEMANTIC_CACHE_THRESHOLD=0.95
 
 # Jung-specific Settings
 MAX_CONTEXT_LENGTH=4000
@@ -144,6 +151,8 @@ CORS_ORIGINS=http://localhost:3000,https://your-app.vercel.app
 # Logging
 LOG_LEVEL=INFO
 LOG_FORMAT=%(asctime)s - %(name)s - %(levelname)s - %(message)s
+REQUEST_TIMING_ENABLED=true
+TIMING_LOG_MIN_MS=0
 
 # Health Check
 HEALTH_CHECK_INTERVAL=30
@@ -200,6 +209,483 @@ def run_deployment_tests(api_url: str) -> Dict[str, Any]:
     
     return results
 
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 of latencies given in seconds, in milliseconds."""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 1)
+    return {"p50_ms": percentile(50), "p95_ms": percentile(95), "p99_ms": percentile(99)}
+
+def start_local_stack(concurrency: int = 8, seed: int = 42, openai_latency_ms: float = 300.0,
+                      tokens_per_second: float = 80.0, db_latency_ms: float = 5.0,
+                      openai_port: int = 8900, app_port: int = 8901) -> Dict[str, Any]:
+    """Run the API in-process against fake OpenAI and Supabase backends.
+    
+    Starts the fake OpenAI server and the FastAPI app on local ports and swaps
+    the Supabase client for the SQLite stand-in. Returns the base URL, bearer
+    tokens for ten local users (empty without PyJWT), the fakes and a `stop`
+    callable. No external service is called and nothing is billed.
+    """
+    import logging
+    import tempfile
+    import time
+    
+    bench_dir = tempfile.mkdtemp(prefix="jung-bench-")
+    jwt_secret = generate_secret_key()
+    os.environ.update({
+        "DEBUG": "true",
+        "SUPABASE_URL": "http://127.0.0.1:9",
+        "SUPABASE_KEY": "bench-anon-key",
+        "SUPABASE_SERVICE_ROLE_KEY": "bench-service-key",
+        "SUPABASE_JWT_SECRET": jwt_secret,
+        "SECRET_KEY": generate_secret_key(),
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "OPENAI_RPM_LIMIT": "1000000",
+        "OPENAI_TPM_LIMIT": "100000000",
+        "LLM_QUEUE_SIZE": str(max(32, concurrency * 4)),
+        "SPEND_LEDGER_PATH": os.path.join(bench_dir, "spend_ledger.sqlite3"),
+        "DAILY_BUDGET": "1000000",
+        "MONTHLY_BUDGET": "1000000",
+    })
+    
+    # Import the backend the way it is deployed: from backend/ as working directory
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    from scripts.fake_openai import create_app, serve_in_thread
+    from scripts.fake_supabase import FakeSupabase
+    from api.main import app
+    from services.auth_service import auth_service
+    from services.session_service import session_service
+    try:
+        import jwt
+    except ImportError:
+        jwt = None
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    app.state.limiter.enabled = False
+    database = FakeSupabase(latency_ms=db_latency_ms)
+    session_service.supabase = database
+    session_service.demo_mode = False
+    auth_service.supabase = database
+    
+    fake_openai = create_app({
+        "latency_ms": openai_latency_ms,
+        "latency_dist": "lognormal",
+        "tokens_per_second": tokens_per_second,
+    }, seed=seed)
+    openai_server = serve_in_thread(fake_openai, openai_port)
+    app_server = serve_in_thread(app, app_port)
+    
+    tokens = []
+    if jwt is not None:
+        tokens = [
+            jwt.encode(
+                {"sub": str(user), "email": f"bench{user}@example.com", "aud": "authenticated",
+                 "exp": int(time.time()) + 3600},
+                jwt_secret, algorithm="HS256"
+            )
+            for user in range(1, 11)
+        ]
+    
+    def stop() -> None:
+        app_server.should_exit = True
+        openai_server.should_exit = True
+    
+    return {
+        "base_url": f"http://127.0.0.1:{app_port}",
+        "tokens": tokens,
+        "database": database,
+        "fake_openai": fake_openai,
+        "stop": stop,
+    }
+
+def run_benchmark(requests_per_endpoint: int = 50, concurrency: int = 8, seed: int = 42,
+                  openai_latency_ms: float = 300.0, tokens_per_second: float = 80.0,
+                  db_latency_ms: float = 5.0, openai_port: int = 8900, app_port: int = 8901) -> Dict[str, Any]:
+    """Benchmark the API in-process against fake OpenAI and Supabase backends.
+    
+    Drives each endpoint in turn with `concurrency` parallel clients against
+    the stack from `start_local_stack`.
+    """
+    import asyncio
+    import time
+    import httpx
+    
+    stack = start_local_stack(concurrency, seed, openai_latency_ms, tokens_per_second,
+                              db_latency_ms, openai_port, app_port)
+    tokens = stack["tokens"]
+    
+    async def drive() -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=stack["base_url"], limits=limits, timeout=60) as client:
+            
+            def auth(i: int) -> Dict[str, str]:
+                return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"} if tokens else {}
+            
+            async def phase(name: str, make_request, stream: bool = False) -> List[Any]:
+                semaphore = asyncio.Semaphore(concurrency)
+                latencies: List[float] = []
+                first_event: List[float] = []
+                errors: Dict[str, int] = {}
+                bodies: List[Any] = []
+                
+                async def one(i: int) -> None:
+                    async with semaphore:
+                        method, url, kwargs = make_request(i)
+                        start = time.perf_counter()
+                        try:
+                            if stream:
+                                async with client.stream(method, url, **kwargs) as response:
+                                    first_delta = None
+                                    async for line in response.aiter_lines():
+                                        if line.startswith("event: delta") and first_delta is None:
+                                            first_delta = time.perf_counter() - start
+                                        elif line.startswith("event: error"):
+                                            errors["stream error event"] = errors.get("stream error event", 0) + 1
+                                            return
+                                    if first_delta is not None:
+                                        first_event.append(first_delta)
+                            else:
+                                response = await client.request(method, url, **kwargs)
+                                bodies.append((i, response.json()))
+                        except Exception as e:
+                            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                            return
+                        if response.status_code >= 400:
+                            errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                        else:
+                            latencies.append(time.perf_counter() - start)
+                
+                start = time.perf_counter()
+                await asyncio.gather(*(one(i) for i in range(requests_per_endpoint)))
+                elapsed = time.perf_counter() - start
+                results[name] = {
+                    "requests": requests_per_endpoint,
+                    "succeeded": len(latencies),
+                    "errors": errors,
+                    "rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+                    **latency_summary(latencies),
+                }
+                if stream:
+                    results[name]["first_delta"] = latency_summary(first_event)
+                return bodies
+            
+            await phase("GET /health", lambda i: ("GET", "/health", {}))
+            
+            created = await phase("POST /sessions (anonymous)", lambda i: (
+                "POST", "/sessions", {"json": {"title": f"Bench session {i}"}}
+            ))
+            anonymous_ids = [body["id"] for _, body in created if "id" in body]
+            
+            await phase("GET /sessions/{id}", lambda i: ("GET", f"/sessions/{anonymous_ids[i % len(anonymous_ids)]}", {}))
+            
+            await phase("POST /chat/message", lambda i: ("POST", "/chat/message", {"json": {
+                "session_id": anonymous_ids[i % len(anonymous_ids)],
+                "content": f"Bench question {i}: I keep dreaming about a locked door."
+            }}))
+            
+            if tokens:
+                created = await phase("POST /sessions (authenticated)", lambda i: (
+                    "POST", "/sessions", {"json": {"title": f"Bench session {i}"}, "headers": auth(i)}
+                ))
+                # (request index, session id): request i used token auth(i), which owns the session
+                owned = [(i, body["id"]) for i, body in created if "id" in body]
+                
+                await phase("GET /sessions", lambda i: ("GET", "/sessions", {"headers": auth(i)}))
+                
+                await phase("POST /chat/stream", lambda i: ("POST", "/chat/stream", {
+                    "json": {
+                        "session_id": owned[i % len(owned)][1],
+                        "content": f"Bench stream question {i}: what does my shadow want?"
+                    },
+                    "headers": auth(owned[i % len(owned)][0])
+                }), stream=True)
+        
+        return results
+    
+    results = asyncio.run(drive())
+    stack["stop"]()
+    
+    return {
+        "config": {
+            "requests_per_endpoint": requests_per_endpoint,
+            "concurrency": concurrency,
+            "seed": seed,
+            "openai_latency_ms": openai_latency_ms,
+            "tokens_per_second": tokens_per_second,
+            "db_latency_ms": db_latency_ms,
+            "authenticated_endpoints": bool(tokens),
+        },
+        "endpoints": results,
+        "database_statements": stack["database"].statements,
+        "fake_openai_requests": stack["fake_openai"].state.requests,
+    }
+
+class LatencyHistogram:
+    """HDR-style latency histogram with fixed relative precision.
+    
+    Latencies are recorded in microseconds into log-linear buckets: each
+    power-of-two range is split into 128 sub-buckets, so every percentile is
+    within 1% of the true value while memory grows only with the logarithm
+    of the range. Histograms merge by adding bucket counts.
+    """
+    
+    SUB_BUCKET_BITS = 7
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+    
+    @classmethod
+    def _shift(cls, value: int) -> int:
+        return max(0, value.bit_length() - cls.SUB_BUCKET_BITS - 1)
+    
+    def record(self, seconds: float) -> None:
+        value = max(1, int(seconds * 1_000_000))
+        shift = self._shift(value)
+        bucket = (value >> shift) << shift
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total_us += value
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = max(self.max_us, value)
+    
+    def merge(self, other: "LatencyHistogram") -> None:
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+    
+    def percentile(self, p: float) -> float:
+        """Highest value equivalent to the p-th percentile, in milliseconds."""
+        if not self.count:
+            return 0.0
+        target = max(1, -(-self.count * p // 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                highest = bucket + (1 << self._shift(bucket)) - 1
+                return round(min(highest, self.max_us) / 1000, 2)
+        return round(self.max_us / 1000, 2)
+    
+    def summary(self) -> Dict[str, float]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min_ms": round(self.min_us / 1000, 2),
+            "mean_ms": round(self.total_us / self.count / 1000, 2),
+            "p50_ms": self.percentile(50),
+            "p75_ms": self.percentile(75),
+            "p90_ms": self.percentile(90),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "p99_9_ms": self.percentile(99.9),
+            "max_ms": round(self.max_us / 1000, 2),
+        }
+
+LOAD_SCENARIOS = ("create_session", "chat", "list_sessions", "get_session")
+DEFAULT_LOAD_MIX = {"create_session": 1, "chat": 3, "list_sessions": 1, "get_session": 2}
+
+def parse_load_mix(spec: str) -> Dict[str, float]:
+    """Parse a scenario mix such as 'chat=3,get_session=2,create_session=1'."""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in LOAD_SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}', expected one of {', '.join(LOAD_SCENARIOS)}")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Durations in milliseconds from a Server-Timing header such as 'auth;dur=1.2, llm;dur=840'."""
+    stages = {}
+    for metric in header.split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                try:
+                    stages[name] = float(param[4:])
+                except ValueError:
+                    pass
+    return stages
+
+def run_load_test(api_url: str, tokens: Optional[List[str]] = None, concurrency: int = 16,
+                  ramp_up: float = 10.0, duration: float = 60.0, mix: Optional[Dict[str, float]] = None,
+                  interval: float = 1.0, timeout: float = 60.0, seed: Optional[int] = None) -> Dict[str, Any]:
+    """Closed-loop load test of the API with a weighted scenario mix.
+    
+    `concurrency` virtual users start evenly over `ramp_up` seconds and run
+    scenarios back to back, picked by weight from `mix`, until `duration`
+    seconds after the start. They share one pooled keep-alive HTTP client.
+    User i signs in with tokens[i % len(tokens)]; without tokens users are
+    anonymous and list_sessions, which needs a signed-in user, is dropped
+    from the mix.
+    
+    Returns latency percentiles per scenario and overall, errors by scenario
+    and cause, throughput per `interval` seconds and, when the API sends
+    Server-Timing headers, the mean time per server stage for each scenario.
+    """
+    import asyncio
+    import random
+    import time
+    import httpx
+    
+    tokens = tokens or []
+    mix = dict(mix or DEFAULT_LOAD_MIX)
+    if not tokens:
+        mix.pop("list_sessions", None)
+    scenarios = [name for name in LOAD_SCENARIOS if mix.get(name, 0) > 0]
+    if not scenarios:
+        raise ValueError("Scenario mix has no runnable scenarios")
+    weights = [mix[name] for name in scenarios]
+    
+    histograms = {name: LatencyHistogram() for name in LOAD_SCENARIOS}
+    stage_totals: Dict[str, Dict[str, float]] = {name: {} for name in LOAD_SCENARIOS}
+    requests_by_scenario = {name: 0 for name in LOAD_SCENARIOS}
+    errors: Dict[str, Dict[str, int]] = {}
+    timeline: Dict[int, Dict[str, int]] = {}
+    
+    async def drive() -> float:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=api_url.rstrip("/"), limits=limits, timeout=timeout) as client:
+            started = time.perf_counter()
+            deadline = started + duration
+            
+            async def request(scenario: str, method: str, url: str, headers: Dict[str, str], **kwargs) -> Optional[Any]:
+                begin = time.perf_counter()
+                cause = None
+                body = None
+                try:
+                    response = await client.request(method, url, headers=headers, **kwargs)
+                    if response.status_code >= 400:
+                        cause = f"HTTP {response.status_code}"
+                    else:
+                        body = response.json()
+                        for name, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+                            stage_totals[scenario][name] = stage_totals[scenario].get(name, 0.0) + ms
+                except Exception as e:
+                    cause = type(e).__name__
+                end = time.perf_counter()
+                
+                requests_by_scenario[scenario] += 1
+                slot = timeline.setdefault(int((end - started) / interval), {"requests": 0, "errors": 0})
+                slot["requests"] += 1
+                if cause is not None:
+                    slot["errors"] += 1
+                    scenario_errors = errors.setdefault(scenario, {})
+                    scenario_errors[cause] = scenario_errors.get(cause, 0) + 1
+                    return None
+                histograms[scenario].record(end - begin)
+                return body
+            
+            async def virtual_user(i: int) -> None:
+                await asyncio.sleep(ramp_up * i / concurrency)
+                rng = random.Random(None if seed is None else seed + i)
+                headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"} if tokens else {}
+                session_ids: List[str] = []
+                step = 0
+                
+                while time.perf_counter() < deadline:
+                    scenario = rng.choices(scenarios, weights)[0]
+                    if scenario in ("chat", "get_session") and not session_ids:
+                        scenario = "create_session"
+                    step += 1
+                    
+                    if scenario == "create_session":
+                        body = await request(scenario, "POST", "/sessions", headers,
+                                             json={"title": f"Load session {i}-{step}"})
+                        if body and "id" in body:
+                            session_ids.append(body["id"])
+                    elif scenario == "chat":
+                        await request(scenario, "POST", "/chat/message", headers, json={
+                            "session_id": rng.choice(session_ids),
+                            "content": f"Load question {i}-{step}: I keep dreaming about a locked door."
+                        })
+                    elif scenario == "get_session":
+                        await request(scenario, "GET", f"/sessions/{rng.choice(session_ids)}", headers)
+                    else:
+                        await request(scenario, "GET", "/sessions", headers, params={"limit": 20})
+            
+            await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+            return time.perf_counter() - started
+    
+    elapsed = asyncio.run(drive())
+    
+    overall = LatencyHistogram()
+    for histogram in histograms.values():
+        overall.merge(histogram)
+    total_requests = sum(requests_by_scenario.values())
+    total_errors = sum(sum(causes.values()) for causes in errors.values())
+    
+    def users_at(seconds: float) -> int:
+        if ramp_up <= 0:
+            return concurrency
+        return min(concurrency, int(seconds * concurrency / ramp_up) + 1)
+    
+    steady = [slot for index, slot in timeline.items()
+              if index * interval >= ramp_up and (index + 1) * interval <= elapsed]
+    
+    return {
+        "config": {
+            "api_url": api_url,
+            "concurrency": concurrency,
+            "ramp_up_s": ramp_up,
+            "duration_s": duration,
+            "mix": {name: mix[name] for name in scenarios},
+            "interval_s": interval,
+            "authenticated": bool(tokens),
+            "seed": seed,
+        },
+        "summary": {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total_requests,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total_requests, 4) if total_requests else 0,
+            "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0,
+            "steady_state_rps": round(sum(slot["requests"] for slot in steady) / (len(steady) * interval), 2) if steady else None,
+            "latency": overall.summary(),
+        },
+        "scenarios": {
+            name: {
+                "requests": requests_by_scenario[name],
+                "errors": sum(errors.get(name, {}).values()),
+                "latency": histograms[name].summary(),
+                # Mean per successful request, from the server's Server-Timing header
+                "server_stages_ms": {
+                    stage: round(total / histograms[name].count, 1)
+                    for stage, total in stage_totals[name].items()
+                } if histograms[name].count else {},
+            }
+            for name in LOAD_SCENARIOS if requests_by_scenario[name]
+        },
+        "errors": errors,
+        "timeline": [
+            {
+                "t_s": round(index * interval, 2),
+                "users": users_at(index * interval),
+                "requests": timeline[index]["requests"],
+                "errors": timeline[index]["errors"],
+                "rps": round(timeline[index]["requests"] / interval, 2),
+            }
+            for index in sorted(timeline)
+        ],
+    }
+
 def main():
     """Main CLI interface."""
     if len(sys.argv) < 2:
@@ -209,6 +695,8 @@ def main():
         print("  python deploy_helpers.py generate-env     # Generate environment template")
         print("  python deploy_helpers.py test <api-url>   # Test API deployment")
         print("  python deploy_helpers.py full-test <api-url>  # Run full deployment tests")
+        print("  python deploy_helpers.py bench [requests] [concurrency]  # Benchmark against local fakes")
+        print("  python deploy_helpers.py load <api-url|local> [options]  # Concurrent load test (see load --help)")
         sys.exit(1)
     
     command = sys.argv[1].lower()
@@ -248,6 +736,45 @@ def main():
         api_url = sys.argv[2]
         run_deployment_tests(api_url)
     
+    elif command == "bench":
+        requests_per_endpoint = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+        concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+        print(f"⏱️  Benchmarking {requests_per_endpoint} requests per endpoint at concurrency {concurrency}...", file=sys.stderr)
+        report = run_benchmark(requests_per_endpoint, concurrency)
+        print(json.dumps(report, indent=2))
+    
+    elif command == "load":
+        import argparse
+        parser = argparse.ArgumentParser(prog="deploy_helpers.py load", description="Run a concurrent load test")
+        parser.add_argument("target", help="API URL, or 'local' for the in-process stack with fake backends")
+        parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+        parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds over which users start")
+        parser.add_argument("--duration", type=float, default=60.0, help="Total test length in seconds")
+        parser.add_argument("--mix", type=parse_load_mix, default=DEFAULT_LOAD_MIX,
+                            help="Scenario weights, e.g. create_session=1,chat=3,list_sessions=1,get_session=2")
+        parser.add_argument("--token", action="append", default=[], help="Bearer token; repeat for several users")
+        parser.add_argument("--interval", type=float, default=1.0, help="Throughput timeline bucket in seconds")
+        parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+        parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible scenario choices")
+        parser.add_argument("--output", help="Also write the JSON report to this file")
+        args = parser.parse_args(sys.argv[2:])
+        
+        stack = None
+        api_url, tokens = args.target, args.token
+        if args.target == "local":
+            stack = start_local_stack(args.concurrency)
+            api_url, tokens = stack["base_url"], tokens or stack["tokens"]
+        print(f"⏱️  Load testing {api_url} with {args.concurrency} users for {args.duration:.0f}s...", file=sys.stderr)
+        report = run_load_test(api_url, tokens, args.concurrency, args.ramp_up, args.duration,
+                               args.mix, args.interval, args.timeout, args.seed)
+        if stack is not None:
+            stack["stop"]()
+        
+        print(json.dumps(report, indent=2))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+    
     else:
         print(f"❌ Unknown command: {command}")
         print("Use 'python deploy_helpers.py' for usage instructions")